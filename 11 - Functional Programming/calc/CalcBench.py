@@ -0,0 +1,585 @@
+"""
+Benchmarks for the calc toolchain.
+
+Usage: python3 CalcBench.py lexer [megabytes]
+       python3 CalcBench.py tokens [megabytes]
+       python3 CalcBench.py parallel [megabytes] [workers]
+       python3 CalcBench.py chains [max terms]
+       python3 CalcBench.py nesting [levels]
+       python3 CalcBench.py trees [megabytes]
+       python3 CalcBench.py cache [megabytes]
+       python3 CalcBench.py incremental [max kilobytes]
+       python3 CalcBench.py stream [megabytes]
+       python3 CalcBench.py parsers [megabytes]
+       python3 CalcBench.py lazy [functions]
+       python3 CalcBench.py engines [iterations]
+"""
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import contextlib
+import CalcCache
+import calc
+from CalcCompiler import compile_tree
+import CalcNative
+import CalcResolver
+import CalcTrace
+import CalcTranspile
+import CalcVM
+from CalcIncremental import IncrementalProgram
+from CalcLexer import Lexer, DFALexer, SymbolTable, Token, TokenTable, \
+                      tokenize_parallel, PARALLEL_CHUNK
+from CalcParser import Parser, ParseArena, same_tree
+from CalcTableParser import TableParser
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def generate_source(path, sample, megabytes):
+    """
+    Write a copy of the sample program, repeated until it is (at least)
+    the requested number of megabytes, to path.
+    """
+    with open(os.path.join(HERE, sample), 'r') as f:
+        text = f.read()
+    if not text.endswith('\n'):
+        text += '\n'
+
+    # write in large blocks so generation is not the bottleneck
+    block = text * max(1, (1 << 20) // len(text))
+    target = int(megabytes * (1 << 20))
+    written = 0
+    with open(path, 'w') as f:
+        while written < target:
+            f.write(block)
+            written += len(block)
+    return written
+
+
+def time_lexer(path, mode):
+    """
+    Lex the file at path, returning the token count and elapsed seconds.
+    """
+    start = time.perf_counter()
+    count = 0
+    with open(path, 'rb' if mode == 'mmap' else 'r') as f:
+        if mode == 'dfa':
+            lexer = DFALexer(f)
+        else:
+            lexer = Lexer(f, mode == 'mmap')
+        while lexer.next().token != Token.EOF:
+            count += 1
+    return count, time.perf_counter() - start
+
+
+def bench_lexer(megabytes=100):
+    """
+    Measure lexer throughput on sample.calc scaled to the given size, for
+    the hand written lexer reading the source into memory or scanning it
+    mmap'ed, and for the generated DFA lexer.
+    """
+    fd, path = tempfile.mkstemp(suffix='.calc')
+    os.close(fd)
+    try:
+        size = generate_source(path, 'sample.calc', megabytes)
+        mb = size / (1 << 20)
+        for mode in ('text', 'mmap', 'dfa'):
+            count, elapsed = time_lexer(path, mode)
+            print(f"lexer ({mode}): {mb:.1f} MB, {count} tokens in "
+                  f"{elapsed:.2f}s ({mb / elapsed:.2f} MB/s)")
+    finally:
+        os.remove(path)
+
+
+def bench_tokens(megabytes=4):
+    """
+    Compare the memory held by a whole-file token stream as a list of
+    TokenDetail tuples and as a TokenTable, and parse from each.
+    """
+    fd, path = tempfile.mkstemp(suffix='.calc')
+    os.close(fd)
+    try:
+        generate_source(path, 'sample.calc', megabytes)
+
+        # list of token tuples
+        tracemalloc.start()
+        with open(path, 'r') as f:
+            lexer = Lexer(f)
+            tokens = [lexer.next()]
+            while tokens[-1].token != Token.EOF:
+                tokens.append(lexer.next())
+        list_size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        count = len(tokens)
+        del tokens
+
+        # columnar token table
+        tracemalloc.start()
+        with open(path, 'r') as f:
+            table = Lexer(f).tokenize_all()
+        table_size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+    finally:
+        os.remove(path)
+
+    print(f"tokens: {count} tokens")
+    print(f"  TokenDetail list: {list_size / count:.1f} bytes/token")
+    print(f"  TokenTable:       {table_size / count:.1f} bytes/token")
+
+    start = time.perf_counter()
+    Parser(table).parse()
+    print(f"  parse from table: {time.perf_counter() - start:.2f}s")
+
+
+def bench_parallel(megabytes=100, workers=None):
+    """
+    Compare scanning sample.calc scaled to the given size into a TokenTable
+    in this process and split across worker processes, along with the
+    time stitching the tables together takes, which bounds the speedup,
+    and check the tables agree (also for a copy with CRLF line endings).
+    """
+    workers = int(workers) if workers else os.cpu_count() or 1
+    fd, path = tempfile.mkstemp(suffix='.calc')
+    os.close(fd)
+    try:
+        size = generate_source(path, 'sample.calc', megabytes)
+        mb = size / (1 << 20)
+
+        start = time.perf_counter()
+        with open(path, 'r') as f:
+            serial = Lexer(f).tokenize_all()
+        elapsed = time.perf_counter() - start
+        print(f"serial: {mb:.1f} MB, {len(serial)} tokens in "
+              f"{elapsed:.2f}s ({mb / elapsed:.2f} MB/s)")
+
+        start = time.perf_counter()
+        table = tokenize_parallel(path, workers)
+        elapsed = time.perf_counter() - start
+        print(f"parallel ({workers} workers): {len(table)} tokens in "
+              f"{elapsed:.2f}s ({mb / elapsed:.2f} MB/s)")
+
+        start = time.perf_counter()
+        TokenTable(SymbolTable()).extend(serial)
+        elapsed = time.perf_counter() - start
+        print(f"  stitching alone: {elapsed:.2f}s")
+        print(f"  tables "
+              f"{'agree' if same_tokens(serial, table) else 'DISAGREE'}")
+
+        # a few chunks' worth with CRLF line endings
+        with open(path, 'r') as f:
+            text = f.read(4 * PARALLEL_CHUNK)
+        with open(path, 'w', newline='\r\n') as f:
+            f.write(text[:text.rfind('\n') + 1])
+        with open(path, 'r') as f:
+            serial = Lexer(f).tokenize_all()
+        table = tokenize_parallel(path, workers)
+        print(f"  CRLF tables "
+              f"{'agree' if same_tokens(serial, table) else 'DISAGREE'}")
+    finally:
+        os.remove(path)
+
+
+def same_tokens(a, b):
+    """
+    Return true if two TokenTables hold the same tokens.
+    """
+    return len(a) == len(b) and \
+           all(a.token(i) == b.token(i) for i in range(len(a)))
+
+
+def bench_chains(max_terms=64000):
+    """
+    Time both expression parsers on statements of the form 1+1+...+1,
+    doubling the number of terms up to max_terms.
+    """
+    terms = 250
+    while terms <= max_terms:
+        source = io.StringIO('+'.join(['1'] * terms) + '\n')
+        table = Lexer(source).tokenize_all()
+        results = []
+        for climbing in (False, True):
+            start = time.perf_counter()
+            try:
+                Parser(table, climbing).parse()
+                results.append(f"{time.perf_counter() - start:.3f}s")
+            except RecursionError:
+                results.append("RecursionError")
+        print(f"chains: {terms} terms, descent {results[0]}, "
+              f"climbing {results[1]}")
+        terms *= 2
+
+
+def nested_sources(levels):
+    """
+    Return (name, source) pairs of programs nesting each construct the
+    given number of levels deep.
+    """
+    block = lambda head: (head + '\n') * levels + 'x\n' + 'end\n' * levels
+    return [('parens', '(' * levels + '1' + ')' * levels + '\n'),
+            ('unary minus', '-' * levels + '1\n'),
+            ('if', block('if 1 then')),
+            ('while', block('while 0 do')),
+            ('function', block('function f(integer a) returns integer')),
+            ('record access', 'r.' * levels + 'x\n')]
+
+
+def bench_nesting(levels=100000):
+    """
+    Parse deeply nested programs with the explicit stack parser, after
+    checking it agrees with the recursive parser at a depth both manage.
+    """
+    levels = int(levels)
+    for name, source in nested_sources(levels):
+        # cross check at a shallow depth
+        shallow = dict(nested_sources(100))[name]
+        table = Lexer(io.StringIO(shallow)).tokenize_all()
+        agree = same_tree(Parser(table).parse(),
+                          Parser(table, stack=True).parse())
+
+        table = Lexer(io.StringIO(source)).tokenize_all()
+        try:
+            Parser(table).parse()
+            descent = "ok"
+        except RecursionError:
+            descent = "RecursionError"
+        start = time.perf_counter()
+        Parser(table, stack=True).parse()
+        elapsed = time.perf_counter() - start
+        print(f"nesting ({name}): {levels} levels, descent {descent}, "
+              f"stack {elapsed:.2f}s, "
+              f"{'agrees' if agree else 'DISAGREES'} at 100 levels")
+
+
+def bench_trees(megabytes=4):
+    """
+    Compare the memory held by the parse tree of a large program as
+    ParseTree nodes and packed into a ParseArena.
+    """
+    fd, path = tempfile.mkstemp(suffix='.calc')
+    os.close(fd)
+    try:
+        generate_source(path, 'sample2.calc', megabytes)
+        with open(path, 'r') as f:
+            table = Lexer(f).tokenize_all()
+    finally:
+        os.remove(path)
+
+    tracemalloc.start()
+    tree = Parser(table).parse()
+    tree_size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    arena = ParseArena(tree, table)
+    del tree
+    arena_size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    count = len(arena)
+    print(f"trees: {count} nodes from {len(table)} tokens")
+    print(f"  ParseTree:  {tree_size / count:.1f} bytes/node")
+    print(f"  ParseArena: {arena_size / count:.1f} bytes/node")
+
+
+def bench_cache(megabytes=1):
+    """
+    Time loading a program of the given size through the compiled program
+    cache, cold (lex, parse and write the cache) and then warm, checking
+    a copy with CRLF line endings parses as it does read as text.
+    """
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'program.calc')
+    try:
+        size = generate_source(path, 'sample2.calc', megabytes)
+        times = []
+        for run in ('cold', 'warm'):
+            start = time.perf_counter()
+            tree, lines = CalcCache.parse_file(path)
+            times.append(time.perf_counter() - start)
+        cached = os.path.join(directory, CalcCache.CACHE_DIR)
+        cache_size = sum(os.path.getsize(os.path.join(cached, name))
+                         for name in os.listdir(cached))
+
+        crlf = os.path.join(directory, 'crlf.calc')
+        with open(path, 'r') as f, open(crlf, 'w', newline='\r\n') as g:
+            g.write(f.read())
+        with open(crlf, 'r') as f:
+            expected = Parser(Lexer(f)).parse()
+        agree = same_tree(CalcCache.parse_file(crlf)[0], expected)
+    finally:
+        shutil.rmtree(directory)
+
+    print(f"cache: {size / (1 << 20):.1f} MB source, "
+          f"{cache_size / (1 << 20):.1f} MB cached")
+    print(f"  cold: {times[0]:.2f}s")
+    print(f"  warm: {times[1]:.2f}s")
+    print(f"  CRLF source: {'agrees' if agree else 'DISAGREES'}")
+
+
+def bench_incremental(max_kilobytes=1024):
+    """
+    Time a one line edit in the middle of a program through an
+    IncrementalProgram against parsing the whole edited program again,
+    doubling the program size up to max_kilobytes.
+    """
+    with open(os.path.join(HERE, 'sample2.calc'), 'r') as f:
+        sample = f.read().rstrip('\n') + '\n'
+    kilobytes = 16
+    while kilobytes <= max_kilobytes:
+        text = sample * max(1, (kilobytes << 10) // len(sample))
+        program = IncrementalProgram(text)
+        line = text.count('\n') // 2 + 1
+
+        start = time.perf_counter()
+        program.edit(line, 1, line, 1, 'x = 1\n')
+        edit = time.perf_counter() - start
+
+        start = time.perf_counter()
+        table = Lexer(io.StringIO(program.text),
+                      symbols=SymbolTable()).tokenize_all()
+        Parser(table).parse()
+        full = time.perf_counter() - start
+
+        # check against a full parse sharing the program's ids
+        table = Lexer(io.StringIO(program.text),
+                      symbols=program.symbols).tokenize_all()
+        agree = same_tree(program.tree, Parser(table).parse(), offsets=False)
+        print(f"incremental: {len(text) >> 10} KB, edit {edit * 1000:.2f}ms, "
+              f"full parse {full * 1000:.1f}ms, "
+              f"{'agrees' if agree else 'DISAGREES'}")
+        kilobytes *= 2
+
+
+def bench_stream(megabytes=1):
+    """
+    Compare the peak memory and the time to the first line of output of
+    running a generated script of the given size whole and streamed a
+    statement at a time.
+    """
+    fd, path = tempfile.mkstemp(suffix='.calc')
+    os.close(fd)
+    try:
+        step = 'x = x + 1\nx * 2 - 1\n'
+        size = int(megabytes * (1 << 20))
+        with open(path, 'w') as f:
+            f.write('integer x\n' + step * (size // len(step)))
+        for stream in (False, True):
+            out = FirstWrite()
+            tracemalloc.start()
+            start = time.perf_counter()
+            with open(path, 'r') as f, contextlib.redirect_stdout(out):
+                calc.main(f, stream=stream)
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"{'stream' if stream else 'whole'}: "
+                  f"{size / (1 << 20):.1f} MB, first output after "
+                  f"{(out.first - start) * 1000:.1f}ms, done in "
+                  f"{elapsed:.2f}s, peak {peak / (1 << 20):.1f} MB")
+    finally:
+        os.remove(path)
+
+
+class FirstWrite(io.TextIOBase):
+    """
+    An output stream which throws away what is written to it, noting when
+    the first write came.
+    """
+    first = None
+
+    def write(self, text):
+        if self.first is None:
+            self.first = time.perf_counter()
+        return len(text)
+
+
+def bench_parsers(megabytes=1):
+    """
+    Time each parser on sample2.calc scaled to the given size: recursive
+    descent, precedence climbing, the explicit stack, and the LL(1) table.
+    """
+    fd, path = tempfile.mkstemp(suffix='.calc')
+    os.close(fd)
+    try:
+        generate_source(path, 'sample2.calc', megabytes)
+        with open(path, 'r') as f:
+            table = Lexer(f).tokenize_all()
+    finally:
+        os.remove(path)
+
+    print(f"parsers: {len(table)} tokens")
+    tree = Parser(table).parse()
+    for name, parser in (('descent', lambda: Parser(table)),
+                         ('climbing', lambda: Parser(table, True)),
+                         ('stack', lambda: Parser(table, stack=True)),
+                         ('table', lambda: TableParser(table))):
+        start = time.perf_counter()
+        result = parser().parse()
+        elapsed = time.perf_counter() - start
+        print(f"  {name}: {elapsed:.2f}s"
+              f"{'' if same_tree(tree, result) else ' DISAGREES'}")
+
+
+def library_source(functions):
+    """
+    Return a program defining the given number of functions, each with a
+    body of loops and branches, which calls only the first of them.
+    """
+    body = ('  i = n\n'
+            '  while i do\n'
+            '    if i - 2 * (i / 2) then\n'
+            '      i = 3 * i + 1\n'
+            '    end\n'
+            '    i = i - 1\n'
+            '  end\n')
+    parts = [f'function f{k}(integer n) returns integer\n  integer i\n' +
+             body * 4 + f'  i + {k}\nend\n'
+             for k in range(functions)]
+    parts.append('f0(10)\n')
+    return ''.join(parts)
+
+
+def bench_lazy(functions=2000):
+    """
+    Compare the time and peak memory of running a program which defines
+    many functions but calls only one, with every function body parsed up
+    front and with bodies parsed on their first call.
+    """
+    text = library_source(int(functions))
+    for lazy in (False, True):
+        tracemalloc.start()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            calc.main(io.StringIO(text), lazy=lazy)
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"{'lazy' if lazy else 'eager'}: {int(functions)} functions, "
+              f"{len(text) >> 10} KB, {elapsed:.2f}s, "
+              f"peak {peak / (1 << 20):.1f} MB")
+
+
+def compiler_workloads(iterations):
+    """
+    Return (name, source) pairs of programs whose loops run about the
+    given number of times: count10.calc and arrayLoop.calc scaled up, a
+    recursive function called in a loop, and a Monte Carlo estimate of pi.
+    """
+    with open(os.path.join(HERE, 'count10.calc'), 'r') as f:
+        count = f.read().replace('x-11', f'x-{iterations + 1}')
+    with open(os.path.join(HERE, 'arrayLoop.calc'), 'r') as f:
+        loop = f.read().replace('[10]', f'[{iterations}]') \
+                       .replace('i-11', f'i-{iterations + 1}')
+    recursive = ('function sum(integer n) returns integer\n'
+                 '  integer r\n'
+                 '  r = 0\n'
+                 '  if n then\n'
+                 '    r = n + sum(n - 1)\n'
+                 '  end\n'
+                 '  r\n'
+                 'end\n'
+                 'integer i\n'
+                 f'i = {max(1, iterations // 50)}\n'
+                 'while i do\n'
+                 '  sum(50)\n'
+                 '  i = i - 1\n'
+                 'end\n')
+    # points are drawn by a Lehmer generator; calc has no comparisons, but
+    # x^2 + y^2 truncates to 0 inside the circle
+    montecarlo = ('function draw(integer seed) returns integer\n'
+                  '  integer q\n'
+                  '  q = seed * 16807 / 2147483647\n'
+                  '  seed * 16807 - q * 2147483647\n'
+                  'end\n'
+                  'integer seed\n'
+                  'integer hits\n'
+                  'integer n\n'
+                  'integer outside\n'
+                  'real x\n'
+                  'real y\n'
+                  'seed = 12345\n'
+                  f'n = {iterations}\n'
+                  'while n do\n'
+                  '  seed = draw(seed)\n'
+                  '  x = seed / 2147483647\n'
+                  '  seed = draw(seed)\n'
+                  '  y = seed / 2147483647\n'
+                  '  outside = x * x + y * y\n'
+                  '  hits = hits + 1 - outside\n'
+                  '  n = n - 1\n'
+                  'end\n'
+                  f'4 * hits / {iterations}\n')
+    return [('count10', count), ('arrayLoop', loop), ('recursive', recursive),
+            ('montecarlo', montecarlo)]
+
+
+def bench_engines(iterations=100000):
+    """
+    Time running programs by walking their trees against walking them
+    with hot loops traced, and running them compiled to closures (with
+    and without lexical addressing), to bytecode, to Python and to native
+    code (compile time included; a program the native backend cannot run
+    is walked).
+    """
+    def traced(tree, env):
+        calc.loop_tracer = CalcTrace.LoopTracer(calc)
+        try:
+            calc.eval_tree(tree, env)
+        finally:
+            calc.loop_tracer = None
+
+    iterations = int(iterations)
+    engines = (('walk', calc.eval_tree),
+               ('traced', traced),
+               ('closures', lambda tree, env: compile_tree(tree)(env)),
+               ('frames', lambda tree, env: CalcResolver.run(tree)),
+               ('vm', lambda tree, env: CalcVM.run(
+                   CalcVM.Compiler('program').program(tree), env)),
+               ('python', CalcTranspile.run),
+               ('native', lambda tree, env: CalcNative.run(tree) or
+                                            calc.eval_tree(tree, env)))
+    stdin = sys.stdin
+    try:
+        for name, source in compiler_workloads(iterations):
+            lexer = Lexer(io.StringIO(source))
+            calc.source_lines = lexer.lines
+            tree = Parser(lexer).parse()
+            times = []
+            for engine, run in engines:
+                sys.stdin = io.StringIO('0\n')
+                out = io.StringIO()
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(out):
+                    run(tree, calc.ReferenceEnvironment())
+                times.append(time.perf_counter() - start)
+                if engine == 'walk':
+                    expected = out.getvalue()
+                elif out.getvalue() != expected:
+                    print(f"  {name}: output DISAGREES")
+            print(f"{name}: " + ', '.join(
+                f"{engine} {t:.2f}s ({times[0] / t:.2f}x)"
+                for (engine, run), t in zip(engines, times)))
+    finally:
+        sys.stdin = stdin
+
+
+def main():
+    benchmarks = {'lexer': bench_lexer, 'tokens': bench_tokens,
+                  'parallel': bench_parallel, 'chains': bench_chains,
+                  'nesting': bench_nesting, 'trees': bench_trees,
+                  'cache': bench_cache, 'incremental': bench_incremental,
+                  'stream': bench_stream, 'parsers': bench_parsers,
+                  'lazy': bench_lazy, 'engines': bench_engines}
+    if len(sys.argv) < 2 or sys.argv[1] not in benchmarks:
+        sys.stderr.write(__doc__)
+        sys.exit(-1)
+    args = [float(a) for a in sys.argv[2:]]
+    benchmarks[sys.argv[1]](*args)
+
+
+if __name__ == '__main__':
+    main()
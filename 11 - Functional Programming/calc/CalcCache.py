@@ -0,0 +1,223 @@
+"""
+On-disk cache of parsed calc programs.
+
+A program's parse tree is packed into arrays and written, along with
+the line index of its source, to __calccache__/<key>.calcc next to the
+source. The key is a hash of the source text and of the toolchain
+(the lexer, parser and cache modules, and the Python version), so any
+change to either one misses the cache. Loading a cached program skips
+lexing and parsing altogether.
+
+Usage: python3 CalcCache.py file.calc
+       Parses file.calc through the cache and prints its tree.
+"""
+from array import array
+import gc
+import hashlib
+import io
+import marshal
+import os
+import sys
+import zlib
+from itertools import accumulate, chain
+import CalcLexer
+import CalcParser
+from CalcLexer import Lexer, LineIndex, TokenDetail, TOKEN_KINDS
+from CalcParser import Parser, ParseTree, OPERATORS
+
+CACHE_DIR = '__calccache__'
+CACHE_SUFFIX = '.calcc'
+
+# bump when the layout of a cache file changes
+FORMAT = 1
+
+# digest of the toolchain, worked out on first use
+toolchain_digest = None
+
+
+def toolchain_version():
+    """
+    Return a digest of everything besides the source which shapes a cached
+    program: the code of the lexer, the parser and this module, and the
+    Python build (which fixes marshal and array layouts).
+    """
+    global toolchain_digest
+    if toolchain_digest is None:
+        digest = hashlib.sha256()
+        digest.update(f"{FORMAT} {sys.version} {sys.byteorder}".encode())
+        for module in (CalcLexer, CalcParser, sys.modules[__name__]):
+            with open(module.__file__, 'rb') as f:
+                digest.update(f.read())
+        toolchain_digest = digest.hexdigest()
+    return toolchain_digest
+
+
+def cache_path(path, source):
+    """
+    Return where the cached program for the given source file and text
+    lives.
+    """
+    digest = hashlib.sha256(toolchain_version().encode())
+    digest.update(source)
+    return os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_DIR,
+                        digest.hexdigest() + CACHE_SUFFIX)
+
+
+def dump(tree, lines):
+    """
+    Serialize a parse tree and the line index of its source to bytes.
+
+    The nodes are listed in preorder as parallel arrays: the operator,
+    the number of children, the token's offset, and the token's kind,
+    lexeme and value as an index into a table of distinct ones (-1 for no
+    token). Offsets and line starts are stored as the difference from the
+    one before, which compresses far better, and then all the arrays are
+    compressed together.
+    """
+    ops = array('B')
+    counts = array('I')
+    entries = array('i')
+    offsets = array('q')
+    table = {}
+
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        ops.append(node.op.value)
+        counts.append(len(node.children))
+        token = node.token
+        if token is None:
+            entries.append(-1)
+            offsets.append(-1)
+        else:
+            entries.append(table.setdefault(token[:3], len(table)))
+            offsets.append(token.offset)
+        stack.extend(reversed(node.children))
+
+    arrays = b''.join(a.tobytes() for a in (ops, counts, entries,
+                                            differences(offsets),
+                                            differences(lines.starts)))
+    return marshal.dumps((FORMAT,
+                          len(ops),
+                          [(int(t[0]),) + t[1:] for t in table],
+                          zlib.compress(arrays)))
+
+
+def differences(values):
+    """
+    Return an array of the differences between successive values (the
+    first taken from 0). accumulate() undoes it.
+    """
+    return array('q', (b - a for a, b in zip(chain((0,), values), values)))
+
+
+def load(data):
+    """
+    Rebuild a parse tree and line index from bytes made by dump. Returns
+    (tree, lines), or raises ValueError if the data is not a cached
+    program.
+    """
+    fields = marshal.loads(data)
+    if not isinstance(fields, tuple) or len(fields) != 4 or \
+       fields[0] != FORMAT:
+        raise ValueError("not a calc cache file")
+    _, count, table, arrays = fields
+
+    # split the arrays back out
+    arrays = zlib.decompress(arrays)
+    columns = []
+    start = 0
+    for typecode in ('B', 'I', 'i', 'q'):
+        column = array(typecode)
+        end = start + count * column.itemsize
+        column.frombytes(arrays[start:end])
+        columns.append(column)
+        start = end
+    ops, counts, entries, offsets = columns
+    offsets = array('q', accumulate(offsets))
+    starts = array('q')
+    starts.frombytes(arrays[start:])
+    lines = LineIndex()
+    lines.starts = array('q', accumulate(starts))
+
+    # rebuild the tree
+    table = [(TOKEN_KINDS[t[0]],) + tuple(t[1:]) for t in table]
+    gc_was_enabled = gc.isenabled()
+    gc.disable()    # the tree has no cycles, so don't scan it as it grows
+    try:
+        root = build_tree(ops, counts, entries, offsets, table)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return root, lines
+
+
+def build_tree(ops, counts, entries, offsets, table):
+    """
+    Build the ParseTree nodes listed in preorder by the arrays, returning
+    the root. Each node is hung on the innermost node which still has
+    children to come.
+    """
+    root = None
+    pending = []
+    for op, n, entry, offset in zip(ops, counts, entries, offsets):
+        token = TokenDetail(*table[entry], offset) if entry >= 0 else None
+        node = ParseTree(OPERATORS[op], token)
+        if pending:
+            parent = pending[-1]
+            parent[0].children.append(node)
+            parent[1] -= 1
+            if not parent[1]:
+                pending.pop()
+        else:
+            root = node
+        if n:
+            pending.append([node, n])
+    return root
+
+
+def parse_file(path, climbing=False):
+    """
+    Return (tree, lines): the ParseTree of the program in the file at path
+    and the LineIndex of its source. The tree comes from the cache when it
+    can, otherwise the program is parsed and the cache written. Failing to
+    write the cache is not an error.
+    """
+    with open(path, 'rb') as f:
+        source = f.read()
+    cached = cache_path(path, source)
+
+    # warm start
+    try:
+        with open(cached, 'rb') as f:
+            return load(f.read())
+    except (OSError, ValueError, EOFError, TypeError, IndexError, KeyError,
+            zlib.error):
+        pass
+
+    # cold start, reading the text as open(path, 'r') would, newlines
+    # translated
+    text = io.TextIOWrapper(io.BytesIO(source))
+    table = Lexer(text).tokenize_all()
+    tree = Parser(table, climbing).parse()
+    try:
+        os.makedirs(os.path.dirname(cached), exist_ok=True)
+        temp = f"{cached}.{os.getpid()}"
+        with open(temp, 'wb') as f:
+            f.write(dump(tree, table.lines))
+        os.replace(temp, cached)
+    except OSError:
+        pass
+    return tree, table.lines
+
+
+def main():
+    if len(sys.argv) != 2:
+        sys.stderr.write(__doc__)
+        sys.exit(-1)
+    tree, lines = parse_file(sys.argv[1])
+    tree.print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,423 @@
+"""
+Closure compiler for calc.
+
+compile_tree() turns a parse tree into a Python closure which runs it:
+each node is visited once, the closure for its operator is built with the
+closures of its children captured directly, and anything which can be
+worked out from the tree alone (symbol ids, declared types, array bounds,
+literal operands) is worked out then. Running the program is then just
+calls from closure to closure, without eval_tree's chain of operator tests
+on every node visited. The closures keep the tree walker's semantics and
+error messages, and use its runtime objects, so compiled functions and
+values are the same CalcFunctions, CalcClosures and RefEntries.
+
+Function bodies are compiled with the function, except a body which the
+parser left unparsed (Parser(lazy=True)); that is compiled on its first
+call.
+
+Usage: python3 CalcCompiler.py [--lazy] [file.calc]
+"""
+import operator
+import sys
+import calc
+from calc import CalcArray, CalcClosure, CalcFunction, RefEntry, RefType, \
+                 ReferenceEnvironment, declare_name, runtime_error
+from CalcLexer import Lexer, Token
+from CalcParser import Parser, Operator, LazyProgram
+
+
+def compile_tree(tree):
+    """
+    Return a closure which runs tree in the environment it is given, as
+    eval_tree(tree, env) would.
+    """
+    compiler = COMPILERS.get(tree.op)
+    if compiler is None:
+        return lambda env: None
+    return compiler(tree)
+
+
+def compile_program(tree):
+    statements = tuple(compile_tree(child) for child in tree.children)
+
+    def program(env):
+        # print the result of every statement that returns a result
+        result = None
+        for statement in statements:
+            value = statement(env)
+            if value is not None:
+                result = value
+                print(result)
+
+        # create closures if we are returning functions
+        if type(result) == CalcFunction:
+            result = CalcClosure(result, env)
+        return result
+    return program
+
+
+# Binary operators and the functions which apply them
+BINARY_OPERATORS = {Operator.ADD: operator.add,
+                    Operator.SUB: operator.sub,
+                    Operator.MUL: operator.mul,
+                    Operator.DIV: operator.truediv,
+                    Operator.POW: operator.pow}
+
+def compile_binary(tree):
+    apply = BINARY_OPERATORS[tree.op]
+    left, right = tree.children
+
+    # a literal operand is captured as its value
+    if right.op == Operator.LIT:
+        value = right.token.value
+        left = compile_tree(left)
+        return lambda env: apply(left(env), value)
+    if left.op == Operator.LIT:
+        value = left.token.value
+        right = compile_tree(right)
+        return lambda env: apply(value, right(env))
+    left = compile_tree(left)
+    right = compile_tree(right)
+    return lambda env: apply(left(env), right(env))
+
+
+def compile_neg(tree):
+    left = compile_tree(tree.children[0])
+    return lambda env: -left(env)
+
+
+def compile_lit(tree):
+    value = tree.token.value
+    return lambda env: value
+
+
+def compile_var(tree):
+    sym = tree.token.value
+
+    def var(env):
+        val = env.get(sym)
+        if val is None:
+            runtime_error(tree, f"Undefined Variable '{tree.token.lexeme}'")
+        return val.value
+    return var
+
+
+def compile_array_var(tree):
+    var = compile_var(tree)
+    index = compile_index(tree)
+    return lambda env: var(env).get(index(env))
+
+
+def compile_index(tree):
+    """
+    Return a closure which computes the index list of an array reference.
+    """
+    index = tuple(compile_tree(t) for t in tree.children)
+    return lambda env: [i(env) for i in index]
+
+
+def compile_input(tree):
+    # input reads a line and is never hot, so it is left to the tree walker
+    return lambda env: calc.eval_input(tree, env)
+
+
+def compile_assign(tree):
+    target = tree.children[0]
+    if target.op == Operator.REC_ACCESS:
+        # record access
+        record, target = compile_record_env(target)
+    else:
+        # variable assignment
+        record = None
+    sym = target.token.value
+    value_of = compile_tree(tree.children[1])
+    index = compile_index(target) if target.op == Operator.ARRAY_VAR else None
+    simple = target.op == Operator.VAR
+
+    def assign(env):
+        # lookup the variable
+        var_env = record(env) if record else env
+        var = var_env.get(sym)
+        if var is None:
+            name = target.token.lexeme
+            runtime_error(tree, f"Assignment to undeclared variable {name}")
+
+        value = value_of(env)
+
+        # coerce the value
+        if var.ref_type == RefType.INT_VAR:
+            value = int(value)
+        elif var.ref_type == RefType.REAL_VAR:
+            value = float(value)
+        elif var.ref_type == RefType.FUNCTION_VAR:
+            # type coercion and checking for assignment
+            if type(value) == CalcClosure:
+                # nothing to do
+                pass
+            elif type(value) == CalcFunction:
+                value = CalcClosure(value, env)
+            else:
+                runtime_error(tree, f"Invalid assignment of non-function to function variable")
+
+        if simple:
+            var.value = value
+        elif index:
+            var.value.set(index(var_env), value)
+    return assign
+
+
+def compile_record_env(tree):
+    """
+    Compile a record access being assigned to. Returns (closure, field),
+    where the closure finds the environment of the final record and field
+    is the tree of the field being accessed, as get_record_env does.
+    """
+    record = compile_tree(tree.children[0])
+    field = tree.children[1]
+    if field.op == Operator.REC_ACCESS:
+        inner, field = compile_record_env(field)
+        return (lambda env: inner(record(env))), field
+    return record, field
+
+
+def compile_decl(tree):
+    # get the type
+    if tree.token.token == Token.INTEGER:
+        ref_type = RefType.INT_VAR
+        init = 0
+    elif tree.token.token == Token.REAL:
+        ref_type = RefType.REAL_VAR
+        init = 0.0
+    elif tree.token.token == Token.FUNCTION_VAR:
+        ref_type = RefType.FUNCTION_VAR
+        init = None
+
+    # get the name
+    name = tree.children[0].token
+
+    def decl(env):
+        declare_name(tree, name.value, name.lexeme, RefEntry(init, ref_type),
+                     env)
+    return decl
+
+
+def compile_array_decl(tree):
+    # get the array parameters
+    ref_type = tree.token.token
+    bounds = tree.children[0].children
+    name = tree.children[1].token
+
+    # convert the bound list
+    bound_list = []
+    for i in range(0, len(bounds), 2):
+        bound_list.append((bounds[i].token.value, bounds[i+1].token.value))
+
+    def array_decl(env):
+        value = RefEntry(CalcArray(bound_list, ref_type), RefType.ARRAY_VAR)
+        declare_name(tree, name.value, name.lexeme, value, env)
+    return array_decl
+
+
+def compile_rec_def(tree):
+    return lambda env: calc.eval_rec_def(tree, env)
+
+
+def compile_rec_decl(tree):
+    return lambda env: calc.eval_rec_decl(tree, env)
+
+
+def compile_rec_access(tree):
+    record = compile_tree(tree.children[0])
+    field = compile_tree(tree.children[1])
+    return lambda env: field(record(env))
+
+
+def compile_if(tree):
+    condition = compile_tree(tree.children[0])
+    body = compile_tree(tree.children[1])
+
+    def branch(env):
+        if condition(env) != 0:
+            body(env)
+    return branch
+
+
+def compile_while(tree):
+    condition = compile_tree(tree.children[0])
+    body = compile_tree(tree.children[1])
+
+    def loop(env):
+        while condition(env) != 0:
+            body(env)
+    return loop
+
+
+def return_type(tree):
+    """
+    Return the RefType of a FUNTYPE node.
+    """
+    tok = tree.token.token
+    if tok == Token.INTEGER:
+        return RefType.INT_VAR
+    elif tok == Token.REAL:
+        return RefType.REAL_VAR
+    elif tok == Token.FUNCTION_VAR:
+        return RefType.FUNCTION_VAR
+
+
+def compile_function(params, body):
+    """
+    Compile a function's parameters and body into the (binders, body)
+    pair kept as its CalcFunction's code.
+    """
+    binders = tuple(compile_parameter(p) for p in params)
+    if not isinstance(body, LazyProgram) or body.parsed:
+        return binders, compile_tree(body)
+
+    # compile a body which has not been parsed yet on the first call
+    code = None
+
+    def run(env):
+        nonlocal code
+        if code is None:
+            code = compile_tree(body)
+        return code(env)
+    return binders, run
+
+
+def compile_parameter(p):
+    """
+    Return a closure which binds parameter p in the local environment of
+    a call, given the call, the local environment, the argument's closure
+    and tree, and the caller's environment.
+    """
+    if p.op == Operator.DECL:
+        # this is by copy of evaluation (pass by value)
+        decl = compile_decl(p)
+        sym = p.children[0].token.value
+
+        def bind(call, local, arg, arg_tree, env):
+            decl(local)
+            local.get(sym).value = arg(env)
+        return bind
+
+    # pass by reference
+    name = p.children[1].token.lexeme
+    sym = p.children[1].token.value
+
+    def bind(call, local, arg, arg_tree, env):
+        value = env.get(arg_tree)
+        if value is None:
+            runtime_error(call, f"Error binding {name}")
+        declare_name(call, sym, name, value, local)
+    return bind
+
+
+def compile_fundef(tree):
+    name = tree.children[0].token
+    params = tree.children[1].children
+    ref_type = return_type(tree.children[2])
+    body = tree.children[3]
+    code = compile_function(params, body)
+
+    def fundef(env):
+        f = CalcFunction(params, ref_type, body, code)
+        declare_name(tree, name.value, name.lexeme,
+                     RefEntry(f, RefType.FUNCTION), env)
+    return fundef
+
+
+def compile_funcall(tree):
+    callee = compile_tree(tree.children[0])
+    arg_trees = tuple(tree.children[1].children)
+    args = tuple(compile_tree(a) for a in arg_trees)
+    count = len(args)
+
+    def funcall(env):
+        # retrieve the function
+        fun = callee(env)
+        if type(fun) == CalcClosure:
+            fun_env = fun.env
+            fun = fun.function
+        else:
+            if type(fun) != CalcFunction:
+                name = tree.children[0].token.lexeme
+                runtime_error(tree, f"{name} is not a function.")
+            fun_env = env
+
+        # verify the number of arguments
+        if count != len(fun.parameters):
+            name = tree.children[0].token.lexeme
+            runtime_error(tree, f"Incorrect number of arguments to {name}")
+
+        # create the local environment and bind the arguments
+        local = ReferenceEnvironment(fun_env)
+        binders, body = fun.code
+        for i in range(count):
+            binders[i](tree, local, args[i], arg_trees[i], env)
+
+        # run the function on the local environment
+        result = body(local)
+        if fun.return_type == RefType.INT_VAR:
+            result = int(result)
+        elif fun.return_type == RefType.REAL_VAR:
+            result = float(result)
+        return result
+    return funcall
+
+
+def compile_lambda(tree):
+    params = tree.children[0].children
+    ref_type = return_type(tree.children[1])
+    body = tree.children[2]
+    code = compile_function(params, body)
+    return lambda env: CalcClosure(CalcFunction(params, ref_type, body, code),
+                                   env)
+
+
+COMPILERS = {Operator.PROG: compile_program,
+             Operator.ADD: compile_binary,
+             Operator.SUB: compile_binary,
+             Operator.MUL: compile_binary,
+             Operator.DIV: compile_binary,
+             Operator.POW: compile_binary,
+             Operator.NEG: compile_neg,
+             Operator.LIT: compile_lit,
+             Operator.VAR: compile_var,
+             Operator.ASSIGN: compile_assign,
+             Operator.INPUT: compile_input,
+             Operator.DECL: compile_decl,
+             Operator.ARRAY_DECL: compile_array_decl,
+             Operator.ARRAY_VAR: compile_array_var,
+             Operator.REC_DEF: compile_rec_def,
+             Operator.REC_DECL: compile_rec_decl,
+             Operator.REC_ACCESS: compile_rec_access,
+             Operator.IF: compile_if,
+             Operator.WHILE: compile_while,
+             Operator.FUNDEF: compile_fundef,
+             Operator.FUNCALL: compile_funcall,
+             Operator.LAMBDA: compile_lambda}
+
+
+def main(file, lazy=False):
+    """
+    Parse, compile and run a program.
+    """
+    lexer = Lexer(file)
+    calc.source_lines = lexer.lines
+    if lazy:
+        lexer = lexer.tokenize_all()
+    tree = Parser(lexer, lazy=lazy).parse()
+    compile_tree(tree)(ReferenceEnvironment())
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    lazy = '--lazy' in args
+    if lazy:
+        args.remove('--lazy')
+    if len(args) == 1:
+        file = open(args[0], 'r')
+    else:
+        file = sys.stdin
+    main(file, lazy)
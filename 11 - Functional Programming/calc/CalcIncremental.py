@@ -0,0 +1,266 @@
+"""
+Incremental front end for editing calc programs.
+
+An IncrementalProgram keeps the source as a list of lines, cut into
+segments: runs of whole lines holding one top level statement (a simple
+statement, or a whole if/while/function/record block), together with
+any comments and blank lines which follow it. Each segment keeps its own
+parse trees and syntax errors. An edit re-lexes and re-parses only the
+segments holding the edited lines, and splices the new trees into the
+PROG node, so the cost of an edit follows the size of the statement being
+edited rather than the size of the file.
+
+If the edited lines no longer end on a statement boundary (say a block
+was opened but not closed, or a comment was put after the last
+statement, which joins it to the next line), the following segments are
+pulled in, a growing number at a time, until the parse closes or the file
+ends.
+
+The tokens in a segment's trees have offsets counted from the start of
+the segment; position() turns them into a line and column in the file.
+
+Usage: python3 CalcIncremental.py file.calc
+       Loads file.calc, then applies edits read from stdin, one per line,
+       as "line col end_line end_col text" (text may use \\n), printing
+       the tree and any errors after each one.
+"""
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+import io
+import sys
+from CalcLexer import Lexer, LineIndex, SymbolTable, Token
+from CalcParser import Parser, ParseTree, Operator
+
+
+class Segment:
+    """
+    A run of whole lines of source. count is the number of lines, trees
+    the statements parsed from them, lines their LineIndex and errors
+    their ParseErrors, all counted from the start of the segment.
+    """
+    __slots__ = ('count', 'trees', 'lines', 'errors')
+
+    def __init__(self, count, lines):
+        self.count = count
+        self.trees = []
+        self.lines = lines
+        self.errors = []
+
+
+def text_lines(text):
+    """
+    Split text into lines, each keeping its newline. Only '\n' ends a
+    line, as it does for the lexer (str.splitlines also breaks on '\f',
+    '\x85', '\u2028' and others, which would throw the offsets out).
+    """
+    lines = [line + '\n' for line in text.split('\n')]
+    lines[-1] = lines[-1][:-1]
+    if not lines[-1]:
+        lines.pop()
+    return lines
+
+
+def parse_segments(lines, symbols):
+    """
+    Parse a list of whole lines into a list of Segments, interning ids in
+    symbols. Returns (segments, complete), where complete is false if the
+    lines ran out in the middle of a statement.
+    """
+    text = ''.join(lines)
+    table = Lexer(io.StringIO(text), symbols=symbols).tokenize_all()
+    reader = table.reader()
+    parser = Parser(reader, stack=True, recover=True)
+    index = reader.lines
+
+    # a comment takes its newline with it, so a statement with a comment
+    # after it runs on into the next line; if the lines end that way the
+    # last statement is not finished
+    complete = len(table) < 2 or table.kinds[-2] == Token.NEWLINE
+
+    # parse the statements, starting a new segment whenever a statement
+    # comes straight after a newline, so begins a line of its own
+    segments = []
+    starts = []
+    while not parser.done():
+        offset = reader.get_token().offset
+        k = bisect_left(table.offsets, offset)
+        if not segments or table.kinds[k - 1] == Token.NEWLINE:
+            line, col = index.line_col(offset)
+            segments.append(Segment(0, None))
+            starts.append(line)
+
+        errors = len(parser.errors)
+        tree = parser.parse_statement()
+        if tree:
+            segments[-1].trees.append(tree)
+        for error in parser.errors[errors:]:
+            complete = complete and error.token.token != Token.EOF
+            segments[-1].errors.append(error)
+
+    # lines before the first statement go with it, and a file of nothing
+    # but comments is one segment with no statements
+    if not segments and lines:
+        segments.append(Segment(0, None))
+        starts.append(1)
+    if starts:
+        starts[0] = 1
+    starts.append(len(lines) + 1)
+
+    # move each segment's positions to count from its own start
+    for k, segment in enumerate(segments):
+        first, end = starts[k], starts[k + 1]
+        base = index.starts[first - 1]
+        segment.count = end - first
+        segment.lines = LineIndex()
+        segment.lines.starts = array('q', (s - base for s in
+                                           index.starts[first - 1:end - 1]))
+        for tree in segment.trees:
+            rebase(tree, base)
+        for error in segment.errors:
+            error.line -= first - 1
+    return segments, complete
+
+
+def rebase(tree, base):
+    """
+    Move the offsets of the tokens in tree back by base, in place.
+    """
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if node.token is not None:
+            node.token = node.token._replace(offset=node.token.offset - base)
+        stack.extend(node.children)
+
+
+class IncrementalProgram:
+    """
+    A calc program which is parsed once and then kept up to date as it is
+    edited. tree is the program's PROG node; it stays the same object
+    across edits. Every segment interns its ids in the one SymbolTable,
+    symbols, so ids mean the same thing throughout the tree.
+    """
+    def __init__(self, text=""):
+        self.symbols = SymbolTable()
+        self.__lines = text_lines(text)
+        self.__segments, complete = parse_segments(self.__lines,
+                                                   self.symbols)
+        self.__index()
+        self.tree = ParseTree(Operator.PROG,
+                              children=[t for s in self.__segments
+                                        for t in s.trees])
+
+    @property
+    def text(self):
+        return ''.join(self.__lines)
+
+    @property
+    def errors(self):
+        """
+        The syntax errors in the program, as (line, column, message)
+        tuples.
+        """
+        result = []
+        for start, segment in zip(self.__starts, self.__segments):
+            for error in segment.errors:
+                result.append((start + error.line, error.col, error.message))
+        return result
+
+    def position(self, statement, node):
+        """
+        Return the (line, column) in the file of the token of node, which
+        belongs to the given top level statement (an index into
+        tree.children).
+        """
+        k = bisect_right(self.__tree_starts, statement) - 1
+        line, col = self.__segments[k].lines.line_col(node.token.offset)
+        return self.__starts[k] + line, col
+
+    def edit(self, line, col, end_line, end_col, text):
+        """
+        Replace the text from (line, col) up to (end_line, end_col) with
+        text. Lines and columns count from 1, as in LineIndex, and the
+        position just past the final newline is the start of line count+1.
+        """
+        lines = self.__lines
+        first = line - 1
+        last = min(end_line, len(lines))
+        start_text = lines[first] if first < len(lines) else ""
+        end_text = lines[end_line - 1] if end_line <= len(lines) else ""
+        new = text_lines(start_text[:col - 1] + text +
+                         end_text[end_col - 1:])
+
+        # find the segments holding the replaced lines; text added at the
+        # very end may finish the last statement, so that is parsed again
+        i = self.__find(first)
+        j = self.__find(last - 1) + 1 if last > first else i
+        if i == len(self.__segments) and i:
+            i -= 1
+        j = min(max(j, i + 1), len(self.__segments))
+
+        lines[first:last] = new
+        end = self.__starts[j] + len(new) - (last - first)
+        self.__reparse(i, j, self.__starts[i], end)
+
+    def __reparse(self, i, j, start, end):
+        """
+        Replace segments i to j, which now cover lines start to end
+        (counted from 0), by parsing those lines again. While the parse
+        stops in the middle of a statement, pull in more segments.
+        """
+        more = 1
+        while True:
+            segments, complete = parse_segments(self.__lines[start:end],
+                                                self.symbols)
+            if complete or j >= len(self.__segments):
+                break
+            for segment in self.__segments[j:j + more]:
+                end += segment.count
+            j = min(j + more, len(self.__segments))
+            more *= 2
+
+        # splice the new trees into the program
+        first = self.__tree_starts[i]
+        self.tree.children[first:self.__tree_starts[j]] = \
+            [t for s in segments for t in s.trees]
+        self.__segments[i:j] = segments
+        self.__index()
+
+    def __index(self):
+        """
+        Work out the line (from 0) each segment starts on and the index of
+        its first statement in tree.children.
+        """
+        self.__starts = [0]
+        self.__starts.extend(accumulate(s.count for s in self.__segments))
+        self.__tree_starts = [0]
+        self.__tree_starts.extend(accumulate(len(s.trees)
+                                             for s in self.__segments))
+
+    def __find(self, line):
+        """
+        Return the index of the segment holding line (counted from 0), or
+        the number of segments if it is past the end.
+        """
+        return bisect_right(self.__starts, line, 0, len(self.__segments)) - 1 \
+               if line < self.__starts[-1] else len(self.__segments)
+
+
+def main():
+    if len(sys.argv) != 2:
+        sys.stderr.write(__doc__)
+        sys.exit(-1)
+    with open(sys.argv[1], 'r') as f:
+        program = IncrementalProgram(f.read())
+    for command in sys.stdin:
+        line, col, end_line, end_col, text = command.rstrip('\n').split(' ', 4)
+        program.edit(int(line), int(col), int(end_line), int(end_col),
+                     text.replace('\\n', '\n'))
+        program.tree.print()
+        for error in program.errors:
+            print("%d:%d: %s" % error)
+
+
+if __name__ == '__main__':
+    main()
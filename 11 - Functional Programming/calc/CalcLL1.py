@@ -0,0 +1,139 @@
+"""
+LL(1) parse table for the calc language.
+
+Generated by CalcParseGen.py from calc.bnf -- do not edit.
+"""
+
+# the nonterminal a program derives from
+START = 'Program'
+
+# productions as (nonterminal, symbols); symbols which are not
+# nonterminals are token names
+PRODUCTIONS = (
+    ('Program', ('Statements',)),
+    ('Statements', ('Statement', 'Statements')),
+    ('Statements', ()),
+    ('Statement', ('Input', 'Statement-End')),
+    ('Statement', ('Var-Decl', 'Statement-End')),
+    ('Statement', ('NEWLINE',)),
+    ('Statement', ('Id-Ref', "Statement'", 'Statement-End')),
+    ('Statement', ('Record-Decl', 'Statement-End')),
+    ('Statement', ('Branch', 'Statement-End')),
+    ('Statement', ('Loop', 'Statement-End')),
+    ('Statement', ('Function-Definition', 'Statement-End')),
+    ('Statement', ('Expression', 'Statement-End')),
+    ('Statement-End', ('NEWLINE',)),
+    ('Statement-End', ('EOF',)),
+    ("Statement'", ('EQUAL', 'Expression')),
+    ("Statement'", ("Term'", "Expression'")),
+    ('Function-Definition', ('FUNCTION', 'ID', 'LPAREN', 'Parameter-List', 'RPAREN', 'RETURNS', 'Return-Type', 'Program', 'END')),
+    ('Return-Type', ('Simple-Type',)),
+    ('Return-Type', ('FUNCTION_VAR',)),
+    ('Parameter-List', ('Parameter', "Parameter-List'")),
+    ("Parameter-List'", ('COMMA', 'Parameter', "Parameter-List'")),
+    ("Parameter-List'", ()),
+    ('Parameter', ('Array-Decl',)),
+    ('Parameter', ('RECORD', 'ID', 'ID')),
+    ('Parameter', ('Simple-Type', 'ID')),
+    ('Parameter', ('FUNCTION_VAR', 'ID')),
+    ('Branch', ('IF', 'Expression', 'THEN', 'NEWLINE', 'Program', 'END')),
+    ('Loop', ('WHILE', 'Expression', 'DO', 'NEWLINE', 'Program', 'END')),
+    ('Input', ('INPUT', 'Ref')),
+    ('Var-Decl', ('Simple-Type', 'ID')),
+    ('Var-Decl', ('Array-Decl', 'ID')),
+    ('Var-Decl', ('FUNCTION_VAR', 'ID')),
+    ('Array-Decl', ('ARRAY', 'OF', 'Array-Type', 'WITH', 'BOUNDS', 'Array-Bounds')),
+    ('Array-Bounds', ('LBRACKET', 'Bounds-List', 'RBRACKET')),
+    ('Bounds-List', ('Bound', "Bounds-List'")),
+    ("Bounds-List'", ('COMMA', 'Bound', "Bounds-List'")),
+    ("Bounds-List'", ()),
+    ('Bound', ('INTLIT', "Bound'")),
+    ("Bound'", ('BSEP', 'INTLIT')),
+    ("Bound'", ()),
+    ('Simple-Type', ('INTEGER',)),
+    ('Simple-Type', ('REAL',)),
+    ('Array-Type', ('Simple-Type',)),
+    ('Array-Type', ('RECORD', 'ID')),
+    ('Record-Decl', ('RECORD', 'ID', "Record-Decl'")),
+    ("Record-Decl'", ('ID',)),
+    ("Record-Decl'", ('NEWLINE', 'Field-List', 'END')),
+    ('Field-List', ('Field-Decl', 'NEWLINE', 'Field-List')),
+    ('Field-List', ()),
+    ('Field-Decl', ('Var-Decl',)),
+    ('Field-Decl', ('RECORD', 'ID', 'ID')),
+    ('Expression', ('Term', "Expression'")),
+    ("Expression'", ('PLUS', 'Term', "Expression'")),
+    ("Expression'", ('MINUS', 'Term', "Expression'")),
+    ("Expression'", ()),
+    ('Term', ('Factor', "Term'")),
+    ("Term'", ('TIMES', 'Factor', "Term'")),
+    ("Term'", ('DIVIDE', 'Factor', "Term'")),
+    ("Term'", ()),
+    ('Factor', ('Exp', "Factor'")),
+    ("Factor'", ('POW', 'Factor')),
+    ("Factor'", ()),
+    ('Exp', ('LPAREN', 'Expression', 'RPAREN')),
+    ('Exp', ('MINUS', 'Exp')),
+    ('Exp', ('Number',)),
+    ('Exp', ('Ref',)),
+    ('Number', ('INTLIT',)),
+    ('Number', ('FLOATLIT',)),
+    ('Ref', ('Id-Ref',)),
+    ('Ref', ('Lambda-Expression', "Ref'")),
+    ('Id-Ref', ('ID', "Ref'")),
+    ("Ref'", ('LBRACKET', 'Arg-List', 'RBRACKET', 'Ref-Access')),
+    ("Ref'", ('Ref-Access',)),
+    ('Ref-Access', ('DOT', 'Ref')),
+    ('Ref-Access', ('LPAREN', 'Arg-List', 'RPAREN')),
+    ('Ref-Access', ()),
+    ('Arg-List', ('Expression', "Arg-List'")),
+    ("Arg-List'", ('COMMA', 'Expression', "Arg-List'")),
+    ("Arg-List'", ()),
+    ('Lambda-Expression', ('LAMBDA', 'LPAREN', 'Parameter-List', 'RPAREN', 'RETURNS', 'Return-Type', 'Expression')),
+)
+
+# TABLE[nonterminal][token] is the production to expand the
+# nonterminal by when token is on lookahead
+TABLE = {
+    'Program': {'ARRAY': 0, 'END': 0, 'EOF': 0, 'FLOATLIT': 0, 'FUNCTION': 0, 'FUNCTION_VAR': 0, 'ID': 0, 'IF': 0, 'INPUT': 0, 'INTEGER': 0, 'INTLIT': 0, 'LAMBDA': 0, 'LPAREN': 0, 'MINUS': 0, 'NEWLINE': 0, 'REAL': 0, 'RECORD': 0, 'WHILE': 0},
+    'Statements': {'ARRAY': 1, 'FLOATLIT': 1, 'FUNCTION': 1, 'FUNCTION_VAR': 1, 'ID': 1, 'IF': 1, 'INPUT': 1, 'INTEGER': 1, 'INTLIT': 1, 'LAMBDA': 1, 'LPAREN': 1, 'MINUS': 1, 'NEWLINE': 1, 'REAL': 1, 'RECORD': 1, 'WHILE': 1, 'END': 2, 'EOF': 2},
+    'Statement': {'INPUT': 3, 'ARRAY': 4, 'FUNCTION_VAR': 4, 'INTEGER': 4, 'REAL': 4, 'NEWLINE': 5, 'ID': 6, 'RECORD': 7, 'IF': 8, 'WHILE': 9, 'FUNCTION': 10, 'FLOATLIT': 11, 'INTLIT': 11, 'LAMBDA': 11, 'LPAREN': 11, 'MINUS': 11},
+    'Statement-End': {'NEWLINE': 12, 'EOF': 13},
+    "Statement'": {'EQUAL': 14, 'DIVIDE': 15, 'EOF': 15, 'MINUS': 15, 'NEWLINE': 15, 'PLUS': 15, 'TIMES': 15},
+    'Function-Definition': {'FUNCTION': 16},
+    'Return-Type': {'INTEGER': 17, 'REAL': 17, 'FUNCTION_VAR': 18},
+    'Parameter-List': {'ARRAY': 19, 'FUNCTION_VAR': 19, 'INTEGER': 19, 'REAL': 19, 'RECORD': 19},
+    "Parameter-List'": {'COMMA': 20, 'RPAREN': 21},
+    'Parameter': {'ARRAY': 22, 'RECORD': 23, 'INTEGER': 24, 'REAL': 24, 'FUNCTION_VAR': 25},
+    'Branch': {'IF': 26},
+    'Loop': {'WHILE': 27},
+    'Input': {'INPUT': 28},
+    'Var-Decl': {'INTEGER': 29, 'REAL': 29, 'ARRAY': 30, 'FUNCTION_VAR': 31},
+    'Array-Decl': {'ARRAY': 32},
+    'Array-Bounds': {'LBRACKET': 33},
+    'Bounds-List': {'INTLIT': 34},
+    "Bounds-List'": {'COMMA': 35, 'RBRACKET': 36},
+    'Bound': {'INTLIT': 37},
+    "Bound'": {'BSEP': 38, 'COMMA': 39, 'RBRACKET': 39},
+    'Simple-Type': {'INTEGER': 40, 'REAL': 41},
+    'Array-Type': {'INTEGER': 42, 'REAL': 42, 'RECORD': 43},
+    'Record-Decl': {'RECORD': 44},
+    "Record-Decl'": {'ID': 45, 'NEWLINE': 46},
+    'Field-List': {'ARRAY': 47, 'FUNCTION_VAR': 47, 'INTEGER': 47, 'REAL': 47, 'RECORD': 47, 'END': 48},
+    'Field-Decl': {'ARRAY': 49, 'FUNCTION_VAR': 49, 'INTEGER': 49, 'REAL': 49, 'RECORD': 50},
+    'Expression': {'FLOATLIT': 51, 'ID': 51, 'INTLIT': 51, 'LAMBDA': 51, 'LPAREN': 51, 'MINUS': 51},
+    "Expression'": {'PLUS': 52, 'MINUS': 53, 'COMMA': 54, 'DIVIDE': 54, 'DO': 54, 'DOT': 54, 'EOF': 54, 'EQUAL': 54, 'LBRACKET': 54, 'LPAREN': 54, 'NEWLINE': 54, 'POW': 54, 'RBRACKET': 54, 'RPAREN': 54, 'THEN': 54, 'TIMES': 54},
+    'Term': {'FLOATLIT': 55, 'ID': 55, 'INTLIT': 55, 'LAMBDA': 55, 'LPAREN': 55, 'MINUS': 55},
+    "Term'": {'TIMES': 56, 'DIVIDE': 57, 'COMMA': 58, 'DO': 58, 'DOT': 58, 'EOF': 58, 'EQUAL': 58, 'LBRACKET': 58, 'LPAREN': 58, 'MINUS': 58, 'NEWLINE': 58, 'PLUS': 58, 'POW': 58, 'RBRACKET': 58, 'RPAREN': 58, 'THEN': 58},
+    'Factor': {'FLOATLIT': 59, 'ID': 59, 'INTLIT': 59, 'LAMBDA': 59, 'LPAREN': 59, 'MINUS': 59},
+    "Factor'": {'POW': 60, 'COMMA': 61, 'DIVIDE': 61, 'DO': 61, 'DOT': 61, 'EOF': 61, 'EQUAL': 61, 'LBRACKET': 61, 'LPAREN': 61, 'MINUS': 61, 'NEWLINE': 61, 'PLUS': 61, 'RBRACKET': 61, 'RPAREN': 61, 'THEN': 61, 'TIMES': 61},
+    'Exp': {'LPAREN': 62, 'MINUS': 63, 'FLOATLIT': 64, 'INTLIT': 64, 'ID': 65, 'LAMBDA': 65},
+    'Number': {'INTLIT': 66, 'FLOATLIT': 67},
+    'Ref': {'ID': 68, 'LAMBDA': 69},
+    'Id-Ref': {'ID': 70},
+    "Ref'": {'LBRACKET': 71, 'COMMA': 72, 'DIVIDE': 72, 'DO': 72, 'DOT': 72, 'EOF': 72, 'EQUAL': 72, 'LPAREN': 72, 'MINUS': 72, 'NEWLINE': 72, 'PLUS': 72, 'POW': 72, 'RBRACKET': 72, 'RPAREN': 72, 'THEN': 72, 'TIMES': 72},
+    'Ref-Access': {'DOT': 73, 'LPAREN': 74, 'COMMA': 75, 'DIVIDE': 75, 'DO': 75, 'EOF': 75, 'EQUAL': 75, 'LBRACKET': 75, 'MINUS': 75, 'NEWLINE': 75, 'PLUS': 75, 'POW': 75, 'RBRACKET': 75, 'RPAREN': 75, 'THEN': 75, 'TIMES': 75},
+    'Arg-List': {'FLOATLIT': 76, 'ID': 76, 'INTLIT': 76, 'LAMBDA': 76, 'LPAREN': 76, 'MINUS': 76},
+    "Arg-List'": {'COMMA': 77, 'RBRACKET': 78, 'RPAREN': 78},
+    'Lambda-Expression': {'LAMBDA': 79},
+}
@@ -0,0 +1,371 @@
+"""
+Lexer generator for the calc language.
+
+Reads the "Lexer Grammar" token table from a calc.bnf file and writes a
+Python module holding a minimized DFA for it as transition arrays. The
+DFALexer in CalcLexer runs the generated tables.
+
+Usage: python3 CalcLexGen.py [calc.bnf] [CalcDFA.py]
+
+Patterns in the token table are a sequence of whitespace separated
+elements. An element is the name of a token defined above it, a single
+literal character, or a small regular expression made of literal
+characters, escapes (\\n, \\t, \\x20), character classes ([a-z], [^\\n]) and the
+postfix operators *, + and ?. Any trailing "(...)" is a comment.
+
+When two tokens match the same text, tokens whose pattern is a fixed
+string (keywords, punctuation) win over patterned tokens (ID), and then
+the token listed first wins. Whitespace is skipped, and so is COMMENT,
+which runs to the end of the line and takes the newline with it.
+"""
+import re
+import sys
+
+# we scan ASCII; anything else is treated like a character no token uses
+ALPHABET = 128
+
+# tokens which are described in prose rather than as a pattern
+PROSE_PATTERNS = {'COMMENT': '#[^\\n]*\\n?'}
+
+# tokens which are matched but never returned
+SKIP = ('SPACE', 'COMMENT')
+SPACE_PATTERN = '[\\x20\\t]+'
+
+
+def read_token_table(path):
+    """
+    Return a list of (name, pattern) pairs from the "Lexer Grammar"
+    section of the bnf file at path.
+    """
+    with open(path, 'r') as f:
+        lines = f.read().split('\n')
+
+    # the section runs from its underlined header to the next one
+    start = lines.index('Lexer Grammar') + 2
+    end = start
+    while end + 1 < len(lines) and not re.match(r'=+$', lines[end + 1]):
+        end += 1
+
+    table = []
+    for line in lines[start:end]:
+        m = re.match(r'([A-Z_]+)\s+(.*)$', line)
+        if not m:
+            continue
+        name, pattern = m.group(1), m.group(2).strip()
+        pattern = re.sub(r'\s+\(.*\)$', '', pattern)
+        table.append((name, PROSE_PATTERNS.get(name, pattern)))
+    return table
+
+
+class NFA:
+    """
+    A Thompson NFA. Edges are (charset, target) pairs, where a charset of
+    None is an epsilon move.
+    """
+    def __init__(self):
+        self.edges = []
+        self.accept = {}
+
+    def state(self):
+        self.edges.append([])
+        return len(self.edges) - 1
+
+    def edge(self, source, charset, target):
+        self.edges[source].append((charset, target))
+
+    def literal(self, text):
+        """
+        Build a fragment matching text, returning (start, end).
+        """
+        start = end = self.state()
+        for c in text:
+            s = self.state()
+            self.edge(end, frozenset((ord(c),)), s)
+            end = s
+        return start, end
+
+    def copy(self, fragment):
+        """
+        Copy the states of a fragment, returning the new (start, end).
+        """
+        start, end = fragment
+        mapping = {}
+        stack = [start]
+        while stack:
+            s = stack.pop()
+            if s in mapping:
+                continue
+            mapping[s] = self.state()
+            for charset, t in self.edges[s]:
+                stack.append(t)
+        for s, n in mapping.items():
+            for charset, t in self.edges[s]:
+                self.edge(n, charset, mapping[t])
+        return mapping[start], mapping[end]
+
+
+def parse_class(text, i):
+    """
+    Parse a character class starting just after the '[' at text[i-1].
+    Returns (charset, index after the closing bracket).
+    """
+    negate = text[i] == '^'
+    if negate:
+        i += 1
+    chars = set()
+    while text[i] != ']':
+        c, i = parse_char(text, i)
+        if text[i] == '-' and text[i + 1] != ']':
+            hi, i = parse_char(text, i + 1)
+            chars.update(range(ord(c), ord(hi) + 1))
+        else:
+            chars.add(ord(c))
+    if negate:
+        chars = set(range(ALPHABET)) - chars
+    return frozenset(chars), i + 1
+
+
+def parse_char(text, i):
+    """
+    Parse a possibly escaped character, returning (char, next index).
+    """
+    if text[i] == '\\':
+        if text[i + 1] == 'x':
+            return chr(int(text[i + 2:i + 4], 16)), i + 4
+        return {'n': '\n', 't': '\t'}.get(text[i + 1], text[i + 1]), i + 2
+    return text[i], i + 1
+
+
+def build_element(nfa, element, fragments):
+    """
+    Build the NFA fragment for one pattern element.
+    """
+    if element in fragments:
+        return nfa.copy(fragments[element])
+    if len(element) == 1:
+        return nfa.literal(element)
+
+    start = end = nfa.state()
+    i = 0
+    while i < len(element):
+        # a single item
+        if element[i] == '[':
+            charset, i = parse_class(element, i + 1)
+        else:
+            c, i = parse_char(element, i)
+            charset = frozenset((ord(c),))
+        s, e = nfa.state(), nfa.state()
+        nfa.edge(s, charset, e)
+
+        # postfix operators
+        if i < len(element) and element[i] in '*+?':
+            op = element[i]
+            i += 1
+            if op in '*+':
+                nfa.edge(e, None, s)
+            if op in '*?':
+                nfa.edge(s, None, e)
+
+        nfa.edge(end, None, s)
+        end = e
+    return start, end
+
+
+def is_fixed(pattern, fixed):
+    """
+    Return true if pattern only ever matches one string. fixed maps the
+    names of the tokens defined so far to their own fixedness.
+    """
+    for element in pattern.split():
+        if element in fixed:
+            if not fixed[element]:
+                return False
+        elif len(element) > 1 and re.search(r'[\[\]*+?]', element):
+            return False
+    return True
+
+
+def build_nfa(table):
+    """
+    Build an NFA for the whole token table. Returns (nfa, start, priority)
+    where priority maps each token name to its rank (lower wins).
+    """
+    nfa = NFA()
+    start = nfa.state()
+    fragments = {}
+    fixed = {}
+    priority = {}
+
+    rules = table + [('SPACE', SPACE_PATTERN)]
+    for order, (name, pattern) in enumerate(rules):
+        # assemble the fragment from its elements
+        s = e = nfa.state()
+        for element in pattern.split():
+            fs, fe = build_element(nfa, element, fragments)
+            nfa.edge(e, None, fs)
+            e = fe
+        fixed[name] = is_fixed(pattern, fixed)
+        fragments[name] = (s, e)
+        priority[name] = (0 if fixed[name] else 1, order)
+
+        # hook a copy of it into the start state
+        cs, ce = nfa.copy((s, e))
+        nfa.edge(start, None, cs)
+        nfa.accept[ce] = name
+    return nfa, start, priority
+
+
+def character_classes(nfa):
+    """
+    Partition the alphabet into classes of characters which no charset
+    in the NFA tells apart. Returns a list mapping character to class.
+    """
+    charsets = list({c for edges in nfa.edges for c, t in edges
+                     if c is not None})
+    signatures = {}
+    classes = []
+    for ch in range(ALPHABET):
+        sig = tuple(i for i, c in enumerate(charsets) if ch in c)
+        classes.append(signatures.setdefault(sig, len(signatures)))
+    return classes
+
+
+def closure(nfa, states):
+    """
+    Return the epsilon closure of a set of NFA states.
+    """
+    result = set(states)
+    stack = list(states)
+    while stack:
+        s = stack.pop()
+        for charset, t in nfa.edges[s]:
+            if charset is None and t not in result:
+                result.add(t)
+                stack.append(t)
+    return frozenset(result)
+
+
+def build_dfa(nfa, start, priority, classes):
+    """
+    Subset construction. Returns (transitions, accept) where
+    transitions[state][cls] is the next state or -1.
+    """
+    count = max(classes) + 1
+    representative = [classes.index(c) for c in range(count)]
+
+    start_set = closure(nfa, [start])
+    states = {start_set: 0}
+    order = [start_set]
+    transitions = []
+    accept = []
+    i = 0
+    while i < len(order):
+        current = order[i]
+        i += 1
+
+        # the best token this state accepts
+        names = [nfa.accept[s] for s in current if s in nfa.accept]
+        accept.append(min(names, key=priority.get) if names else None)
+
+        row = []
+        for cls in range(count):
+            ch = representative[cls]
+            moves = {t for s in current for c, t in nfa.edges[s]
+                     if c is not None and ch in c}
+            if not moves:
+                row.append(-1)
+                continue
+            target = closure(nfa, moves)
+            if target not in states:
+                states[target] = len(order)
+                order.append(target)
+            row.append(states[target])
+        transitions.append(row)
+    return transitions, accept
+
+
+def minimize(transitions, accept):
+    """
+    Moore's partition refinement. Returns the minimized (transitions,
+    accept) with the start state still numbered 0.
+    """
+    # start by splitting on the accepted token
+    labels = {}
+    block = [labels.setdefault(a, len(labels)) for a in accept]
+
+    while True:
+        signatures = {}
+        new_block = []
+        for s, row in enumerate(transitions):
+            sig = (block[s],) + tuple(block[t] if t >= 0 else -1 for t in row)
+            new_block.append(signatures.setdefault(sig, len(signatures)))
+        if len(signatures) == len(set(block)):
+            break
+        block = new_block
+
+    # renumber so the start state's block comes first
+    numbering = {}
+    for s in range(len(transitions)):
+        numbering.setdefault(block[s], len(numbering))
+
+    count = len(numbering)
+    new_transitions = [None] * count
+    new_accept = [None] * count
+    for s, row in enumerate(transitions):
+        b = numbering[block[s]]
+        new_transitions[b] = [numbering[block[t]] if t >= 0 else -1
+                              for t in row]
+        new_accept[b] = accept[s]
+    return new_transitions, new_accept
+
+
+def generate(bnf_path):
+    """
+    Return the source of the DFA table module for the bnf file.
+    """
+    table = read_token_table(bnf_path)
+    nfa, start, priority = build_nfa(table)
+    classes = character_classes(nfa)
+    transitions, accept = build_dfa(nfa, start, priority, classes)
+    transitions, accept = minimize(transitions, accept)
+
+    # anything outside the alphabet lands in the class of an unused char
+    other = classes[ord('?')]
+    byte_classes = classes + [other] * (256 - ALPHABET)
+    flat = [t for row in transitions for t in row]
+
+    lines = ['"""',
+             'DFA tables for the calc lexer.',
+             '',
+             'Generated by CalcLexGen.py from calc.bnf -- do not edit.',
+             '"""',
+             'from array import array',
+             '',
+             '# character class of each byte (non-ASCII text maps to "?")',
+             f'CLASSES = bytes({byte_classes!r})',
+             f'CLASS_COUNT = {max(classes) + 1}',
+             '',
+             '# next state is TRANSITIONS[state * CLASS_COUNT + class], '
+             'or -1 to stop',
+             'START = 0',
+             f'TRANSITIONS = array(\'h\', {flat!r})',
+             '',
+             '# name of the token accepted in each state',
+             f'ACCEPT = {tuple(accept)!r}',
+             '',
+             '# tokens which are matched but not returned',
+             f'SKIP = frozenset({set(SKIP)!r})',
+             '']
+    return '\n'.join(lines)
+
+
+def main():
+    bnf = sys.argv[1] if len(sys.argv) > 1 else 'calc.bnf'
+    out = sys.argv[2] if len(sys.argv) > 2 else 'CalcDFA.py'
+    source = generate(bnf)
+    with open(out, 'w') as f:
+        f.write(source)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,19 @@
 """
 Lexer for the calc language.
 """
-from enum import Enum, auto
+from enum import IntEnum, auto
 from collections import namedtuple
+from array import array
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+import io
+import mmap
+import os
+import re
+import stat
 import sys
 
-class Token(Enum):  # a class which inherits enum
+class Token(IntEnum):  # an int enum, so token kinds pack into arrays
     INVALID = auto()
     EOF = auto()
     NEWLINE = auto()
@@ -43,25 +51,446 @@ class Token(Enum):  # a class which inherits enum
     LAMBDA = auto()
     RETURNS = auto()
 
-# Store the details of a token
+# Single character tokens
+SINGLE_TOKENS = {'\n': Token.NEWLINE,
+                 '+': Token.PLUS,
+                 '-': Token.MINUS,
+                 '*': Token.TIMES,
+                 '/': Token.DIVIDE,
+                 '^': Token.POW,
+                 '(': Token.LPAREN,
+                 ')': Token.RPAREN,
+                 '=': Token.EQUAL,
+                 ',': Token.COMMA,
+                 '[': Token.LBRACKET,
+                 ']': Token.RBRACKET}
+
+# Reserved words
+KEYWORDS = {'input': Token.INPUT,
+            'integer': Token.INTEGER,
+            'real': Token.REAL,
+            'array': Token.ARRAY,
+            'of': Token.OF,
+            'with': Token.WITH,
+            'bounds' : Token.BOUNDS,
+            'record' : Token.RECORD,
+            'end' : Token.END,
+            'if' : Token.IF,
+            'then': Token.THEN,
+            'while' : Token.WHILE,
+            'do': Token.DO,
+            'function': Token.FUNCTION,
+            'returns': Token.RETURNS,
+            'function_var': Token.FUNCTION_VAR,
+            'lambda': Token.LAMBDA }
+
+# Smallest chunk of source worth handing to another process
+PARALLEL_CHUNK = 1 << 20
+
+# Look up token kinds from their packed values
+TOKEN_KINDS = {t.value: t for t in Token}
+
+# Fixed spelling of each token, where the kind determines the lexeme
+SPELLINGS = {token: text for text, token in SINGLE_TOKENS.items()}
+SPELLINGS.update({token: text for text, token in KEYWORDS.items()})
+SPELLINGS[Token.BSEP] = '..'
+SPELLINGS[Token.DOT] = '.'
+SPELLINGS[Token.EOF] = None
+
+# Runs of characters the lexer scans in one step (none cross a newline).
+# Mapped sources are scanned as bytes, so they get their own patterns.
+# Text has its line endings translated as it is read, but a mapped source
+# is scanned in place, so there the '\r' of a '\r\n' is a space.
+TEXT_RUNS = (re.compile(r'[ \t]*'),
+             re.compile(r'[^\n]*'),
+             re.compile(r'\d*'),
+             re.compile(r'\w*'))
+BYTE_RUNS = (re.compile(rb'(?:[ \t]|\r(?=\n))*'),) + \
+            tuple(re.compile(p.pattern.encode()) for p in TEXT_RUNS[1:])
+
+# Store the details of a token. The offset is where the lexeme starts in
+# the source; a LineIndex turns it into a line and column when one is
+# needed.
 TokenDetail = namedtuple('TokenDetail', ('token', 
                                          'lexeme', 
                                          'value', 
-                                         'line', 
-                                         'col'))
+                                         'offset'))
+
+def reads_whole(file):
+    """
+    Return true if file can be read in one gulp: either a regular file or
+    an in-memory stream which has no file descriptor at all.
+    """
+    try:
+        return stat.S_ISREG(os.fstat(file.fileno()).st_mode)
+    except (AttributeError, OSError, ValueError):
+        return True
+
+
+class LineIndex:
+    """
+    The offsets at which each line of a source starts, so positions can be
+    kept as plain offsets and only turned into a line and column (both
+    counted from 1) when something is reported.
+    """
+    def __init__(self, text=None):
+        self.starts = array('q', [0])
+        if text is not None:
+            self.add(text, 0)
+
+    def add(self, text, base):
+        """
+        Record the line breaks in text (a str, bytes or mmap), which starts
+        at offset base in the source.
+        """
+        newline = '\n' if isinstance(text, str) else b'\n'
+        starts = self.starts
+        i = text.find(newline)
+        while i >= 0:
+            starts.append(base + i + 1)
+            i = text.find(newline, i + 1)
+
+    def extend(self, other, base):
+        """
+        Append the lines of another index whose source starts at offset
+        base in ours.
+        """
+        self.starts.extend(start + base for start in other.starts[1:])
+
+    def line_col(self, offset):
+        """
+        Return the (line, column) of a source offset.
+        """
+        line = bisect_right(self.starts, offset)
+        return line, offset - self.starts[line - 1] + 1
+
+
+class SymbolTable:
+    """
+    Interns identifiers, giving each distinct name a dense integer id.
+    """
+    def __init__(self):
+        self.__ids = {}
+        self.names = []
+
+    def __len__(self):
+        return len(self.names)
+
+    def intern(self, name):
+        """
+        Return the id of name, adding it to the table if it is new.
+        """
+        sym = self.__ids.get(name)
+        if sym is None:
+            sym = len(self.names)
+            self.__ids[name] = sym
+            self.names.append(name)
+        return sym
+
+
+class TokenTable:
+    """
+    A whole token stream stored column-wise. Token kinds are bytes and
+    source offsets are packed integers. Tokens whose lexeme is not fixed by
+    their kind (ids, literals and invalid tokens) refer to an entry in the
+    lexeme and value side tables, which holds each distinct spelling once.
+    symbols is the SymbolTable the ids were interned in, and lines is the
+    LineIndex of the source.
+    """
+    def __init__(self, symbols=None, lines=None):
+        self.kinds = array('B')
+        self.offsets = array('q')
+        self.entries = array('i')
+        self.entry_kinds = array('B')
+        self.lexemes = []
+        self.values = []
+        self.symbols = symbols
+        self.lines = lines if lines is not None else LineIndex()
+        self.__entry_index = {}
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def append(self, token):
+        """
+        Add a TokenDetail to the end of the table.
+        """
+        self.kinds.append(token.token)
+        self.offsets.append(token.offset)
+        if token.lexeme == SPELLINGS.get(token.token):
+            self.entries.append(-1)
+        else:
+            self.entries.append(self.__entry(token.token, token.lexeme,
+                                             token.value))
+
+    def extend(self, other, base=0, end=None):
+        """
+        Append the first end tokens (default all) of another table, whose
+        source starts at offset base in ours. Ids are re-interned in our
+        symbol table.
+        """
+        if end is None:
+            end = len(other)
+
+        # map the other table's side entries onto ours
+        remap = array('i')
+        for kind, lexeme, value in zip(other.entry_kinds, other.lexemes,
+                                       other.values):
+            if kind == Token.ID:
+                value = self.symbols.intern(lexeme)
+                lexeme = self.symbols.names[value]
+            remap.append(self.__entry(kind, lexeme, value))
+
+        self.kinds.extend(other.kinds[:end])
+        self.offsets.extend(offset + base for offset in other.offsets[:end])
+        self.lines.extend(other.lines, base)
+        self.entries.extend(remap[e] if e >= 0 else -1
+                            for e in other.entries[:end])
+
+    def __entry(self, kind, lexeme, value):
+        """
+        Find or add the side table entry for a lexeme, returning its index.
+        """
+        key = (kind, lexeme)
+        entry = self.__entry_index.get(key)
+        if entry is None:
+            entry = len(self.lexemes)
+            self.__entry_index[key] = entry
+            self.entry_kinds.append(kind)
+            self.lexemes.append(lexeme)
+            self.values.append(value)
+        return entry
+
+    def token(self, i):
+        """
+        Rebuild the TokenDetail for the token at index i.
+        """
+        kind = TOKEN_KINDS[self.kinds[i]]
+        entry = self.entries[i]
+        if entry < 0:
+            lexeme = SPELLINGS.get(kind)
+            value = None
+        else:
+            lexeme = self.lexemes[entry]
+            value = self.values[entry]
+        return TokenDetail(kind, lexeme, value, self.offsets[i])
+
+    def reader(self, start=0):
+        """
+        Return a token source which reads this table, from the token at
+        index start.
+        """
+        return TokenReader(self, start)
+
+
+class TokenReader:
+    """
+    Reads a TokenTable through the same next()/get_token()/has() interface
+    as the Lexer. Lookahead compares the packed kinds directly. position
+    is the index in table of the current token, and the first call to
+    next() moves to start.
+    """
+    def __init__(self, table, start=0):
+        self.lines = table.lines
+        self.table = table
+        self.__kinds = table.kinds
+        self.__i = start - 1
+        self.__last = len(table) - 1
+
+    @property
+    def position(self):
+        return self.__i
+
+    def seek(self, i):
+        """
+        Make the token at index i the current token.
+        """
+        self.__i = min(i, self.__last)
+
+    def next(self):
+        """
+        Advance to the next token and return it. The reader stays on the
+        final (EOF) token once it gets there.
+        """
+        if self.__i < self.__last:
+            self.__i += 1
+        return self.get_token()
+
+    def get_token(self):
+        """
+        Return the current token
+        """
+        return self.table.token(self.__i)
+
+    def has(self, t):
+        """
+        Return true if the current token is of kind t
+        """
+        return self.__kinds[self.__i] == t
+
+
+class LazyReader:
+    """
+    Wraps a Lexer (or TokenReader) so that next() only moves on once the
+    following token is looked at with get_token() or has(). A parser
+    reading through it stops at the NEWLINE ending a statement, rather
+    than going on to scan the first token of the next one, which for
+    input read a line at a time would hold up each statement until the
+    line after it came in.
+    """
+    def __init__(self, lexer):
+        self.lines = lexer.lines
+        self.__lexer = lexer
+        self.__behind = False
+
+    def next(self):
+        """
+        Move past the current token. Nothing is returned, since the next
+        token has not been scanned yet.
+        """
+        if self.__behind:
+            self.__lexer.next()
+        self.__behind = True
+
+    def get_token(self):
+        """
+        Return the current token
+        """
+        self.__catch_up()
+        return self.__lexer.get_token()
+
+    def has(self, t):
+        """
+        Return true if the current token is of kind t
+        """
+        self.__catch_up()
+        return self.__lexer.has(t)
+
+    def __catch_up(self):
+        if self.__behind:
+            self.__lexer.next()
+            self.__behind = False
+
+
+def split_lines(path, n):
+    """
+    Cut the file at path into at most n byte ranges of about the same
+    size, each ending just after a newline (or at the end of the file).
+    Returns a list of (start, end) pairs.
+    """
+    size = os.path.getsize(path)
+    if size == 0:
+        return [(0, 0)]
+
+    bounds = [0]
+    with open(path, 'rb') as f, \
+         mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as source:
+        for k in range(1, n):
+            nl = source.find(b'\n', max(bounds[-1], size * k // n))
+            if nl < 0 or nl + 1 >= size:
+                break
+            bounds.append(nl + 1)
+    bounds.append(size)
+    return list(zip(bounds, bounds[1:]))
+
+
+def tokenize_chunk(path, start, end):
+    """
+    Scan bytes start to end of the file at path. Returns the TokenTable
+    (with offsets as if the chunk were a file of its own) and the length
+    of the chunk's text.
+    """
+    with open(path, 'rb') as f:
+        f.seek(start)
+        chunk = f.read(end - start)
+
+    # read the text as open(path, 'r') would, so line endings are
+    # translated just as they are for the serial lexer
+    text = io.TextIOWrapper(io.BytesIO(chunk)).read()
+    return Lexer(io.StringIO(text)).tokenize_all(), len(text)
+
+
+def tokenize_parallel(path, workers=None):
+    """
+    Scan the file at path into a TokenTable using a pool of worker
+    processes.
+
+    Comments run to the end of the line and every token ends by the end
+    of its line, as does the only state carried between tokens (the '..'
+    of a bound). So the source can be cut at newlines into one chunk per
+    worker, the chunks scanned independently, and the tables stitched
+    back together with their offsets moved and their ids re-interned.
+    Chunks are at least PARALLEL_CHUNK bytes, so small files are scanned
+    in this process.
+
+    Only the scanning is parallel: the tables are sent back from the
+    workers and stitched together one token at a time in this process, so
+    the speedup is bounded by that serial part (CalcBench parallel reports
+    how long it takes), and with a single core this is slower than
+    tokenize_all.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    size = os.path.getsize(path)
+    chunks = split_lines(path, max(1, min(workers, size // PARALLEL_CHUNK)))
+
+    if len(chunks) == 1:
+        results = [tokenize_chunk(path, *chunks[0])]
+    else:
+        with ProcessPoolExecutor(len(chunks)) as pool:
+            results = list(pool.map(tokenize_chunk,
+                                    [path] * len(chunks),
+                                    [c[0] for c in chunks],
+                                    [c[1] for c in chunks]))
+
+    # stitch the chunks together, keeping only the last one's EOF
+    table = TokenTable(SymbolTable())
+    base = 0
+    for i, (chunk, length) in enumerate(results):
+        last = i == len(results) - 1
+        table.extend(chunk, base, None if last else len(chunk) - 1)
+        base += length
+    return table
+
 
 class Lexer:
     """
     Calc Lexer
+
+    Identifiers are interned in the lexer's symbol table (which may be
+    shared between lexers). An ID token's value is its symbol id, and its
+    lexeme is the interned name.
+
+    With mapped=True the source file is mmap'ed and scanned as bytes in
+    place, so it is never copied onto the heap. Lexemes are tracked as
+    offsets into the map and only decoded for tokens which need their text
+    (ids, literals and invalid tokens). Mapped sources must be ASCII (or
+    Latin-1) text, with lines ending in '\n' or '\r\n'.
+
+    Tokens carry the offset of their lexeme. The lexer's LineIndex, lines,
+    grows as the source is read and turns offsets into lines and columns.
     """
-    def __init__(self, file=sys.stdin):
-        self.__line = 1
-        self.__col = 0
+    def __init__(self, file=sys.stdin, mapped=False, symbols=None):
+        self.symbols = symbols if symbols is not None else SymbolTable()
+        self.lines = LineIndex()
         self.__lexeme = ""
         self.__token = None
         self.__file = file
         self.__cur = None
         self.__in_bsep = False
+
+        # source buffer, the source offset at which it begins, our position
+        # within it, and where the lexeme starts
+        self.__buf = ""
+        self.__base = 0
+        self.__pos = 0
+        self.__start = None
+        self.__whole = reads_whole(file)
+        self.__mapped = mapped
+        if mapped:
+            self.__map()
+        self.__spaces, self.__comment, self.__digits, self.__id_chars = \
+            BYTE_RUNS if mapped else TEXT_RUNS
     
 
     def next(self):
@@ -78,13 +507,12 @@ class Lexer:
         self.__skip_space()
         self.__skip_comment()
         
-        # start a new lexeme
-        self.__lexeme = ''
+        # start a new lexeme (at the end of the source for EOF)
+        self.__start = self.__pos - 1 if self.__cur else self.__pos
 
         # detect EOF
         if not self.__cur:
-            self.__lexeme = None
-            self.__set_token(Token.EOF)
+            self.__set_token(Token.EOF, lexeme=None)
         elif self.__lex_single():
             pass
         elif self.__lex_number():
@@ -97,14 +525,20 @@ class Lexer:
             self.__consume()
             self.__set_token(Token.INVALID)
 
+        self.__start = None
         return self.__token
 
 
-    def __set_token(self, token, value = None):
-        col = self.__col 
-        if self.__lexeme:
-            col-=len(self.__lexeme)
-        self.__token = TokenDetail(token, self.__lexeme, value, self.__line, col)
+    def __set_token(self, token, value = None, lexeme = ""):
+        """
+        Set the current token. Unless a lexeme is given, it is everything
+        consumed since the token started.
+        """
+        if lexeme == "":
+            lexeme = self.__take_lexeme()
+        self.__lexeme = lexeme
+        self.__token = TokenDetail(token, lexeme, value,
+                                   self.__base + self.__start)
 
 
     def get_token(self):
@@ -114,33 +548,120 @@ class Lexer:
         return self.__token
 
 
+    def has(self, t):
+        """
+        Return true if the current token is of kind t
+        """
+        return self.__token.token == t
+
+
+    def tokenize_all(self):
+        """
+        Scan the rest of the source and return it as a TokenTable, ending
+        with the EOF token.
+        """
+        table = TokenTable(self.symbols, self.lines)
+        token = self.next()
+        table.append(token)
+        while token.token != Token.EOF:
+            token = self.next()
+            table.append(token)
+        return table
+
+
+    def __take_lexeme(self):
+        """
+        Return the text consumed since the start of the current token.
+        """
+        end = self.__pos - 1 if self.__cur else self.__pos
+        if self.__mapped:
+            return str(self.__buf[self.__start:end], 'latin-1')
+        return self.__buf[self.__start:end]
+
+
     def __next_char(self):
-        # reset line counters
-        if self.__cur == "\n":
-            self.__line += 1
-            self.__col = 0
+        # refill the buffer when we run off the end of it
+        if self.__pos >= len(self.__buf):
+            self.__fill()
+
+        # scan a character
+        if self.__pos < len(self.__buf):
+            self.__cur = self.__buf[self.__pos]
+            if self.__mapped:
+                self.__cur = chr(self.__cur)
+            self.__pos += 1
+        else:
+            self.__cur = ""
 
-        # scan a character and keep track of the column
-        self.__cur = self.__file.read(1)
-        if self.__cur:
-            self.__col += 1
+    def __fill(self):
+        """
+        Load the next block of source into the buffer. Regular files are
+        read in one gulp, anything else (pipes, terminals) is read a line
+        at a time so interactive input is not held up. Any lexeme in
+        progress is carried over into the new buffer. The line breaks of
+        each block are added to the line index as it is read.
+        """
+        if self.__mapped:
+            return
+        if self.__whole:
+            block = self.__file.read()
+            self.__whole = False
+        else:
+            block = self.__file.readline()
+
+        if self.__start is None:
+            self.__base += len(self.__buf)
+            self.__buf = block
+            self.__pos = 0
+        else:
+            carry = self.__buf[self.__start:]
+            self.__base += self.__start
+            self.__buf = carry + block
+            self.__pos = len(carry)
+            self.__start = 0
+        self.lines.add(block, self.__base + self.__pos)
+
+    def __map(self):
+        """
+        Map our source file into memory and index its lines. Empty files
+        cannot be mapped, but then there is nothing to scan anyway.
+        """
+        try:
+            source = mmap.mmap(self.__file.fileno(), 0,
+                               access=mmap.ACCESS_READ)
+        except ValueError:
+            source = b""
+        self.lines.add(source, 0)
+        self.__buf = memoryview(source)
 
     def __skip_space(self):
-        while self.__cur in [' ', '\t']:
-            self.__next_char()
+        if self.__cur == ' ' or self.__cur == '\t' or \
+           self.__cur == '\r' and self.__mapped:
+            self.__skip_run(self.__spaces)
 
     def __skip_comment(self):
         while self.__cur == '#':
-            while self.__cur != '\n':
-                self.__next_char()
+            self.__skip_run(self.__comment)
             self.__next_char()
             self.__skip_space()
     
     def __consume(self):
         """
-        Add to our lexeme and advance the character stream.
+        Advance the character stream past the current character, taking it
+        into the lexeme (which runs from the token's start offset to our
+        position).
         """
-        self.__lexeme += self.__cur
+        self.__next_char()
+
+    def __skip_run(self, pattern):
+        """
+        Advance past the run of characters matching pattern which starts at
+        the current character.
+        """
+        end = pattern.match(self.__buf, self.__pos - 1).end()
+        if end < self.__pos:
+            return
+        self.__pos = end
         self.__next_char()
 
     def __lex_single(self):
@@ -150,32 +671,21 @@ class Lexer:
 
         On success, it sets the token.
         """
-        toks = (('\n', Token.NEWLINE),
-                ('+', Token.PLUS),
-                ('-', Token.MINUS),
-                ('*', Token.TIMES),
-                ('/', Token.DIVIDE),
-                ('^', Token.POW),
-                ('(', Token.LPAREN),
-                (')', Token.RPAREN),
-                ('=', Token.EQUAL),
-                (',', Token.COMMA),
-                ('[', Token.LBRACKET),
-                (']', Token.RBRACKET))
-        
-        token = None
-        for t in toks:
-            if t[0] == self.__cur:
-                token = t[1]
-                break
+        token = SINGLE_TOKENS.get(self.__cur)
         
         # if we do not match, we fail!
         if not token:
             return False
         
-        # set the token and return true
-        self.__consume()
-        self.__set_token(token)
+        # set the token and return true; the character after a newline is
+        # not read until the next token is asked for, so input arriving a
+        # line at a time is not held up waiting for the line after
+        lexeme = self.__cur
+        if token == Token.NEWLINE:
+            self.__cur = None
+        else:
+            self.__consume()
+        self.__set_token(token, lexeme=lexeme)
         return True
 
 
@@ -188,18 +698,16 @@ class Lexer:
             return False
         self.__consume()
 
-        # entered the integer state
+        # entered the integer state, scan all the digits
         token = Token.INTLIT
-
-        # scan all the digits
-        while self.__cur.isdigit():
-            self.__consume()
+        self.__skip_run(self.__digits)
 
         # we found an integer
         if self.__cur != '.' or self.__start_bsep():
-            if self.__lexeme[-1] == '.':
-                self.__lexeme = self.__lexeme[0:-1]
-            self.__set_token(token, int(self.__lexeme))
+            lexeme = self.__take_lexeme()
+            if lexeme[-1] == '.':
+                lexeme = lexeme[0:-1]
+            self.__set_token(token, int(lexeme), lexeme)
             return True
         
         # enter an invalid state
@@ -210,34 +718,15 @@ class Lexer:
         
         # get the fractional part of the float
         token = Token.FLOATLIT
-        while self.__cur.isdigit():
-            self.__consume()
-        self.__set_token(token, float(self.__lexeme))
+        self.__skip_run(self.__digits)
+        lexeme = self.__take_lexeme()
+        self.__set_token(token, float(lexeme), lexeme)
         return True
     
     def __lex_kw_or_id(self):
         """
         Attempt to lex a keyword or an id.
         """
-
-        kw = {'input': Token.INPUT,
-              'integer': Token.INTEGER,
-              'real': Token.REAL,
-              'array': Token.ARRAY,
-              'of': Token.OF,
-              'with': Token.WITH,
-              'bounds' : Token.BOUNDS,
-              'record' : Token.RECORD,
-              'end' : Token.END,
-              'if' : Token.IF,
-              'then': Token.THEN,
-              'while' : Token.WHILE,
-              'do': Token.DO,
-              'function': Token.FUNCTION,
-              'returns': Token.RETURNS,
-              'function_var': Token.FUNCTION_VAR,
-              'lambda': Token.LAMBDA }
-
         # consume characters which match the pattern
         if self.__cur.isalpha() or self.__cur == '_':
             self.__consume()
@@ -245,15 +734,16 @@ class Lexer:
             return False
         
         # consume the rest of the consistent characters
-        while self.__cur.isalpha() or self.__cur.isdigit() or self.__cur == '_':
-            self.__consume()
+        self.__skip_run(self.__id_chars)
         
         # create the token
-        if self.__lexeme in kw:
-            self.__set_token(kw[self.__lexeme])
+        lexeme = self.__take_lexeme()
+        token = KEYWORDS.get(lexeme)
+        if token:
+            self.__set_token(token, lexeme=lexeme)
         else:
-            self.__set_token(Token.ID)
-
+            sym = self.symbols.intern(lexeme)
+            self.__set_token(Token.ID, sym, self.symbols.names[sym])
         return True
     
     def __lex_bsep_or_dot(self):
@@ -261,20 +751,20 @@ class Lexer:
         if self.__in_bsep:
             n = 1
             self.__in_bsep = False
+            self.__start -= 1   # the first '.' was read with the number
         else:
             n = 2
 
         for i in range(n):
             if self.__cur != '.':
-                if n < 1:
+                if i < 1:
                     return False
                 else:
                     self.__set_token(Token.DOT)
                     return True
             self.__consume()
         
-        self.__lexeme = '..'
-        self.__set_token(Token.BSEP)
+        self.__set_token(Token.BSEP, lexeme='..')
         return True
     
     def __start_bsep(self):
@@ -285,15 +775,150 @@ class Lexer:
         return self.__in_bsep
         
 
+class DFALexer:
+    """
+    Calc lexer driven by DFA tables generated by CalcLexGen.py from the
+    token table in calc.bnf. It has the same interface as Lexer and
+    produces the same tokens for well formed programs. Malformed numbers
+    and stray characters become INVALID tokens.
+
+    The whole source is read up front and mapped to character classes in
+    one step, then each token is the longest match found by running the
+    DFA from the start state.
+    """
+    def __init__(self, file=sys.stdin, tables=None, symbols=None):
+        if tables is None:
+            import CalcDFA as tables
+        self.symbols = symbols if symbols is not None else SymbolTable()
+        # number states by the offset of their row in the transition
+        # array, which saves a multiply for every character scanned
+        width = tables.CLASS_COUNT
+        self.__trans = array('l', (t * width if t >= 0 else -1
+                                   for t in tables.TRANSITIONS))
+        self.__start_state = tables.START * width
+        self.__accept = [None] * len(self.__trans)
+        for state, name in enumerate(tables.ACCEPT):
+            if name:
+                token = name if name in tables.SKIP else Token[name]
+                self.__accept[state * width] = token
+
+        self.__src = file.read()
+        self.__classes = self.__src.encode('ascii', 'replace') \
+                             .translate(tables.CLASSES)
+        self.lines = LineIndex(self.__src)
+        self.__pos = 0
+        self.__token = None
+        self.__values = {Token.INTLIT: int, Token.FLOATLIT: float}
+
+
+    def next(self):
+        """
+        Scan for the next token, and return the token.
+        Returns: TokenDetail
+        """
+        trans = self.__trans
+        accept = self.__accept
+        classes = self.__classes
+        n = len(classes)
+
+        while True:
+            start = self.__pos
+            if start >= n:
+                self.__set_token(Token.EOF, None, start)
+                return self.__token
+
+            # run the dfa for the longest match
+            state = self.__start_state
+            i = start
+            token = None
+            end = start + 1
+            while i < n:
+                state = trans[state + classes[i]]
+                if state < 0:
+                    break
+                i += 1
+                if accept[state]:
+                    token = accept[state]
+                    end = i
+
+            if token is None:
+                token = Token.INVALID
+            self.__pos = end
+
+            # skipped tokens are not returned
+            if type(token) is str:
+                continue
+            self.__set_token(token, self.__src[start:end], start)
+            return self.__token
+
+
+    def __set_token(self, token, lexeme, offset):
+        """
+        Set the current token, converting its value from the lexeme.
+        """
+        value = None
+        if token == Token.ID:
+            value = self.symbols.intern(lexeme)
+            lexeme = self.symbols.names[value]
+        elif token in self.__values:
+            value = self.__values[token](lexeme)
+        self.__token = TokenDetail(token, lexeme, value, offset)
+
+
+    def get_token(self):
+        """
+        Return the current token
+        """
+        return self.__token
+
+
+    def has(self, t):
+        """
+        Return true if the current token is of kind t
+        """
+        return self.__token.token == t
+
+
+    def tokenize_all(self):
+        """
+        Scan the rest of the source and return it as a TokenTable, ending
+        with the EOF token.
+        """
+        table = TokenTable(self.symbols, self.lines)
+        token = self.next()
+        table.append(token)
+        while token.token != Token.EOF:
+            token = self.next()
+            table.append(token)
+        return table
+
+
 def main():
     """
     A unit test for our lexer.
     """
-    if len(sys.argv) == 2:
-        file = open(sys.argv[1], 'r')
+    args = sys.argv[1:]
+    mapped = '--mmap' in args
+    if mapped:
+        args.remove('--mmap')
+    dfa = '--dfa' in args
+    if dfa:
+        args.remove('--dfa')
+    if '--jobs' in args:
+        # scan the whole file in parallel, then print the table
+        i = args.index('--jobs')
+        table = tokenize_parallel(args[i + 2], int(args[i + 1]))
+        for i in range(len(table)):
+            print(table.token(i))
+        return
+    if len(args) == 1:
+        file = open(args[0], 'rb' if mapped else 'r')
     else:
         file = sys.stdin
-    lexer = Lexer(file)
+    if dfa:
+        lexer = DFALexer(file)
+    else:
+        lexer = Lexer(file, mapped)
 
     # run the lexer until we hit the end of the file
     token = lexer.next()
@@ -0,0 +1,69 @@
+"""
+Syntax checker for calc programs.
+
+Usage: python3 CalcLint.py path...
+
+Each path is a calc program, or a directory which is searched for .calc
+files. Every program is parsed once with error recovery, and every
+syntax error found is printed as
+
+    path:line:column: message
+
+The exit status is 1 if any errors were found, and 0 otherwise.
+"""
+import os
+import sys
+from CalcLexer import Lexer
+from CalcParser import Parser
+
+
+def lint_file(path):
+    """
+    Parse the program at path, returning the list of ParseErrors in it.
+    """
+    with open(path, 'r') as f:
+        table = Lexer(f).tokenize_all()
+    parser = Parser(table, stack=True, recover=True)
+    parser.parse()
+    return parser.errors
+
+
+def calc_files(paths):
+    """
+    Yield the calc programs named by paths, searching directories for
+    .calc files.
+    """
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        for directory, subdirs, files in os.walk(path):
+            subdirs.sort()
+            for name in sorted(files):
+                if name.endswith('.calc'):
+                    yield os.path.join(directory, name)
+
+
+def lint(paths, out=sys.stdout):
+    """
+    Check every program named by paths, printing their errors to out.
+    Returns the number of errors found.
+    """
+    count = 0
+    for path in calc_files(paths):
+        for error in lint_file(path):
+            out.write(f"{path}:{error.line}:{error.col}: {error.message}\n")
+            count += 1
+    return count
+
+
+def main():
+    if len(sys.argv) < 2:
+        sys.stderr.write(__doc__)
+        sys.exit(-1)
+    if lint(sys.argv[1:]):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,713 @@
+"""
+Native backend for numeric calc programs.
+
+A program which only uses integer and real scalars, arrays, if, while and
+first order functions is translated to C, compiled by the system C
+compiler (CC, or cc) into a shared object and run through ctypes. Any
+other program (one with records, input, lambdas, function variables or
+closures, or which uses names in a way only dynamic scoping can resolve)
+is run by the tree walker instead.
+
+The C code keeps calc's semantics exactly, and gives up whenever it
+cannot:
+
+  - every value carries its type, as values bound to parameters and
+    stored in arrays are not coerced, and each operation follows Python's
+    rules for the types it is given;
+  - integers are 64 bits, and a result which would not fit, like anything
+    Python would raise an exception for (division by zero, an array index
+    out of range, a complex power, ...), abandons the native run;
+  - calls go no deeper than MAX_DEPTH, well inside what the tree walker
+    can manage.
+
+The values a native run prints are held until it finishes, so an
+abandoned run has printed nothing, and the program is then run again from
+the start by the tree walker, which gives the same output and the same
+error or result as it always would.
+
+Functions may use their own parameters and locals, and globals declared
+before the program first calls anything, provided no function declares a
+name of its own that a call could find instead. Names must be declared
+before they are used, and declarations must come at the top level of the
+program or of a function body.
+
+Shared objects are cached in __calccache__ next to the source, keyed by a
+hash of the generated C and the compiler command.
+
+Usage: python3 CalcNative.py [--explain] [--source] [file.calc]
+       With --explain, the reason a program is not run natively is
+       written to stderr. With --source, the C translation is printed
+       rather than run.
+"""
+import ctypes
+import hashlib
+import os
+import subprocess
+import sys
+import tempfile
+import calc
+from calc import RefType, ReferenceEnvironment
+from CalcCache import CACHE_DIR
+from CalcLexer import Lexer, Token
+from CalcParser import Parser, Operator
+
+# the C compiler and how shared objects are built
+CC = os.environ.get('CC', 'cc')
+CFLAGS = ['-O2', '-shared', '-fPIC']
+CACHE_SUFFIX = '.so'
+
+# bump when the generated code changes in a way the C source does not show
+FORMAT = 1
+
+# the deepest calls go natively
+MAX_DEPTH = 32
+
+# the largest array (in elements) compiled natively
+MAX_ARRAY = 1 << 24
+
+# why a native run was abandoned, by its status
+BAILS = {1: "integer overflow",
+         2: "division by zero",
+         3: "a value out of range",
+         4: "an array index out of range",
+         5: "calls nested too deeply",
+         6: "a function with no result",
+         7: "out of memory"}
+
+PRELUDE = r'''#include <math.h>
+#include <setjmp.h>
+#include <stdint.h>
+#include <stdlib.h>
+#include <string.h>
+
+/* a calc value: an int, or if real is set, a real */
+typedef struct { int real; int64_t i; double r; } V;
+
+enum { OVERFLOW = 1, ZERO_DIVISION, RANGE, INDEX, DEPTH, NO_RESULT, MEMORY };
+
+static jmp_buf bail_env;
+static int depth;
+static V *out;
+static long out_len, out_cap;
+
+/* abandon the run */
+static void bail(int why) { longjmp(bail_env, why); }
+
+static inline V vi(int64_t i) { V v = {0, i, 0.0}; return v; }
+static inline V vr(double r) { V v = {1, 0, r}; return v; }
+static inline double dbl(V v) { return v.real ? v.r : (double) v.i; }
+static inline int truth(V v) { return v.real ? v.r != 0.0 : v.i != 0; }
+
+/* integers which are doubles exactly */
+static inline int exact(int64_t i) {
+    return i >= -(INT64_C(1) << 53) && i <= (INT64_C(1) << 53);
+}
+
+static inline V v_add(V a, V b) {
+    int64_t x;
+    if (a.real || b.real) return vr(dbl(a) + dbl(b));
+    if (__builtin_add_overflow(a.i, b.i, &x)) bail(OVERFLOW);
+    return vi(x);
+}
+
+static inline V v_sub(V a, V b) {
+    int64_t x;
+    if (a.real || b.real) return vr(dbl(a) - dbl(b));
+    if (__builtin_sub_overflow(a.i, b.i, &x)) bail(OVERFLOW);
+    return vi(x);
+}
+
+static inline V v_mul(V a, V b) {
+    int64_t x;
+    if (a.real || b.real) return vr(dbl(a) * dbl(b));
+    if (__builtin_mul_overflow(a.i, b.i, &x)) bail(OVERFLOW);
+    return vi(x);
+}
+
+/* true division, correctly rounded as Python's is */
+static inline V v_div(V a, V b) {
+    if (a.real || b.real) {
+        if (dbl(b) == 0.0) bail(ZERO_DIVISION);
+        return vr(dbl(a) / dbl(b));
+    }
+    if (b.i == 0) bail(ZERO_DIVISION);
+    if (!exact(a.i) || !exact(b.i)) bail(RANGE);
+    return vr((double) a.i / (double) b.i);
+}
+
+static V v_pow(V a, V b) {
+    double x, y, z;
+    if (!a.real && !b.real && b.i >= 0) {
+        int64_t result = 1, base = a.i, e = b.i;
+        while (e) {
+            if ((e & 1) && __builtin_mul_overflow(result, base, &result))
+                bail(OVERFLOW);
+            e >>= 1;
+            if (e && __builtin_mul_overflow(base, base, &base))
+                bail(OVERFLOW);
+        }
+        return vi(result);
+    }
+    x = dbl(a);
+    y = dbl(b);
+    if (!isfinite(x) || !isfinite(y)) bail(RANGE);
+    if (x == 0.0 && y < 0.0) bail(ZERO_DIVISION);
+    if (x < 0.0 && y != floor(y)) bail(RANGE);
+    z = pow(x, y);
+    if (!isfinite(z)) bail(RANGE);
+    return vr(z);
+}
+
+static inline V v_neg(V a) {
+    if (a.real) return vr(-a.r);
+    if (a.i == INT64_MIN) bail(OVERFLOW);
+    return vi(-a.i);
+}
+
+/* the coercions of integer and real variables */
+static inline V to_int(V v) {
+    if (!v.real) return v;
+    if (!(v.r >= -9223372036854775808.0 && v.r < 9223372036854775808.0))
+        bail(RANGE);
+    return vi((int64_t) v.r);
+}
+
+static inline V to_real(V v) { return v.real ? v : vr((double) v.i); }
+
+/* the position of an index into a dimension, which wraps around from
+   the end if it is before the start, as a Python list index does */
+static inline int64_t at(V v, int64_t low, int64_t n) {
+    int64_t j;
+    if (v.real || __builtin_sub_overflow(v.i, low, &j))
+        bail(INDEX);
+    if (j < 0)
+        j += n;
+    if (j < 0 || j >= n)
+        bail(INDEX);
+    return j;
+}
+
+static void *allocate(int64_t n) {
+    void *p = calloc(n ? n : 1, sizeof(V));
+    if (!p) bail(MEMORY);
+    return p;
+}
+
+/* print a value, once the run is over */
+static void emit(V v) {
+    if (out_len == out_cap) {
+        long cap = out_cap ? out_cap * 2 : 64;
+        V *grown = realloc(out, cap * sizeof(V));
+        if (!grown) bail(MEMORY);
+        out = grown;
+        out_cap = cap;
+    }
+    out[out_len++] = v;
+}
+
+V *calc_output(void) { return out; }
+long calc_output_length(void) { return out_len; }
+'''
+
+
+class Value(ctypes.Structure):
+    _fields_ = [('real', ctypes.c_int), ('i', ctypes.c_int64),
+                ('r', ctypes.c_double)]
+
+
+class Unsupported(Exception):
+    """
+    A program the native backend cannot run, because of tree.
+    """
+    def __init__(self, tree, reason):
+        super().__init__(tree, reason)
+        self.tree = tree
+        self.reason = reason
+
+    def __str__(self):
+        if self.tree.token is None:
+            return self.reason
+        return f"{calc.position(self.tree.token.offset)}: {self.reason}"
+
+
+class Variable:
+    """
+    A variable in the C code: its name there, its RefType, and for an
+    array its bounds.
+    """
+    __slots__ = ('name', 'ref_type', 'bounds')
+
+    def __init__(self, name, ref_type, bounds=None):
+        self.name = name
+        self.ref_type = ref_type
+        self.bounds = bounds
+
+
+class Function:
+    """
+    A function in the C code: its name there, its FUNDEF tree, its
+    parameters' symbols and the RefType of its result.
+    """
+    __slots__ = ('name', 'tree', 'params', 'return_type')
+
+    def __init__(self, name, tree, params, return_type):
+        self.name = name
+        self.tree = tree
+        self.params = params
+        self.return_type = return_type
+
+
+# the RefTypes of scalar declarations
+SCALARS = {Token.INTEGER: RefType.INT_VAR, Token.REAL: RefType.REAL_VAR}
+
+# the C functions applying binary operators
+BINARY_OPERATORS = {Operator.ADD: 'v_add', Operator.SUB: 'v_sub',
+                    Operator.MUL: 'v_mul', Operator.DIV: 'v_div',
+                    Operator.POW: 'v_pow'}
+
+# statements which have a value, and so print it
+VALUED = {Operator.ADD, Operator.SUB, Operator.MUL, Operator.DIV,
+          Operator.POW, Operator.NEG, Operator.LIT, Operator.VAR,
+          Operator.ARRAY_VAR, Operator.FUNCALL}
+
+
+def contains_call(tree):
+    """
+    Return true if a tree calls a function, other than from the body of a
+    function it defines.
+    """
+    if tree.op == Operator.FUNCALL:
+        return True
+    if tree.op == Operator.FUNDEF:
+        return False
+    return any(contains_call(child) for child in tree.children)
+
+
+class Translator:
+    """
+    Translates a calc program to C, raising Unsupported if it cannot.
+    """
+    def __init__(self):
+        self.__lines = []
+        self.__indent = 0
+        self.__temps = 0
+        self.__functions = {}
+        self.__globals = {}
+        self.__shared = {}
+
+    def program(self, tree):
+        """
+        Return the C source for a program. It defines calc_run(), which
+        runs the program and returns 0, or the status it was abandoned
+        with.
+        """
+        statements = tree.children
+        first_call = next((i for i, s in enumerate(statements)
+                           if contains_call(s)), len(statements))
+        declared = self.__define_functions(statements, first_call)
+
+        # the top level program
+        self.__indent = 1
+        body = self.__block(statements, {}, top=True, first_call=first_call,
+                            declared=declared)
+        run = ['int calc_run(void)', '{',
+               '    int why = setjmp(bail_env);',
+               '    if (why)', '        return why;',
+               '    depth = 0;', '    out_len = 0;'] + body + \
+              ['    return 0;', '}']
+
+        # the functions, which may use the globals shared with them
+        functions = []
+        for fun in self.__functions.values():
+            functions.extend(self.__function(fun))
+            functions.append('')
+
+        lines = [PRELUDE]
+        for var in self.__globals.values():
+            if var.ref_type == RefType.ARRAY_VAR:
+                lines.append(f"static V *{var.name};")
+            else:
+                lines.append(f"static V {var.name};")
+        lines.append('')
+        for fun in self.__functions.values():
+            lines.append(self.__prototype(fun) + ';')
+        lines.append('')
+        return '\n'.join(lines + functions + run) + '\n'
+
+    def __define_functions(self, statements, first_call):
+        """
+        Find the functions the program defines, which must all be defined
+        before anything is called. Returns the set of symbols functions
+        declare as parameters or locals.
+        """
+        declared = set()
+        for i, tree in enumerate(statements):
+            if tree.op != Operator.FUNDEF:
+                continue
+            if i > first_call:
+                raise Unsupported(tree, "a function defined after a call")
+            name = tree.children[0].token
+            if name.value in self.__functions:
+                raise Unsupported(tree, f"{name.lexeme} is defined twice")
+            return_type = SCALARS.get(tree.children[2].token.token)
+            if return_type is None:
+                raise Unsupported(tree, "a function returning a function")
+            params = []
+            for p in tree.children[1].children:
+                if p.op != Operator.DECL or p.token.token not in SCALARS:
+                    raise Unsupported(p, "a parameter which is not a number")
+                params.append(p.children[0].token.value)
+            declared.update(params)
+            for s in tree.children[3].children:
+                if s.op == Operator.DECL:
+                    declared.add(s.children[0].token.value)
+                elif s.op == Operator.ARRAY_DECL:
+                    declared.add(s.children[1].token.value)
+            self.__functions[name.value] = Function(
+                f"f_{name.lexeme}_{name.value}", tree, params, return_type)
+
+        # a name must not be both a function and a variable
+        for sym, fun in self.__functions.items():
+            if sym in declared:
+                raise Unsupported(fun.tree, "a function named like a variable")
+        return declared
+
+    def __prototype(self, fun):
+        params = ', '.join(f"V p_{i}" for i in range(len(fun.params)))
+        return f"static V {fun.name}({params or 'void'})"
+
+    def __function(self, fun):
+        tree = fun.tree
+        scope = {}
+        self.__indent = 1
+        prologue = ['    V result = vi(0);', '    int has_result = 0;',
+                    f'    if (++depth > {MAX_DEPTH})', '        bail(DEPTH);']
+        for i, p in enumerate(tree.children[1].children):
+            id = p.children[0].token
+            if id.value in scope:
+                raise Unsupported(p, f"{id.lexeme} is declared twice")
+            var = Variable(f"l_{id.lexeme}_{id.value}", SCALARS[p.token.token])
+            scope[id.value] = var
+            prologue.append(f"    V {var.name} = p_{i};")
+        body = self.__block(tree.children[3].children, scope, top=True,
+                            function=True)
+
+        # the result is the last value printed, coerced to the return type
+        epilogue = [f"    free({var.name});" for var in scope.values()
+                    if var.ref_type == RefType.ARRAY_VAR]
+        coerce = 'to_int' if fun.return_type == RefType.INT_VAR else 'to_real'
+        epilogue += ['    --depth;', '    if (!has_result)',
+                     '        bail(NO_RESULT);', f'    return {coerce}(result);']
+        return [self.__prototype(fun), '{'] + prologue + body + epilogue + \
+               ['}']
+
+    def __emit(self, line):
+        self.__lines.append('    ' * self.__indent + line)
+
+    def __temp(self):
+        self.__temps += 1
+        return f"t{self.__temps}"
+
+    def __block(self, statements, scope, top=False, function=False,
+                first_call=None, declared=()):
+        """
+        Translate a list of statements, returning their lines. Only the
+        top level of the program or of a function body may declare
+        anything: scope, which maps symbols to Variables, is added to as
+        it does.
+        """
+        lines = self.__lines
+        self.__lines = []
+        for i, tree in enumerate(statements):
+            if tree.op in (Operator.DECL, Operator.ARRAY_DECL):
+                if not top:
+                    raise Unsupported(tree, "a declaration in a block")
+                var = self.__declare(tree, scope, 'l' if function else 'g')
+                if not function:
+                    sym = tree.children[-1].token.value
+                    if sym in self.__functions:
+                        raise Unsupported(tree, "a variable named like a "
+                                                "function")
+                    self.__globals[sym] = var
+                    # globals declared before the first call are shared
+                    # with functions, unless one could find its own
+                    if i < first_call and sym not in declared:
+                        self.__shared[sym] = var
+            elif tree.op == Operator.FUNDEF:
+                if function or not top:
+                    raise Unsupported(tree, "a nested function")
+            else:
+                self.__statement(tree, scope, function and top)
+        result, self.__lines = self.__lines, lines
+        return result
+
+    def __declare(self, tree, scope, prefix):
+        if tree.op == Operator.DECL:
+            id = tree.children[0].token
+            ref_type = SCALARS.get(tree.token.token)
+            if ref_type is None:
+                raise Unsupported(tree, "a function variable")
+            bounds = None
+        else:
+            id = tree.children[1].token
+            ref_type = RefType.ARRAY_VAR
+            values = [t.token.value for t in tree.children[0].children]
+            bounds = list(zip(values[0::2], values[1::2]))
+        if id.value in scope:
+            raise Unsupported(tree, f"{id.lexeme} is declared twice")
+        var = Variable(f"{prefix}_{id.lexeme}_{id.value}", ref_type, bounds)
+        scope[id.value] = var
+
+        if ref_type == RefType.INT_VAR:
+            init = 'vi(0)'
+        elif ref_type == RefType.REAL_VAR:
+            init = 'vr(0.0)'
+        else:
+            size = 1
+            for low, high in bounds:
+                size *= max(high - low + 1, 0)
+            if size > MAX_ARRAY:
+                raise Unsupported(tree, "an array too large")
+            init = f"allocate({size})"
+        if prefix == 'l':
+            self.__emit(f"V {'*' * (bounds is not None)}{var.name} = {init};")
+        elif bounds is not None:
+            # a global array is made afresh each time the program runs
+            self.__emit(f"free({var.name});")
+            self.__emit(f"{var.name} = {init};")
+        else:
+            self.__emit(f"{var.name} = {init};")
+        return var
+
+    def __statement(self, tree, scope, result):
+        """
+        Translate a statement. With result, the statement is at the top of
+        a function body, and its value is the function's result so far.
+        """
+        if tree.op == Operator.ASSIGN:
+            self.__assign(tree, scope)
+        elif tree.op in (Operator.IF, Operator.WHILE):
+            loop = tree.op == Operator.WHILE
+            if loop:
+                self.__emit('for (;;) {')
+                self.__indent += 1
+            test = self.__expr(tree.children[0], scope)
+            if loop:
+                self.__emit(f"if (!truth({test}))")
+                self.__emit('    break;')
+            else:
+                self.__emit(f"if (truth({test})) {{")
+                self.__indent += 1
+            self.__lines.extend(self.__block(tree.children[1].children,
+                                             scope))
+            self.__indent -= 1
+            self.__emit('}')
+        elif tree.op in VALUED:
+            value = self.__expr(tree, scope)
+            self.__emit(f"emit({value});")
+            if result:
+                self.__emit(f"result = {value};")
+                self.__emit('has_result = 1;')
+        else:
+            raise Unsupported(tree, f"{tree.op.name.lower()} is not "
+                                    f"supported")
+
+    def __variable(self, tree, scope):
+        var = scope.get(tree.token.value) or \
+              self.__shared.get(tree.token.value)
+        if var is None:
+            raise Unsupported(tree, f"{tree.token.lexeme} is not a variable "
+                                    f"declared before it is used")
+        return var
+
+    def __element(self, tree, var, scope):
+        """
+        Return the C lvalue of an array element, evaluating its index.
+        """
+        if var.ref_type != RefType.ARRAY_VAR:
+            raise Unsupported(tree, f"{tree.token.lexeme} is not an array")
+        if len(tree.children) != len(var.bounds):
+            raise Unsupported(tree, "an array indexed by part")
+        index = [self.__expr(t, scope) for t in tree.children]
+        offset = None
+        for i, (low, high) in zip(index, var.bounds):
+            n = max(high - low + 1, 0)
+            j = f"at({i}, {low}, {n})"
+            offset = j if offset is None else f"({offset}) * {n} + {j}"
+        return f"{var.name}[{offset}]"
+
+    def __assign(self, tree, scope):
+        target = tree.children[0]
+        if target.op not in (Operator.VAR, Operator.ARRAY_VAR):
+            raise Unsupported(tree, "an assignment to a record")
+        var = self.__variable(target, scope)
+        value = self.__expr(tree.children[1], scope)
+        if target.op == Operator.ARRAY_VAR:
+            # the value comes before the index, and is not coerced
+            self.__emit(f"{self.__element(target, var, scope)} = {value};")
+        elif var.ref_type == RefType.INT_VAR:
+            self.__emit(f"{var.name} = to_int({value});")
+        elif var.ref_type == RefType.REAL_VAR:
+            self.__emit(f"{var.name} = to_real({value});")
+        else:
+            raise Unsupported(tree, "an assignment to an array")
+
+    def __expr(self, tree, scope):
+        """
+        Translate an expression, evaluating it into a new temporary so that
+        everything happens in the order the tree walker does it. Returns
+        the temporary's name.
+        """
+        if tree.op == Operator.LIT:
+            value = tree.token.value
+            if type(value) == float:
+                code = f"vr({value.hex()})"
+            elif -2**63 <= value < 2**63:
+                code = f"vi(INT64_C({value}))"
+            else:
+                raise Unsupported(tree, "an integer too large")
+        elif tree.op == Operator.VAR:
+            var = self.__variable(tree, scope)
+            if var.ref_type == RefType.ARRAY_VAR:
+                raise Unsupported(tree, "an array used as a value")
+            code = var.name
+        elif tree.op == Operator.ARRAY_VAR:
+            var = self.__variable(tree, scope)
+            code = self.__element(tree, var, scope)
+        elif tree.op in BINARY_OPERATORS:
+            left = self.__expr(tree.children[0], scope)
+            right = self.__expr(tree.children[1], scope)
+            code = f"{BINARY_OPERATORS[tree.op]}({left}, {right})"
+        elif tree.op == Operator.NEG:
+            code = f"v_neg({self.__expr(tree.children[0], scope)})"
+        elif tree.op == Operator.FUNCALL:
+            code = self.__call(tree, scope)
+        else:
+            raise Unsupported(tree, f"{tree.op.name.lower()} is not "
+                                    f"supported")
+        temp = self.__temp()
+        self.__emit(f"V {temp} = {code};")
+        return temp
+
+    def __call(self, tree, scope):
+        callee = tree.children[0]
+        fun = self.__functions.get(callee.token.value) \
+              if callee.op == Operator.VAR else None
+        if fun is None:
+            raise Unsupported(tree, "a call of something not a function")
+        args = tree.children[1].children
+        if len(args) != len(fun.params):
+            raise Unsupported(tree, f"the wrong number of arguments to "
+                                    f"{callee.token.lexeme}")
+        args = [self.__expr(arg, scope) for arg in args]
+        return f"{fun.name}({', '.join(args)})"
+
+
+def translate(tree):
+    """
+    Return the C source for a program, or raise Unsupported.
+    """
+    return Translator().program(tree)
+
+
+def cache_path(directory, source):
+    """
+    Return where the shared object for some C source lives.
+    """
+    digest = hashlib.sha256(f"{FORMAT} {CC} {' '.join(CFLAGS)}".encode())
+    digest.update(source.encode())
+    return os.path.join(directory, CACHE_DIR,
+                        digest.hexdigest() + CACHE_SUFFIX)
+
+
+def build(source, directory):
+    """
+    Compile C source into a shared object in the cache under directory,
+    unless it is there already. Returns its path. Raises OSError if the
+    compiler cannot be run, and CalledProcessError if it fails.
+    """
+    path = cache_path(directory, source)
+    if os.path.exists(path):
+        return path
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with tempfile.TemporaryDirectory() as work:
+        c_file = os.path.join(work, 'program.c')
+        with open(c_file, 'w') as f:
+            f.write(source)
+        so_file = os.path.join(work, 'program' + CACHE_SUFFIX)
+        subprocess.run([CC] + CFLAGS + ['-o', so_file, c_file, '-lm'],
+                       check=True, capture_output=True)
+        # replace, so that a concurrent build cannot be seen half written
+        os.replace(so_file, path)
+    return path
+
+
+def run(tree, path=None, explain=False):
+    """
+    Run a program natively if possible. path is the program's source
+    file, next to which the cache is kept (the current directory if there
+    is none). Returns false, having printed nothing, if the program must
+    be run by the tree walker instead; with explain, why is written to
+    stderr.
+    """
+    def fall_back(reason):
+        if explain:
+            sys.stderr.write(f"not run natively: {reason}\n")
+        return False
+
+    try:
+        source = translate(tree)
+    except Unsupported as e:
+        return fall_back(e)
+    directory = os.path.dirname(os.path.abspath(path)) if path else os.getcwd()
+    try:
+        library = ctypes.CDLL(build(source, directory))
+    except subprocess.CalledProcessError as e:
+        return fall_back(f"the C compiler failed: {e.stderr.decode()}")
+    except OSError as e:
+        return fall_back(f"the C code could not be built: {e}")
+
+    library.calc_output.restype = ctypes.POINTER(Value)
+    library.calc_output_length.restype = ctypes.c_long
+    status = library.calc_run()
+    if status:
+        return fall_back(f"the native run stopped at {BAILS[status]}")
+
+    output = library.calc_output()
+    for i in range(library.calc_output_length()):
+        value = output[i]
+        print(value.r if value.real else value.i)
+    return True
+
+
+def main(file, explain=False, source=False):
+    """
+    Parse a program and run it natively, or with the tree walker if it
+    cannot be.
+    """
+    lexer = Lexer(file)
+    calc.source_lines = lexer.lines
+    tree = Parser(lexer).parse()
+    if source:
+        try:
+            print(translate(tree), end='')
+        except Unsupported as e:
+            sys.stderr.write(f"not run natively: {e}\n")
+        return
+    path = None if file is sys.stdin else file.name
+    if not run(tree, path, explain):
+        calc.eval_tree(tree, ReferenceEnvironment())
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    flags = {}
+    for flag in ('--explain', '--source'):
+        flags[flag] = flag in args
+        if flags[flag]:
+            args.remove(flag)
+    if len(args) == 1:
+        file = open(args[0], 'r')
+    else:
+        file = sys.stdin
+    main(file, flags['--explain'], flags['--source'])
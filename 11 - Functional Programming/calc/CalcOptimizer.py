@@ -0,0 +1,974 @@
+"""
+Optimizing passes over calc parse trees.
+
+An Optimizer rewrites a program's tree into one which runs the same but
+does less work. Its passes can each be turned off:
+
+  fold - an operator whose operands are all literals is replaced by a
+         literal of its value, computed with the same Python operators
+         the tree walker uses. Operations which would fail (division by
+         zero, overflow), give a value calc has no literal for (a complex
+         number, inf or nan), or would build a huge integer are left to
+         run, so errors still happen when and where they did.
+  propagate - a variable whose value is known is replaced by a literal of
+         its value. Values are known through straight line code for the
+         integer and real variables an activation (the program, a call)
+         has itself certainly declared, as no other declaration can be
+         found while they exist. Declarations give zero, and assignments
+         of literals give the literal coerced to the variable's type, as
+         eval_assign does. Anything a loop assigns is not known in it,
+         and an if's body only keeps what it did not change. Since calc is
+         dynamically scoped, a call can assign any variable its caller
+         can see, so nothing is known after a call.
+  eliminate - statements which can make no difference to what the
+         program prints are removed:
+           - ifs and whiles whose conditions are literal zeros;
+           - stores of literals to numeric variables the activation has
+             certainly declared, if the value can not be read before it
+             is stored over or the program ends. A call can read any
+             variable, and a closure made by a function can read its
+             variables once it has returned, so nothing stored in a
+             function is dead if there is a call after the store, or
+             when the function returns. A variable which is never read
+             anywhere in the program is dead everywhere;
+           - declarations of variables, functions and records which are
+             never used anywhere in the program, if the name is
+             declared nowhere else and the declaration is not in a loop
+             (where it would fail as a redeclaration the second time
+             round). A record whose fields refer to other records is
+             kept, as its definition could fail.
+         Removing statements can leave more to remove, so this repeats
+         until nothing more can be removed.
+  hoist - the loop invariant parts of the conditions and bodies of while
+         loops are computed once, into temporaries, before the loop.
+         Only loops which make no calls are hoisted from, as a call can
+         assign anything. A part is invariant if it is an arithmetic
+         operation on literals and numeric variables the activation has
+         certainly declared (not parameters, which can hold anything)
+         and the loop never assigns or inputs. Array elements and record
+         fields are never invariant: they can be stored to through
+         other names, which share the array or record, and reading them
+         can fail. As hoisted parts run even if the loop does not, they
+         must not be able to fail either, so operations which could
+         raise (a division other than by a literal, most powers, mixing
+         integers which could be too large for a real with reals) are
+         left in the loop. Each temporary is declared by the statement
+         of its activation's body the loop is in, which runs once.
+
+The trees given are left as they are; optimize() returns a new tree which
+shares the parts it did not change. Function bodies which have not been
+parsed yet (Parser(lazy=True)) are left alone.
+
+Usage: python3 CalcOptimizer.py [--no-fold] [--no-propagate] [--no-eliminate]
+                                [--no-hoist] [file.calc]
+       Prints the optimized tree, and what was optimized.
+"""
+import math
+import sys
+from collections import Counter
+from CalcLexer import Lexer, Token, TokenDetail
+from CalcParser import Parser, Operator, ParseTree, LazyProgram
+
+# Operators which can be folded, and how to apply them
+FOLDABLE = {Operator.ADD: lambda a, b: a + b,
+            Operator.SUB: lambda a, b: a - b,
+            Operator.MUL: lambda a, b: a * b,
+            Operator.DIV: lambda a, b: a / b,
+            Operator.POW: lambda a, b: a ** b}
+
+# the largest integer exponent folded, so folding never builds huge numbers
+MAX_FOLDED_EXPONENT = 256
+
+# the largest integer exponent hoisted out of a loop
+MAX_HOISTED_EXPONENT = 16
+
+# the largest integer literal mixed with reals in a hoisted operation, so
+# that converting it can not overflow
+MAX_MIXED_INTEGER = 2 ** 53
+
+
+class Facts:
+    """
+    What is known at a point in an activation: the declared types
+    (Token.INTEGER or Token.REAL) of the numeric variables it has
+    certainly declared, and the values known for some of them, all keyed
+    by symbol.
+    """
+    __slots__ = ('types', 'values')
+
+    def __init__(self, types=None, values=None):
+        self.types = {} if types is None else types
+        self.values = {} if values is None else values
+
+    def copy(self):
+        return Facts(dict(self.types), dict(self.values))
+
+    def forget(self, syms=None):
+        """
+        Forget the values of syms, or of everything.
+        """
+        if syms is None:
+            self.values.clear()
+            return
+        for sym in syms:
+            self.values.pop(sym, None)
+
+    def meet(self, other):
+        """
+        Keep only the values other knows to be the same.
+        """
+        for sym, value in list(self.values.items()):
+            if sym not in other.values or \
+               repr(other.values[sym]) != repr(value):
+                del self.values[sym]
+
+
+class Optimizer:
+    """
+    Rewrites parse trees with the passes which are turned on. The counts
+    of what it did are kept as attributes:
+        folded - operators replaced by literals
+        propagated - variable references replaced by literals
+        removed - statements removed
+        eliminated - tree nodes removed
+        hoisted - loop invariants hoisted into temporaries
+    """
+    def __init__(self, fold=True, propagate=True, eliminate=True,
+                 hoist=True):
+        self.fold = fold
+        self.propagate = propagate
+        self.eliminate = eliminate
+        self.hoist = hoist
+        self.folded = 0
+        self.propagated = 0
+        self.removed = 0
+        self.eliminated = 0
+        self.hoisted = 0
+        self.__symbols = None
+        self.__next_symbol = None
+        self.__temporaries = 0
+
+    def optimize(self, tree, symbols=None):
+        """
+        Return the optimized tree of a program. Temporaries are given
+        symbols from the SymbolTable symbols, if there is one, or symbols
+        the program does not use.
+        """
+        tree = self.__program(tree, Facts())
+        while self.eliminate:
+            removed = self.removed
+            tree = self.__block(tree, {}, set(), Uses(tree), False)[0]
+            if self.removed == removed:
+                break
+        if self.hoist:
+            self.__symbols = symbols
+            if symbols is None:
+                self.__next_symbol = next_symbol(tree)
+            tree = self.__activation(tree)
+        return tree
+
+    def statements(self, statements, symbols=None):
+        """
+        Optimize the top level statements of a program as they come from
+        an iterable, as eval_statements runs them. The rest of the program
+        is not known, so only what can be seen to be dead in a statement
+        is eliminated, and loops are only hoisted from if there is a
+        SymbolTable to give the temporaries symbols from.
+        """
+        facts = Facts()
+        certain = {}
+        exact = {}
+        uses = Uses()
+        self.__symbols = symbols
+        for statement in statements:
+            statement = self.__statement(statement, facts)
+            if self.eliminate:
+                if self.__dead(statement, certain, AllBut(), uses, False):
+                    continue
+                statement = self.__live(statement, certain, AllBut(), uses,
+                                        False)[0]
+                declare(statement, certain)
+            if self.hoist and symbols is not None:
+                temporaries = []
+                hoisted = self.__hoist(statement, exact, temporaries)
+                yield from temporaries
+                yield from hoisted
+                continue
+            yield statement
+
+    def report(self, out):
+        """
+        Write the statistics to out.
+        """
+        out.write(f"operators folded: {self.folded}\n"
+                  f"references propagated: {self.propagated}\n"
+                  f"statements removed: {self.removed}\n"
+                  f"nodes eliminated: {self.eliminated}\n"
+                  f"invariants hoisted: {self.hoisted}\n")
+
+    def __program(self, tree, facts):
+        if isinstance(tree, LazyProgram) and not tree.parsed:
+            return tree
+        children = [self.__statement(child, facts) for child in tree.children]
+        return rebuild(tree, children)
+
+    def __function(self, params, body):
+        """
+        Optimize a function body, which runs in an activation of its own
+        with its by value parameters declared.
+        """
+        facts = Facts()
+        for p in params:
+            if p.op == Operator.DECL and \
+               p.token.token in (Token.INTEGER, Token.REAL):
+                facts.types[p.children[0].token.value] = p.token.token
+        return self.__program(body, facts)
+
+    def __statement(self, tree, facts):
+        op = tree.op
+        if op == Operator.DECL:
+            sym = tree.children[0].token.value
+            if tree.token.token == Token.INTEGER:
+                facts.types[sym] = Token.INTEGER
+                facts.values[sym] = 0
+            elif tree.token.token == Token.REAL:
+                facts.types[sym] = Token.REAL
+                facts.values[sym] = 0.0
+            return tree
+        elif op == Operator.ASSIGN:
+            return self.__assign(tree, facts)
+        elif op == Operator.INPUT:
+            target = tree.children[0]
+            if target.op == Operator.ARRAY_VAR:
+                target = self.__index(target, facts)
+            facts.forget((target.token.value,))
+            return rebuild(tree, [target])
+        elif op == Operator.IF:
+            condition = self.__expr(tree.children[0], facts)
+            branch = facts.copy()
+            body = self.__program(tree.children[1], branch)
+            facts.meet(branch)
+            return rebuild(tree, [condition, body])
+        elif op == Operator.WHILE:
+            # nothing the loop changes is known in it, or after it
+            syms, calls = assignments(tree.children)
+            facts.forget(None if calls else syms)
+            condition = self.__expr(tree.children[0], facts)
+            body = self.__program(tree.children[1], facts.copy())
+            return rebuild(tree, [condition, body])
+        elif op == Operator.FUNDEF:
+            children = list(tree.children)
+            children[3] = self.__function(children[1].children, children[3])
+            return rebuild(tree, children)
+        elif op in (Operator.ARRAY_DECL, Operator.REC_DEF, Operator.REC_DECL):
+            return tree
+        return self.__expr(tree, facts)
+
+    def __assign(self, tree, facts):
+        target, value = tree.children
+        if target.op == Operator.REC_ACCESS:
+            # the record is found, then the value computed, and the field
+            # assigned in the record
+            target = self.__record(target, facts)
+            value = self.__expr(value, facts)
+        elif target.op == Operator.ARRAY_VAR:
+            # the index is computed after the value
+            value = self.__expr(value, facts)
+            target = self.__index(target, facts)
+        else:
+            value = self.__expr(value, facts)
+            sym = target.token.value
+            ref_type = facts.types.get(sym)
+            facts.forget((sym,))
+            if ref_type is not None and value.op == Operator.LIT:
+                value_of = coerce(ref_type, value.token.value)
+                if value_of is not None:
+                    facts.values[sym] = value_of
+        return rebuild(tree, [target, value])
+
+    def __record(self, tree, facts):
+        """
+        Optimize a record access. The record is found in the activation,
+        and the field in the record, where nothing is known.
+        """
+        record = self.__expr(tree.children[0], facts)
+        field = tree.children[1]
+        if field.op == Operator.REC_ACCESS:
+            field = self.__record(field, Facts())
+        else:
+            field = self.__expr(field, Facts())
+        if calls(field):
+            facts.forget()
+        return rebuild(tree, [record, field])
+
+    def __index(self, tree, facts):
+        """
+        Optimize the index of an array reference.
+        """
+        return rebuild(tree, [self.__expr(t, facts) for t in tree.children])
+
+    def __expr(self, tree, facts):
+        op = tree.op
+        if op == Operator.VAR:
+            sym = tree.token.value
+            if self.propagate and sym in facts.values:
+                self.propagated += 1
+                return literal(facts.values[sym], tree)
+            return tree
+        elif op in FOLDABLE:
+            left = self.__expr(tree.children[0], facts)
+            right = self.__expr(tree.children[1], facts)
+            if self.fold and left.op == Operator.LIT and \
+               right.op == Operator.LIT:
+                value = fold(op, left.token.value, right.token.value)
+                if value is not None:
+                    self.folded += 1
+                    self.eliminated += 2
+                    return literal(value, tree)
+            return rebuild(tree, [left, right])
+        elif op == Operator.NEG:
+            left = self.__expr(tree.children[0], facts)
+            if self.fold and left.op == Operator.LIT:
+                self.folded += 1
+                self.eliminated += 1
+                return literal(-left.token.value, tree)
+            return rebuild(tree, [left])
+        elif op == Operator.ARRAY_VAR:
+            return self.__index(tree, facts)
+        elif op == Operator.REC_ACCESS:
+            return self.__record(tree, facts)
+        elif op == Operator.FUNCALL:
+            # the function and its arguments are evaluated by the caller,
+            # and then the call can change anything. A named function is
+            # left named, for the errors which name it.
+            callee = tree.children[0]
+            if callee.op != Operator.VAR:
+                callee = self.__expr(callee, facts)
+            args = tree.children[1]
+            args = rebuild(args, [self.__expr(a, facts)
+                                  for a in args.children])
+            facts.forget()
+            return rebuild(tree, [callee, args])
+        elif op == Operator.LAMBDA:
+            children = list(tree.children)
+            children[2] = self.__function(children[0].children, children[2])
+            return rebuild(tree, children)
+        return tree
+
+
+    ################ Dead code elimination ################
+    def __block(self, tree, certain, live, uses, looping):
+        """
+        Remove the dead statements of a PROG. certain gives the types of
+        the numeric variables its activation has certainly declared before
+        it runs, live is the set of variables which could be read after it,
+        and looping is true if it is in a loop. Returns
+        the new tree and the variables which could be read before it runs.
+        """
+        if isinstance(tree, LazyProgram) and not tree.parsed:
+            return tree, None
+
+        # what is certainly declared before each statement
+        before = []
+        certain = dict(certain)
+        for statement in tree.children:
+            before.append(dict(certain))
+            declare(statement, certain)
+
+        # work back from the end, keeping what is live
+        children = []
+        for statement, certain in zip(reversed(tree.children),
+                                      reversed(before)):
+            if self.__dead(statement, certain, live, uses, looping):
+                continue
+            statement, live = self.__live(statement, certain, live, uses,
+                                          looping)
+            children.append(statement)
+        children.reverse()
+        return rebuild_block(tree, children), live
+
+    def __dead(self, tree, certain, live, uses, looping):
+        """
+        Return true, and count it, if statement tree is dead.
+        """
+        op = tree.op
+        if op in (Operator.IF, Operator.WHILE):
+            condition = tree.children[0]
+            dead = condition.op == Operator.LIT and condition.token.value == 0
+        elif op == Operator.ASSIGN:
+            target, value = tree.children
+            sym = target.token.value
+            dead = target.op == Operator.VAR and sym in certain and \
+                   value.op == Operator.LIT and \
+                   coerce(certain[sym], value.token.value) is not None and \
+                   (sym not in live or
+                    uses.complete and sym not in uses.read)
+        elif op in DECLARATIONS:
+            sym = declared_symbol(tree)
+            dead = uses.complete and not looping and \
+                   uses.declared[sym] == 1 and sym not in uses.used
+            if op == Operator.REC_DEF:
+                dead = dead and simple_record(tree)
+        else:
+            dead = False
+        if dead:
+            self.removed += 1
+            self.eliminated += size(tree)
+        return dead
+
+    def __live(self, tree, certain, live, uses, looping):
+        """
+        Remove the dead code nested in a statement which is kept. Returns
+        the new tree and the variables which could be read before it.
+        """
+        op = tree.op
+        if op == Operator.ASSIGN:
+            target, value = tree.children
+            value = self.__nested(value, uses)
+            if target.op != Operator.VAR:
+                live = union(live, reads(target))
+            elif target.token.value in certain:
+                # the store is over whatever was stored before
+                live = kill(live, target.token.value)
+            return rebuild(tree, [target, value]), union(live, reads(value))
+        elif op == Operator.IF:
+            condition = self.__nested(tree.children[0], uses)
+            body, body_live = self.__block(tree.children[1], certain, live,
+                                           uses, looping)
+            return rebuild(tree, [condition, body]), \
+                   union(live, body_live, reads(condition))
+        elif op == Operator.WHILE:
+            # whatever the loop reads is live all through it
+            condition = self.__nested(tree.children[0], uses)
+            live = union(live, reads(tree))
+            body = self.__block(tree.children[1], certain, live, uses,
+                                True)[0]
+            return rebuild(tree, [condition, body]), live
+        elif op == Operator.FUNDEF:
+            children = list(tree.children)
+            children[3] = self.__prune(children[1].children, children[3],
+                                       uses)
+            return rebuild(tree, children), live
+        elif op in DECLARATIONS:
+            return tree, live
+        return self.__nested(tree, uses), union(live, reads(tree))
+
+    def __prune(self, params, body, uses):
+        """
+        Remove the dead code of a function body. Anything could be read
+        once it returns.
+        """
+        certain = {}
+        for p in params:
+            declare(p, certain)
+        return self.__block(body, certain, AllBut(), uses, False)[0]
+
+    def __nested(self, tree, uses):
+        """
+        Remove the dead code of the lambdas in an expression.
+        """
+        if tree.op == Operator.LAMBDA:
+            children = list(tree.children)
+            children[2] = self.__prune(children[0].children, children[2],
+                                       uses)
+            return rebuild(tree, children)
+        return rebuild(tree, [self.__nested(child, uses)
+                              for child in tree.children])
+
+
+    ################ Loop invariant code motion ################
+    def __activation(self, tree):
+        """
+        Hoist the invariants of the loops in the body of an activation,
+        declaring their temporaries before the statements they are in.
+        """
+        if isinstance(tree, LazyProgram) and not tree.parsed:
+            return tree
+        children = []
+        exact = {}
+        for statement in tree.children:
+            temporaries = []
+            hoisted = self.__hoist(statement, exact, temporaries)
+            children += temporaries
+            children += hoisted
+        return rebuild_block(tree, children)
+
+    def __hoist(self, tree, exact, temporaries):
+        """
+        Hoist the invariants of the loops in a statement, given the types
+        of the numeric variables exactly of their declared type (exact).
+        The temporaries' declarations are added to temporaries. Returns
+        the statements to replace it with.
+        """
+        op = tree.op
+        if op == Operator.WHILE:
+            statements = []
+            syms, call = assignments(tree.children)
+            if not call:
+                invariants = {}
+                tree = self.__loop(tree, syms, exact, invariants)
+                for temporary, value in invariants.values():
+                    temporaries.append(temporary)
+                    statements.append(assignment(temporary, value))
+                    exact[temporary.children[0].token.value] = \
+                        temporary.token.token
+
+            # then hoist out of the loops inside the loop
+            body = self.__hoist_block(tree.children[1], exact, temporaries)
+            statements.append(rebuild(tree, [tree.children[0], body]))
+            return statements
+        elif op == Operator.IF:
+            body = self.__hoist_block(tree.children[1], exact, temporaries)
+            return [rebuild(tree, [tree.children[0], body])]
+        elif op == Operator.FUNDEF:
+            children = list(tree.children)
+            children[3] = self.__activation(children[3])
+            return [rebuild(tree, children)]
+        declare(tree, exact)
+        return [tree]
+
+    def __hoist_block(self, tree, exact, temporaries):
+        """
+        Hoist out of the loops in the body of an if or while.
+        """
+        exact = dict(exact)
+        children = []
+        for statement in tree.children:
+            children += self.__hoist(statement, exact, temporaries)
+        return rebuild_block(tree, children)
+
+    def __loop(self, tree, variant, exact, invariants):
+        """
+        Replace the invariant parts of a loop, or the statements and
+        expressions in it, with temporaries. variant is the variables the
+        loop assigns; invariants maps the key of each part replaced to its
+        temporary's declaration and the part.
+        """
+        op = tree.op
+        if op in (Operator.WHILE, Operator.IF):
+            return rebuild(tree, [self.__loop(tree.children[0], variant,
+                                              exact, invariants),
+                                  self.__loop(tree.children[1], variant,
+                                              exact, invariants)])
+        elif op == Operator.PROG:
+            return rebuild(tree, [self.__loop(t, variant, exact, invariants)
+                                  for t in tree.children])
+        elif op == Operator.ASSIGN:
+            target, value = tree.children
+            if target.op != Operator.VAR:
+                target = self.__loop(target, variant, exact, invariants)
+            value = self.__loop(value, variant, exact, invariants)
+            return rebuild(tree, [target, value])
+        elif op == Operator.INPUT:
+            target = tree.children[0]
+            if target.op != Operator.VAR:
+                target = self.__loop(target, variant, exact, invariants)
+            return rebuild(tree, [target])
+        elif op == Operator.ARRAY_VAR:
+            return rebuild(tree, [self.__loop(t, variant, exact, invariants)
+                                  for t in tree.children])
+        elif op == Operator.REC_ACCESS:
+            # the field is found in the record, so only the record could
+            # have invariants
+            record = self.__loop(tree.children[0], variant, exact,
+                                 invariants)
+            return rebuild(tree, [record, tree.children[1]])
+        elif op in FOLDABLE or op == Operator.NEG:
+            ref_type = invariant_type(tree, variant, exact)
+            if ref_type is None:
+                return rebuild(tree, [self.__loop(t, variant, exact,
+                                                  invariants)
+                                      for t in tree.children])
+            key = tree_key(tree)
+            if key not in invariants:
+                invariants[key] = (self.__temporary(ref_type, tree), tree)
+                self.hoisted += 1
+            return invariants[key][0].children[0]
+        return tree
+
+    def __temporary(self, ref_type, tree):
+        """
+        Return the declaration of a new temporary of ref_type, placed
+        where tree was. Its name can not be an identifier.
+        """
+        self.__temporaries += 1
+        name = f"loop invariant {self.__temporaries}"
+        if self.__symbols is not None:
+            sym = self.__symbols.intern(name)
+        else:
+            sym = self.__next_symbol
+            self.__next_symbol += 1
+        offset = tree.token.offset
+        var = ParseTree(Operator.VAR, TokenDetail(Token.ID, name, sym, offset))
+        lexeme = 'integer' if ref_type == Token.INTEGER else 'real'
+        return ParseTree(Operator.DECL,
+                         TokenDetail(ref_type, lexeme, None, offset), [var])
+
+
+# Statements which declare a name
+DECLARATIONS = (Operator.DECL, Operator.ARRAY_DECL, Operator.FUNDEF,
+                Operator.REC_DEF)
+
+
+class Uses:
+    """
+    How each symbol is used in a program:
+        declared - counts of the declarations of each symbol
+        used - symbols used other than by being declared
+        read - symbols whose values are read
+        complete - false if some of the program is not known, either
+                   because function bodies have not been parsed yet or
+                   because no program was given
+    Record definitions are keyed as they are in the environment.
+    """
+    def __init__(self, tree=None):
+        self.declared = Counter()
+        self.used = set()
+        self.read = set()
+        self.complete = tree is not None
+        if tree is not None:
+            self.__visit(tree)
+
+    def __visit(self, tree):
+        if isinstance(tree, LazyProgram) and not tree.parsed:
+            self.complete = False
+            return
+        op = tree.op
+        children = tree.children
+        if op == Operator.REC_DEF:
+            # the fields are wrapped in a DECL, which declares nothing
+            self.declared[declared_symbol(tree)] += 1
+            children = children[1].children
+        elif op in (Operator.DECL, Operator.ARRAY_DECL, Operator.REC_DECL,
+                    Operator.FUNDEF):
+            self.declared[declared_symbol(tree)] += 1
+            if op == Operator.REC_DECL:
+                self.used.add(record_symbol(children[0].token))
+            children = children[1:] if op != Operator.ARRAY_DECL else []
+        elif op in (Operator.ASSIGN, Operator.INPUT) and \
+             children[0].op == Operator.VAR:
+            # a variable which is only stored to still has to be declared
+            self.used.add(children[0].token.value)
+            children = children[1:]
+        elif op in (Operator.VAR, Operator.ARRAY_VAR):
+            self.used.add(tree.token.value)
+            self.read.add(tree.token.value)
+        for child in children:
+            self.__visit(child)
+
+
+def declared_symbol(tree):
+    """
+    Return the symbol a declaration declares.
+    """
+    if tree.op == Operator.REC_DEF:
+        return record_symbol(tree.children[0].token)
+    if tree.op in (Operator.ARRAY_DECL, Operator.REC_DECL):
+        return tree.children[1].token.value
+    return tree.children[0].token.value
+
+
+def record_symbol(tag):
+    """
+    Return the symbol of a record definition, as calc.record_key does.
+    """
+    return ~tag.value
+
+
+def declare(tree, certain):
+    """
+    Note the type of the numeric variable a statement or parameter
+    declares in certain.
+    """
+    if tree.op == Operator.DECL and \
+       tree.token.token in (Token.INTEGER, Token.REAL):
+        certain[tree.children[0].token.value] = tree.token.token
+
+
+def simple_record(tree):
+    """
+    Return true if defining record tree can not fail: its fields are all
+    variables and arrays, with different names.
+    """
+    fields = tree.children[1].children
+    if any(f.op not in (Operator.DECL, Operator.ARRAY_DECL) for f in fields):
+        return False
+    names = [declared_symbol(f) for f in fields]
+    return len(set(names)) == len(names)
+
+
+def reads(tree):
+    """
+    Return the variables tree could read when it runs, or None if it
+    could read any of them, as it calls a function.
+    """
+    if calls(tree):
+        return None
+    syms = set()
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, LazyProgram) and not node.parsed:
+            return None
+        if node.op in (Operator.VAR, Operator.ARRAY_VAR):
+            syms.add(node.token.value)
+        stack.extend(node.children)
+    return syms
+
+
+class AllBut(frozenset):
+    """
+    A set of live variables which holds every variable but its members,
+    for when anything could be read.
+    """
+    def __contains__(self, sym):
+        return not frozenset.__contains__(self, sym)
+
+
+def union(*live):
+    """
+    Return the union of sets of live variables, where None is all of them.
+    """
+    excluded = None
+    result = set()
+    for syms in live:
+        if syms is None:
+            syms = AllBut()
+        if isinstance(syms, AllBut):
+            excluded = frozenset(syms) if excluded is None else \
+                       excluded & syms
+        else:
+            result |= syms
+    if excluded is None:
+        return result
+    return AllBut(excluded - result)
+
+
+def kill(live, sym):
+    """
+    Return a set of live variables without sym.
+    """
+    if isinstance(live, AllBut):
+        return AllBut(live | {sym})
+    return live - {sym}
+
+
+def invariant_type(tree, variant, exact):
+    """
+    Return the type (Token.INTEGER or Token.REAL) of the value of an
+    expression if it is invariant in a loop which assigns the variables
+    variant and can be computed without failing, or None. exact gives
+    the types of the variables which certainly hold values of their
+    declared types.
+    """
+    op = tree.op
+    if op == Operator.LIT:
+        return Token.INTEGER if type(tree.token.value) == int else Token.REAL
+    elif op == Operator.VAR:
+        sym = tree.token.value
+        return exact.get(sym) if sym not in variant else None
+    elif op == Operator.NEG:
+        return invariant_type(tree.children[0], variant, exact)
+    elif op not in FOLDABLE:
+        return None
+
+    left, right = tree.children
+    left_type = invariant_type(left, variant, exact)
+    right_type = invariant_type(right, variant, exact)
+    if left_type is None or right_type is None:
+        return None
+    if op == Operator.DIV:
+        # reals divided by literals other than zero
+        if left_type == Token.REAL and small_literal(right) and \
+           right.token.value != 0:
+            return Token.REAL
+        return None
+    elif op == Operator.POW:
+        # integers to small powers
+        if left_type == Token.INTEGER and right.op == Operator.LIT and \
+           right_type == Token.INTEGER and \
+           0 <= right.token.value <= MAX_HOISTED_EXPONENT:
+            return Token.INTEGER
+        return None
+    if left_type == right_type:
+        return left_type
+    # an integer mixed with a real must be converted to one
+    integer = left if left_type == Token.INTEGER else right
+    if small_literal(integer):
+        return Token.REAL
+    return None
+
+
+def small_literal(tree):
+    """
+    Return true if tree is a literal which converts to a real exactly.
+    """
+    return tree.op == Operator.LIT and \
+           (type(tree.token.value) == float or
+            abs(tree.token.value) <= MAX_MIXED_INTEGER)
+
+
+def tree_key(tree):
+    """
+    Return a key which is the same for trees which compute the same
+    expression.
+    """
+    if tree.op == Operator.LIT:
+        return (tree.op, repr(tree.token.value))
+    if tree.op == Operator.VAR:
+        return (tree.op, tree.token.value)
+    return (tree.op,) + tuple(tree_key(child) for child in tree.children)
+
+
+def assignment(declaration, value):
+    """
+    Return an ASSIGN of value to the variable a DECL declares.
+    """
+    var = declaration.children[0]
+    token = TokenDetail(Token.EQUAL, '=', None, var.token.offset)
+    return ParseTree(Operator.ASSIGN, token, [var, value])
+
+
+def next_symbol(tree):
+    """
+    Return a symbol greater than any tree uses.
+    """
+    result = 0
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if node.token is not None and node.token.token == Token.ID:
+            result = max(result, node.token.value + 1)
+        if not isinstance(node, LazyProgram) or node.parsed:
+            stack.extend(node.children)
+    return result
+
+
+def rebuild_block(tree, children):
+    """
+    Return a PROG with its statements replaced, or tree itself if they
+    have not changed.
+    """
+    if len(children) != len(tree.children):
+        return ParseTree(tree.op, tree.token, children)
+    return rebuild(tree, children)
+
+
+def size(tree):
+    """
+    Return the number of nodes in tree.
+    """
+    if isinstance(tree, LazyProgram) and not tree.parsed:
+        return 1
+    return 1 + sum(size(child) for child in tree.children)
+
+
+def fold(op, left, right):
+    """
+    Return the value of a binary operator applied to literal values, or
+    None if it should be left to run.
+    """
+    if op == Operator.POW and type(left) == int and type(right) == int \
+       and abs(right) > MAX_FOLDED_EXPONENT and abs(left) > 1:
+        return None
+    try:
+        value = FOLDABLE[op](left, right)
+    except ArithmeticError:
+        return None
+    if type(value) == float and not math.isfinite(value):
+        return None
+    if type(value) not in (int, float):
+        return None
+    return value
+
+
+def coerce(ref_type, value):
+    """
+    Return a literal value coerced to a numeric type (Token.INTEGER or
+    Token.REAL), as eval_assign does, or None if that would fail.
+    """
+    try:
+        if ref_type == Token.INTEGER:
+            return int(value)
+        return float(value)
+    except (ArithmeticError, ValueError):
+        return None
+
+
+def literal(value, tree):
+    """
+    Return a LIT node for value, placed where tree was.
+    """
+    kind = Token.INTLIT if type(value) == int else Token.FLOATLIT
+    token = TokenDetail(kind, repr(value), value, tree.token.offset)
+    return ParseTree(Operator.LIT, token)
+
+
+def rebuild(tree, children):
+    """
+    Return tree with its children replaced, or tree itself if none of them
+    changed.
+    """
+    if all(a is b for a, b in zip(children, tree.children)):
+        return tree
+    return ParseTree(tree.op, tree.token, children)
+
+
+def calls(tree):
+    """
+    Return true if running tree could call a function. Function bodies
+    are not run where they appear, so calls in them do not count.
+    """
+    if tree.op == Operator.FUNCALL:
+        return True
+    if tree.op in (Operator.FUNDEF, Operator.LAMBDA):
+        return False
+    return any(calls(child) for child in tree.children)
+
+
+def assignments(trees):
+    """
+    Return (syms, call) for the statements or expressions of trees: the
+    variables they assign or input, and whether they could call anything.
+    """
+    syms = set()
+    call = False
+    for tree in trees:
+        if tree.op in (Operator.FUNDEF, Operator.LAMBDA):
+            continue
+        if tree.op in (Operator.ASSIGN, Operator.INPUT) and \
+           tree.children[0].op == Operator.VAR:
+            syms.add(tree.children[0].token.value)
+        if tree.op == Operator.FUNCALL:
+            call = True
+        inner, inner_call = assignments(tree.children)
+        syms |= inner
+        call = call or inner_call
+    return syms, call
+
+
+def main(file, fold=True, propagate=True, eliminate=True, hoist=True):
+    """
+    Parse and optimize a program, printing its tree and the statistics.
+    """
+    lexer = Lexer(file)
+    tree = Parser(lexer).parse()
+    optimizer = Optimizer(fold, propagate, eliminate, hoist)
+    optimizer.optimize(tree, lexer.symbols).print()
+    optimizer.report(sys.stdout)
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    flags = {}
+    for flag in ('--no-fold', '--no-propagate', '--no-eliminate',
+                 '--no-hoist'):
+        flags[flag] = flag in args
+        if flags[flag]:
+            args.remove(flag)
+    if len(args) == 1:
+        file = open(args[0], 'r')
+    else:
+        file = sys.stdin
+    main(file, not flags['--no-fold'], not flags['--no-propagate'],
+         not flags['--no-eliminate'], not flags['--no-hoist'])
@@ -0,0 +1,374 @@
+"""
+LL(1) parse table generator for the calc language.
+
+Reads the "Parser Grammar" section of a calc.bnf file, works out the
+FIRST and FOLLOW sets of its nonterminals, and writes a Python module
+holding the LL(1) parse table: for each nonterminal, the production to
+expand it by given the token on lookahead. The TableParser in
+CalcTableParser runs the generated table.
+
+Usage: python3 CalcParseGen.py [--report] [calc.bnf] [CalcLL1.py]
+       With --report, the FIRST, FOLLOW and PREDICT sets are printed
+       rather than a table written.
+
+Rules are written "< Name > ::= alternative | alternative ...", and may
+carry on over indented lines. An alternative is a sequence of
+nonterminals ("< Name >") and token names, or "" for the empty string.
+The first rule defines the start symbol, which is followed by EOF.
+
+Immediate left recursion (< A > ::= < A > x | y) is rewritten into an
+equivalent right recursive pair of rules, so older chapters' grammars can
+still be tabled. Any other problem in the grammar is reported: undefined
+nonterminals and unknown tokens are errors, as is left recursion through
+other rules, and no table is written. Two productions predicted by the
+same token are an LL(1) conflict; it is reported as a warning, and the
+production listed first wins, which is the same greedy choice the
+recursive descent parser makes.
+"""
+import re
+import sys
+from CalcLexGen import read_token_table
+
+# the token which follows the whole program
+END_OF_INPUT = 'EOF'
+
+
+def read_grammar(path):
+    """
+    Return (start, rules) from the "Parser Grammar" section of the bnf
+    file at path. rules maps each nonterminal, in the order they are
+    defined, to a list of alternatives, each a tuple of symbol names.
+    """
+    with open(path, 'r') as f:
+        lines = f.read().split('\n')
+
+    # the section runs from its underlined header to the next one
+    start = lines.index('Parser Grammar') + 2
+    end = start
+    while end + 1 < len(lines) and not re.match(r'=+$', lines[end + 1]):
+        end += 1
+
+    # a rule starts at the left margin, and a missing ::= is forgiven
+    text = {}
+    name = None
+    for line in lines[start:end]:
+        m = re.match(r'<\s*([^>]*?)\s*>\s*(?:::=)?(.*)$', line)
+        if m:
+            name = m.group(1)
+            text.setdefault(name, []).append(m.group(2))
+        elif name:
+            text[name].append(line)
+
+    rules = {}
+    for name, body in text.items():
+        rules[name] = [tuple(symbols(alternative))
+                       for alternative in ' '.join(body).split('|')]
+    return next(iter(rules), None), rules
+
+
+def symbols(alternative):
+    """
+    Return the names of the symbols in one alternative of a rule.
+    """
+    for m in re.finditer(r'<\s*([^>]*?)\s*>|""|([A-Z_]+)', alternative):
+        if m.group(1) is not None:
+            yield m.group(1)
+        elif m.group(2):
+            yield m.group(2)
+
+
+def remove_left_recursion(rules):
+    """
+    Rewrite each rule of the form < A > ::= < A > x | y as
+    < A > ::= y < A-Tail > and < A-Tail > ::= x < A-Tail > | "". Returns
+    the new rules and a list of the nonterminals which were rewritten.
+    """
+    result = {}
+    rewritten = []
+    for name, alternatives in rules.items():
+        recursive = [a[1:] for a in alternatives if a[:1] == (name,)]
+        if not recursive:
+            result[name] = alternatives
+            continue
+        tail = name + '-Tail'
+        while tail in rules:
+            tail += "'"
+        result[name] = [a + (tail,) for a in alternatives
+                        if a[:1] != (name,)]
+        result[tail] = [a + (tail,) for a in recursive] + [()]
+        rewritten.append(name)
+    return result, rewritten
+
+
+def check(rules, tokens):
+    """
+    Return a list of the errors in a grammar: undefined nonterminals,
+    unknown tokens and left recursion. tokens is the set of token names.
+    """
+    errors = []
+    for name, alternatives in rules.items():
+        for alternative in alternatives:
+            for symbol in alternative:
+                if symbol in rules or symbol in tokens:
+                    continue
+                if symbol.isupper():
+                    errors.append(f"< {name} > uses unknown token {symbol}")
+                else:
+                    errors.append(f"< {name} > uses undefined nonterminal "
+                                  f"< {symbol} >")
+    if errors:
+        return errors
+
+    nullable = nullable_set(rules)
+    for name in rules:
+        if name in left_corners(name, rules, nullable):
+            errors.append(f"< {name} > is left recursive")
+    return errors
+
+
+def left_corners(name, rules, nullable):
+    """
+    Return the set of nonterminals which can come first in something
+    derived from name.
+    """
+    result = set()
+    stack = [name]
+    while stack:
+        for alternative in rules[stack.pop()]:
+            for symbol in alternative:
+                if symbol in rules and symbol not in result:
+                    result.add(symbol)
+                    stack.append(symbol)
+                if symbol not in nullable:
+                    break
+    return result
+
+
+def nullable_set(rules):
+    """
+    Return the set of nonterminals which can derive the empty string.
+    """
+    nullable = set()
+    changed = True
+    while changed:
+        changed = False
+        for name, alternatives in rules.items():
+            if name not in nullable and \
+               any(all(s in nullable for s in a) for a in alternatives):
+                nullable.add(name)
+                changed = True
+    return nullable
+
+
+def first_of(sequence, first, nullable):
+    """
+    Return (the FIRST set of a sequence of symbols, whether it can be
+    empty).
+    """
+    result = set()
+    for symbol in sequence:
+        if symbol not in first:
+            result.add(symbol)
+            return result, False
+        result |= first[symbol]
+        if symbol not in nullable:
+            return result, False
+    return result, True
+
+
+def first_sets(rules, nullable):
+    """
+    Return a dict of the FIRST set of every nonterminal.
+    """
+    first = {name: set() for name in rules}
+    changed = True
+    while changed:
+        changed = False
+        for name, alternatives in rules.items():
+            for alternative in alternatives:
+                tokens, _ = first_of(alternative, first, nullable)
+                if not tokens <= first[name]:
+                    first[name] |= tokens
+                    changed = True
+    return first
+
+
+def follow_sets(start, rules, first, nullable):
+    """
+    Return a dict of the FOLLOW set of every nonterminal.
+    """
+    follow = {name: set() for name in rules}
+    follow[start].add(END_OF_INPUT)
+    changed = True
+    while changed:
+        changed = False
+        for name, alternatives in rules.items():
+            for alternative in alternatives:
+                for i, symbol in enumerate(alternative):
+                    if symbol not in rules:
+                        continue
+                    tokens, empty = first_of(alternative[i + 1:], first,
+                                             nullable)
+                    if empty:
+                        tokens |= follow[name]
+                    if not tokens <= follow[symbol]:
+                        follow[symbol] |= tokens
+                        changed = True
+    return follow
+
+
+def build_table(rules, first, follow, nullable):
+    """
+    Build the LL(1) parse table. Returns (productions, predict, table,
+    conflicts): the productions as (nonterminal, symbols) pairs, the set
+    of tokens predicting each one, the table mapping each nonterminal to
+    a dict from token to production number, and a list of conflicts as
+    (nonterminal, token, production kept, production dropped).
+    """
+    productions = []
+    predict = []
+    table = {}
+    conflicts = []
+    for name, alternatives in rules.items():
+        row = table[name] = {}
+        for alternative in alternatives:
+            tokens, empty = first_of(alternative, first, nullable)
+            if empty:
+                tokens |= follow[name]
+            number = len(productions)
+            productions.append((name, alternative))
+            predict.append(tokens)
+            for token in sorted(tokens):
+                if token in row:
+                    conflicts.append((name, token, row[token], number))
+                else:
+                    row[token] = number
+    return productions, predict, table, conflicts
+
+
+def production_text(production, rules):
+    """
+    Return a production written out as in the bnf file.
+    """
+    name, alternative = production
+    body = ' '.join(f"< {s} >" if s in rules else s for s in alternative)
+    return f"< {name} > ::= " + (body or '""')
+
+
+def analyze(bnf_path):
+    """
+    Read and check the grammar in the bnf file, and build its table.
+    Returns a dict of everything worked out along the way, or raises
+    ValueError listing the errors in the grammar.
+    """
+    start, rules = read_grammar(bnf_path)
+    if start is None:
+        raise ValueError("no rules in the Parser Grammar section")
+    rules, rewritten = remove_left_recursion(rules)
+    tokens = {name for name, pattern in read_token_table(bnf_path)}
+    tokens.add(END_OF_INPUT)
+    errors = check(rules, tokens)
+    if errors:
+        raise ValueError('\n'.join(errors))
+
+    nullable = nullable_set(rules)
+    first = first_sets(rules, nullable)
+    follow = follow_sets(start, rules, first, nullable)
+    productions, predict, table, conflicts = build_table(rules, first,
+                                                         follow, nullable)
+    return {'start': start, 'rules': rules, 'rewritten': rewritten,
+            'nullable': nullable, 'first': first, 'follow': follow,
+            'productions': productions, 'predict': predict,
+            'table': table, 'conflicts': conflicts}
+
+
+def warnings(grammar):
+    """
+    Return the notes and conflict warnings about an analyzed grammar.
+    """
+    rules = grammar['rules']
+    productions = grammar['productions']
+    result = [f"< {name} > was left recursive and has been rewritten"
+              for name in grammar['rewritten']]
+    for name, token, kept, dropped in grammar['conflicts']:
+        result.append(f"conflict in < {name} > on {token}: "
+                      f"{production_text(productions[kept], rules)} "
+                      f"is taken over "
+                      f"{production_text(productions[dropped], rules)}")
+    return result
+
+
+def report(grammar, out=sys.stdout):
+    """
+    Print the nullable nonterminals, the FIRST and FOLLOW sets and the
+    tokens which predict each production.
+    """
+    rules = grammar['rules']
+    show = lambda tokens: '{' + ', '.join(sorted(tokens)) + '}'
+    out.write("First and Follow\n================\n")
+    for name in rules:
+        empty = ', ""' * (name in grammar['nullable'])
+        out.write(f"First(< {name} >) = "
+                  f"{show(grammar['first'][name])[:-1]}{empty}}}\n")
+    out.write("\n")
+    for name in rules:
+        out.write(f"Follow(< {name} >) = {show(grammar['follow'][name])}\n")
+    out.write("\nPredict\n=======\n")
+    for production, tokens in zip(grammar['productions'],
+                                  grammar['predict']):
+        out.write(f"{production_text(production, rules)}\n"
+                  f"    {show(tokens)}\n")
+
+
+def generate(grammar):
+    """
+    Return the source of the parse table module for an analyzed grammar.
+    """
+    lines = ['"""',
+             'LL(1) parse table for the calc language.',
+             '',
+             'Generated by CalcParseGen.py from calc.bnf -- do not edit.',
+             '"""',
+             '',
+             '# the nonterminal a program derives from',
+             f'START = {grammar["start"]!r}',
+             '',
+             '# productions as (nonterminal, symbols); symbols which are not',
+             '# nonterminals are token names',
+             'PRODUCTIONS = (']
+    lines.extend(f'    {p!r},' for p in grammar['productions'])
+    lines.extend([')',
+                  '',
+                  '# TABLE[nonterminal][token] is the production to expand the',
+                  '# nonterminal by when token is on lookahead',
+                  'TABLE = {'])
+    for name, row in grammar['table'].items():
+        lines.append(f'    {name!r}: {row!r},')
+    lines.extend(['}', ''])
+    return '\n'.join(lines)
+
+
+def main():
+    args = sys.argv[1:]
+    show = '--report' in args
+    if show:
+        args.remove('--report')
+    bnf = args[0] if len(args) > 0 else 'calc.bnf'
+    out = args[1] if len(args) > 1 else 'CalcLL1.py'
+    try:
+        grammar = analyze(bnf)
+    except ValueError as e:
+        for error in str(e).split('\n'):
+            sys.stderr.write(f"{bnf}: {error}\n")
+        sys.exit(1)
+    for warning in warnings(grammar):
+        sys.stderr.write(f"{bnf}: {warning}\n")
+    if show:
+        report(grammar)
+        return
+    with open(out, 'w') as f:
+        f.write(generate(grammar))
+
+
+if __name__ == '__main__':
+    main()
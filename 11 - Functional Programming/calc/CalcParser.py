@@ -1,5 +1,7 @@
 import CalcLexer
-from CalcLexer import Token, TokenDetail
+from CalcLexer import Token, TokenDetail, TokenTable
+from array import array
+from bisect import bisect_left
 import sys
 from enum import Enum, auto
 import math
@@ -58,7 +60,17 @@ aryness = {
     Operator.LAMBDA: 3
 }
 
+# Binary operators handled by precedence climbing, with their precedence.
+# POW binds tighter than all of these and is right associative, so it is
+# folded into the operands.
+BINARY_OPERATORS = {Token.PLUS: (Operator.ADD, 1),
+                    Token.MINUS: (Operator.SUB, 1),
+                    Token.TIMES: (Operator.MUL, 2),
+                    Token.DIVIDE: (Operator.DIV, 2)}
+
 class ParseTree:
+    __slots__ = ('op', 'token', 'children')
+
     def __init__(self, op=None, token=None, children=None):
         if children == None:
             children = []
@@ -114,18 +126,334 @@ class ParseTree:
         for child in self.children[0:mid][::-1]:
             child.print(level+1)
 
+class LazyProgram(ParseTree):
+    """
+    A function body which has only been scanned. It is a PROG node whose
+    children are parsed from the token table, starting at token index
+    start, the first time they are asked for. options are the Parser
+    flags to parse them with.
+    """
+    __slots__ = ('__table', '__start', '__options')
+
+    def __init__(self, table, start, options):
+        self.__table = table
+        self.__start = start
+        self.__options = options
+        ParseTree.__init__(self, Operator.PROG)
+
+    @property
+    def parsed(self):
+        return self.__table is None
+
+    @property
+    def children(self):
+        if self.__table is not None:
+            table, self.__table = self.__table, None
+            body = Parser(table.reader(self.__start), **self.__options).parse()
+            ParseTree.children.__set__(self, body.children)
+        return ParseTree.children.__get__(self)
+
+    @children.setter
+    def children(self, children):
+        ParseTree.children.__set__(self, children)
+
+# Look up operators from their packed values
+OPERATORS = {op.value: op for op in Operator}
+
+class ParseArena:
+    """
+    A whole parse tree packed into parallel arrays, one entry per node in
+    preorder: the operator, the index of the node's token in the program's
+    TokenTable (-1 for none), and the indexes of its first child and next
+    sibling (-1 for none). Node 0 is the root.
+
+    Tokens which the parser made up rather than read (the implied lower
+    bound of an array) are kept in a side list, and referred to by
+    negative token indexes from -2 down.
+    """
+    def __init__(self, tree, table):
+        self.table = table
+        self.ops = array('B')
+        self.tokens = array('i')
+        self.first_child = array('i')
+        self.next_sibling = array('i')
+        self.extra_tokens = []
+
+        # number the nodes in preorder, linking each to its parent (if it
+        # is the first child) or to the previous child of its parent
+        last_child = {}
+        stack = [(tree, -1)]
+        while stack:
+            node, parent = stack.pop()
+            i = len(self.ops)
+            self.ops.append(node.op.value)
+            self.tokens.append(self.__token_index(node.token))
+            self.first_child.append(-1)
+            self.next_sibling.append(-1)
+            if parent in last_child:
+                self.next_sibling[last_child[parent]] = i
+            elif parent >= 0:
+                self.first_child[parent] = i
+            last_child[parent] = i
+
+            # push the children last first, so they are numbered in order
+            stack.extend((child, i) for child in reversed(node.children))
+
+    def __len__(self):
+        return len(self.ops)
+
+    def root(self):
+        """
+        Return an ArenaNode for the root of the tree.
+        """
+        return ArenaNode(self, 0)
+
+    def __token_index(self, token):
+        """
+        Find where token came from: its row in the token table, or a new
+        entry in the side list.
+        """
+        if token is None:
+            return -1
+        offsets = self.table.offsets
+        i = bisect_left(offsets, token.offset)
+        if i < len(offsets) and self.table.token(i) == token:
+            return i
+        self.extra_tokens.append(token)
+        return -1 - len(self.extra_tokens)
+
+    def token(self, i):
+        """
+        Return the TokenDetail of node i, or None.
+        """
+        t = self.tokens[i]
+        if t >= 0:
+            return self.table.token(t)
+        if t == -1:
+            return None
+        return self.extra_tokens[-2 - t]
+
+    def children(self, i):
+        """
+        Return the indexes of the children of node i.
+        """
+        result = []
+        child = self.first_child[i]
+        while child >= 0:
+            result.append(child)
+            child = self.next_sibling[child]
+        return result
+
+
+class ArenaNode:
+    """
+    A view of one node of a ParseArena which reads like a ParseTree, so
+    the interpreter and ParseTree.print can walk an arena unchanged.
+    Nodes are made on demand and hold nothing but their index.
+    """
+    __slots__ = ('arena', 'index')
+
+    def __init__(self, arena, index):
+        self.arena = arena
+        self.index = index
+
+    @property
+    def op(self):
+        return OPERATORS[self.arena.ops[self.index]]
+
+    @property
+    def token(self):
+        return self.arena.token(self.index)
+
+    @property
+    def children(self):
+        arena = self.arena
+        return [ArenaNode(arena, i) for i in arena.children(self.index)]
+
+    print = ParseTree.print
+
+
+# The tokens an operand (an < Exp >) can start with
+OPERAND_TOKENS = (Token.LPAREN, Token.MINUS, Token.ID, Token.LAMBDA,
+                  Token.INTLIT, Token.FLOATLIT)
+
+
+class ParseError(Exception):
+    """
+    A syntax error: the parser expected a token of kind expected (or of
+    one of the kinds in a tuple expected), but found token at the given
+    line and column.
+    """
+    def __init__(self, expected, token, line, col):
+        super().__init__(expected, token, line, col)
+        self.expected = expected
+        self.token = token
+        self.line = line
+        self.col = col
+
+    @property
+    def message(self):
+        """
+        The error without its position.
+        """
+        found = self.token.token.name
+        if self.token.lexeme and self.token.token != Token.NEWLINE:
+            found += f" {self.token.lexeme!r}"
+        if isinstance(self.expected, tuple):
+            expected = "one of " + ", ".join(t.name for t in self.expected)
+        else:
+            expected = self.expected.name
+        return f"expected {expected}, found {found}"
+
+    def __str__(self):
+        return f"line {self.line} column {self.col}: {self.message}"
+
+
+def same_tree(a, b, offsets=True):
+    """
+    Return true if two parse trees have the same shape, operators and
+    tokens. With offsets=False, where the tokens are in the source is not
+    compared.
+    """
+    stack = [(a, b)]
+    while stack:
+        a, b = stack.pop()
+        if a is None or b is None:
+            if a is not b:
+                return False
+            continue
+        if offsets:
+            tokens_differ = a.token != b.token
+        else:
+            tokens_differ = (a.token is None) != (b.token is None) or \
+                            (a.token and a.token[:3] != b.token[:3])
+        if a.op != b.op or tokens_differ or \
+           len(a.children) != len(b.children):
+            return False
+        stack.extend(zip(a.children, b.children))
+    return True
+
 class Parser:
     """
     A recursive descent parser for the calc language.
+
+    The parser reads tokens from a Lexer, or from a TokenTable which has
+    already been scanned.
+
+    With climbing=True, expressions are parsed by precedence climbing
+    rather than by the Expression' and Term' rules. That builds the same
+    trees, but in linear time and without recursing once per operator,
+    so long operator chains do not run out of stack.
+
+    With stack=True, the parser keeps its own stack of pending rules
+    instead of recursing through Python frames, so programs may nest
+    (blocks, parentheses, unary minus) as deeply as memory allows. It also
+    builds the same trees, and always climbs expressions.
+
+    With recover=True, a syntax error does not stop the parser. The error
+    is recorded in errors as a ParseError, the tokens up to the next
+    NEWLINE (or END, or the end of the file) are skipped, and parsing
+    carries on with the next statement. The tree returned then holds the
+    statements which did parse.
+
+    With lazy=True, function bodies are only scanned for their matching
+    END, and each is left as a LazyProgram which parses itself the first
+    time its statements are used, so a program pays nothing for functions
+    it never calls. A syntax error in a body is then only reported when
+    the body is parsed. Lazy parsing reads tokens from a TokenTable, and a
+    Lexer is scanned into one first; it cannot be combined with recover.
     """
-    def __init__(self, lexer):
+    def __init__(self, lexer, climbing=False, stack=False, recover=False,
+                 lazy=False):
+        if lazy and recover:
+            raise ValueError("lazy parsing cannot recover from errors")
+        if lazy and isinstance(lexer, CalcLexer.Lexer):
+            lexer = lexer.tokenize_all()
+        if isinstance(lexer, TokenTable):
+            lexer = lexer.reader()
+        if lazy and not isinstance(lexer, CalcLexer.TokenReader):
+            raise ValueError("lazy parsing needs a TokenTable")
         self.__lexer = lexer
+        self.__climbing = climbing
+        self.__stack = stack
+        self.__recover = recover
+        self.__lazy = lazy
+        self.__started = False
+        self.errors = []
     
     def parse(self):
         # starts the lexer (puts the first symbol in the look ahead buffer)
-        self.__lexer.next()
+        self.__start()
 
         # call our start symbol
+        result = self.__program()
+
+        # when recovering, an END with no block to close is an error, and
+        # the rest of the file is still parsed
+        while self.__recover and self.__has(Token.END):
+            self.__error(Token.EOF)
+            self.__lexer.next()
+            result.children.extend(self.__program().children)
+        return result
+
+    def parse_statement(self):
+        """
+        Parse the next top level statement and return its tree, or None
+        for an empty statement. When recovering, a statement with errors
+        (or a stray END) is skipped and also gives None. Call done() to
+        find out when the whole program has been read.
+        """
+        self.__start()
+        if self.__recover and self.__has(Token.END):
+            self.__error(Token.EOF)
+            self.__lexer.next()
+            return None
+        try:
+            if self.__stack:
+                return self.__run(self.__gen_statement())
+            return self.__parse_statement()
+        except ParseError:
+            self.__resync()
+            return None
+
+    def statements(self):
+        """
+        Generate the top level statements of the program, each one as soon
+        as it has been parsed, skipping empty statements. The lexer is read
+        through a LazyReader, so it goes no further than the end of the
+        statement, and a caller can run each statement before the rest of
+        the source has even arrived. Like parse(), stops at an END with no
+        block to close unless recovering.
+        """
+        self.__lexer = CalcLexer.LazyReader(self.__lexer)
+        while not self.done():
+            if not self.__recover and self.__has(Token.END):
+                return
+            statement = self.parse_statement()
+            if statement:
+                yield statement
+
+    def done(self):
+        """
+        Return true once every statement has been parsed.
+        """
+        self.__start()
+        return self.__has(Token.EOF)
+
+    def __start(self):
+        """
+        Read the first token, unless we have already.
+        """
+        if not self.__started:
+            self.__lexer.next()
+            self.__started = True
+
+    def __program(self):
+        """
+        Parse a Program, in whichever mode we are in.
+        """
+        if self.__stack:
+            return self.__run(self.__gen_program())
         return self.__parse_program()
 
 
@@ -140,9 +468,9 @@ class Parser:
         Parameters
             t - A member of CalcLexer.Token
         """
-        return self.__lexer.get_token().token == t
+        return self.__lexer.has(t)
     
-    def __must_be(self, t):
+    def __must_be(self, t, expected=None):
         """
         Determines if the next token matches token t.
         Returns true if it does, reports an error and aborts the parser 
@@ -150,14 +478,42 @@ class Parser:
 
         Parameters
             t - A member of CalcLexer.Token
+            expected - what to report was expected, if not just t: a
+                       tuple of the tokens which could have come instead
         """
         if self.__has(t):
             return True
+        if self.__recover:
+            raise self.__error(expected or t)
         
         traceback.print_stack()
-        sys.stderr.write(f"Unexpected token {self.__lexer.get_token()}\n")
+        token = self.__lexer.get_token()
+        line, col = self.__lexer.lines.line_col(token.offset)
+        sys.stderr.write(f"Unexpected token {token} at line {line} column {col}\n")
         sys.exit(-1)
 
+    def __error(self, expected):
+        """
+        Record and return a ParseError for the current token.
+        """
+        token = self.__lexer.get_token()
+        line, col = self.__lexer.lines.line_col(token.offset)
+        error = ParseError(expected, token, line, col)
+        self.errors.append(error)
+        return error
+
+    def __resync(self):
+        """
+        Recover from a syntax error by skipping to the end of the
+        statement: past the next NEWLINE, or up to an END or the end of
+        the file.
+        """
+        while not self.__has(Token.NEWLINE) and not self.__has(Token.END) \
+              and not self.__has(Token.EOF):
+            self.__lexer.next()
+        if self.__has(Token.NEWLINE):
+            self.__lexer.next()
+
     # use the naming convent __parse_nonterm() for all the parser rules
     def __parse_program(self):
         """
@@ -167,7 +523,11 @@ class Parser:
         result = ParseTree(Operator.PROG)
 
         while not self.__has(Token.EOF) and not self.__has(Token.END):
-            statement = self.__parse_statement()
+            try:
+                statement = self.__parse_statement()
+            except ParseError:
+                self.__resync()
+                continue
             if statement:
                 result.add_right(statement)
         
@@ -195,7 +555,12 @@ class Parser:
             result = None
         elif self.__has(Token.ID):
             result = self.__parse_ref()
-            s2 = self.__parse_statement2()
+            if self.__climbing and not self.__has(Token.EQUAL):
+                # the ref is the first operand of any expression here
+                s2 = None
+                result = self.__climb(result, 1)
+            else:
+                s2 = self.__parse_statement2()
             if s2:
                 s2.add_left_leaf(result)
                 result = s2
@@ -209,8 +574,8 @@ class Parser:
             result = self.__parse_function_definition()
         else:
             result = self.__parse_expression()
-        if not self.__has(Token.NEWLINE):
-            self.__must_be(Token.EOF)
+        if not self.__has(Token.EOF):
+            self.__must_be(Token.NEWLINE)
         self.__lexer.next()     # when we match a token, we should consume it
 
         return result
@@ -252,7 +617,10 @@ class Parser:
         self.__lexer.next()
 
         # get the function body
-        body = self.__parse_program()
+        if self.__lazy:
+            body = self.__skip_body()
+        else:
+            body = self.__parse_program()
         self.__must_be(Token.END)
         self.__lexer.next()
 
@@ -260,6 +628,36 @@ class Parser:
         return ParseTree(Operator.FUNDEF, tok, [id, params, return_type, body])
 
 
+    def __skip_body(self):
+        """
+        Scan a function body up to its END, counting the blocks opened and
+        closed inside it, and return a LazyProgram for it. A record
+        definition is RECORD ID followed by anything other than an ID.
+        """
+        table = self.__lexer.table
+        kinds = table.kinds
+        start = i = self.__lexer.position
+        last = len(kinds) - 1
+        depth = 0
+        while i < last:
+            kind = kinds[i]
+            if kind == Token.END:
+                if not depth:
+                    break
+                depth -= 1
+            elif kind == Token.IF or kind == Token.WHILE \
+                 or kind == Token.FUNCTION:
+                depth += 1
+            elif kind == Token.RECORD and kinds[i + 1] == Token.ID \
+                 and kinds[i + 2] != Token.ID:
+                depth += 1
+            i += 1
+        self.__lexer.seek(i)
+        return LazyProgram(table, start, {'climbing': self.__climbing,
+                                          'stack': self.__stack,
+                                          'lazy': True})
+
+
     def __parse_parameter_list(self):
         """
         < Parameter-List > ::= < Parameter-List > COMMA < Parmeter-List' >
@@ -410,6 +808,7 @@ class Parser:
         # Temporary way to handle the type specification
         if self.__has(Token.RECORD):
             self.__lexer.next()
+            self.__must_be(Token.ID)
         else:
             self.__has(Token.INTEGER) or self.__must_be(Token.REAL)
         typeToken = self.__lexer.get_token()
@@ -461,7 +860,7 @@ class Parser:
                 lb = b
             else:
                 ub = b
-                lb = TokenDetail(Token.INTLIT, "1", 1, ub.line, ub.col)
+                lb = TokenDetail(Token.INTLIT, "1", 1, ub.offset)
 
             # add our bounds
             lb = ParseTree(Operator.LIT, lb)
@@ -555,6 +954,9 @@ class Parser:
         """
         < Expression >  ::= < Term > < Expression' >
         """
+        if self.__climbing:
+            return self.__climb(self.__parse_operand(), 1)
+
         t = self.__parse_term()
         e2 = self.__parse_expression2()
 
@@ -607,6 +1009,50 @@ class Parser:
             return e3
     
 
+    def __climb(self, lhs, min_prec):
+        """
+        Precedence climbing over the binary operators. lhs is the operand
+        already parsed; operators of at least min_prec are applied to it,
+        left to right. Recursion only happens when precedence goes up, so
+        the depth is bounded by the number of levels.
+        """
+        op = BINARY_OPERATORS.get(self.__lexer.get_token().token)
+        while op and op[1] >= min_prec:
+            tok = self.__lexer.get_token()
+            self.__lexer.next()
+            rhs = self.__parse_operand()
+
+            # operators which bind tighter belong to the right operand
+            next_op = BINARY_OPERATORS.get(self.__lexer.get_token().token)
+            while next_op and next_op[1] > op[1]:
+                rhs = self.__climb(rhs, op[1] + 1)
+                next_op = BINARY_OPERATORS.get(self.__lexer.get_token().token)
+
+            lhs = ParseTree(op[0], tok, [lhs, rhs])
+            op = next_op
+        return lhs
+
+
+    def __parse_operand(self):
+        """
+        Parse an operand of the binary operators, which is a Factor:
+        a chain of Exps joined by POW. The chain is collected and then
+        folded from the right, so POW stays right associative.
+        """
+        operands = [self.__parse_exp()]
+        tokens = []
+        while self.__has(Token.POW):
+            tokens.append(self.__lexer.get_token())
+            self.__lexer.next()
+            operands.append(self.__parse_exp())
+
+        result = operands.pop()
+        while tokens:
+            result = ParseTree(Operator.POW, tokens.pop(),
+                               [operands.pop(), result])
+        return result
+
+
     def __parse_term(self):
         """
         < Term >        ::= < Factor > < Term' >
@@ -697,7 +1143,7 @@ class Parser:
         elif self.__has(Token.INTLIT):
             result = ParseTree(Operator.LIT, self.__lexer.get_token())
             self.__lexer.next()
-        elif self.__must_be(Token.FLOATLIT):
+        elif self.__must_be(Token.FLOATLIT, OPERAND_TOKENS):
             result = ParseTree(Operator.LIT, self.__lexer.get_token())
             self.__lexer.next()
         return result
@@ -810,20 +1256,392 @@ class Parser:
         # return the function
         return ParseTree(Operator.LAMBDA, tok, [params, return_type, body])
 
+    # Explicit stack mode. Each rule below is a generator: to parse a
+    # nonterminal it yields that rule's generator and is sent back the
+    # tree. __run keeps the pending rules in a list, so nesting is bounded
+    # by memory rather than by Python's recursion limit. Rules which never
+    # nest (declarations, records, parameters) are shared with the
+    # recursive parser, and expressions are parsed by precedence climbing.
+    def __run(self, rule):
+        """
+        Drive a generator rule to completion, returning its tree.
+        """
+        stack = [rule]
+        result = None
+        error = None
+        while stack:
+            try:
+                if error:
+                    # a rule failed, so the rule which asked for it fails
+                    # too, unless it recovers
+                    failed, error = error, None
+                    stack.append(stack[-1].throw(failed))
+                else:
+                    stack.append(stack[-1].send(result))
+                result = None
+            except StopIteration as done:
+                stack.pop()
+                result = done.value
+            except ParseError as failed:
+                stack.pop()
+                if not stack:
+                    raise
+                error = failed
+        return result
+
+
+    def __gen_program(self):
+        """
+        < Program >     ::= < Program > < Statement > 
+                            | < Statement >
+        """
+        result = ParseTree(Operator.PROG)
+
+        while not self.__has(Token.EOF) and not self.__has(Token.END):
+            try:
+                statement = yield self.__gen_statement()
+            except ParseError:
+                self.__resync()
+                continue
+            if statement:
+                result.add_right(statement)
+
+        return result
+
+
+    def __gen_statement(self):
+        """
+        < Statement >   ::= < Input > NEWLINE
+                            | < Var-Decl >
+                            | < Ref > < Statement' > NEWLINE
+                            | < Record-Decl > NEWLINE
+                            | < Branch > NEWLINE
+                            | < Loop > NEWLINE
+                            | < Expression > NEWLINE
+                            | < Function-Definition > NEWLINE
+                            | "" NEWLINE
+        """
+        if self.__has(Token.INPUT):
+            result = yield self.__gen_input()
+        elif self.__has(Token.INTEGER) or self.__has(Token.REAL) or self.__has(Token.ARRAY) or self.__has(Token.FUNCTION_VAR):
+            result = self.__parse_var_decl()
+        elif self.__has(Token.NEWLINE):
+            # null statement
+            result = None
+        elif self.__has(Token.ID):
+            result = yield self.__gen_ref()
+            if self.__has(Token.EQUAL):
+                # assignment
+                tok = self.__lexer.get_token()
+                self.__lexer.next()
+                value = yield self.__gen_expression()
+                result = ParseTree(Operator.ASSIGN, tok, [result, value])
+            else:
+                result = yield self.__gen_climb(result, 1)
+        elif self.__has(Token.RECORD):
+            result = self.__parse_record_decl()
+        elif self.__has(Token.IF):
+            result = yield self.__gen_branch()
+        elif self.__has(Token.WHILE):
+            result = yield self.__gen_loop()
+        elif self.__has(Token.FUNCTION):
+            result = yield self.__gen_function_definition()
+        else:
+            result = yield self.__gen_expression()
+        if not self.__has(Token.EOF):
+            self.__must_be(Token.NEWLINE)
+        self.__lexer.next()
+
+        return result
+
+
+    def __gen_function_definition(self):
+        """
+        < Function-Definition > ::= FUNCTION ID LPAREN < Parameter-List > RPAREN RETURNS < Return-Type > NEWLINE < Program > END
+        < Return-Type > ::= < Simple-Type > | FUNCTION_VAR
+        """
+        # get the function token and the id
+        self.__must_be(Token.FUNCTION)
+        tok = self.__lexer.get_token()
+        self.__lexer.next()
+        self.__must_be(Token.ID)
+        id = ParseTree(Operator.VAR, self.__lexer.get_token())
+        self.__lexer.next()
+
+        # get the parameters
+        self.__must_be(Token.LPAREN)
+        self.__lexer.next()
+        params = self.__parse_parameter_list()
+        self.__must_be(Token.RPAREN)
+        self.__lexer.next()
+
+        # get the return type
+        self.__must_be(Token.RETURNS)
+        self.__lexer.next()
+        self.__has(Token.FUNCTION_VAR) or self.__has(Token.INTEGER) or self.__must_be(Token.REAL)
+        return_type = ParseTree(Operator.FUNTYPE, self.__lexer.get_token())
+        self.__lexer.next()
+
+        # get the function body
+        if self.__lazy:
+            body = self.__skip_body()
+        else:
+            body = yield self.__gen_program()
+        self.__must_be(Token.END)
+        self.__lexer.next()
+
+        return ParseTree(Operator.FUNDEF, tok, [id, params, return_type, body])
+
+
+    def __gen_branch(self):
+        """
+        < Branch >      ::= IF < Expression > THEN NEWLINE < Program > END
+        """
+        self.__must_be(Token.IF)
+        tok = self.__lexer.get_token()
+        self.__lexer.next()
+        condition = yield self.__gen_expression()
+
+        self.__must_be(Token.THEN)
+        self.__lexer.next()
+        self.__must_be(Token.NEWLINE)
+        self.__lexer.next()
+
+        body = yield self.__gen_program()
+        self.__must_be(Token.END)
+        self.__lexer.next()
+
+        return ParseTree(Operator.IF, tok, [condition, body])
+
+
+    def __gen_loop(self):
+        """
+        < Loop >        ::= WHILE < Expression > DO NEWLINE < Program > END
+        """
+        self.__must_be(Token.WHILE)
+        tok = self.__lexer.get_token()
+        self.__lexer.next()
+        condition = yield self.__gen_expression()
+
+        self.__must_be(Token.DO)
+        self.__lexer.next()
+        self.__must_be(Token.NEWLINE)
+        self.__lexer.next()
+
+        body = yield self.__gen_program()
+        self.__must_be(Token.END)
+        self.__lexer.next()
+
+        return ParseTree(Operator.WHILE, tok, [condition, body])
+
+
+    def __gen_input(self):
+        """
+        < Input > ::= INPUT < Ref >
+        """
+        self.__must_be(Token.INPUT)
+        self.__lexer.next()
+        tok = self.__lexer.get_token()
+        result = ParseTree(Operator.INPUT, tok)
+        result.add_left((yield self.__gen_ref()))
+        return result
+
+
+    def __gen_expression(self):
+        """
+        < Expression >  ::= < Term > < Expression' >
+        """
+        lhs = yield self.__gen_operand()
+        return (yield self.__gen_climb(lhs, 1))
+
+
+    def __gen_climb(self, lhs, min_prec):
+        """
+        Precedence climbing over the binary operators (see __climb).
+        """
+        op = BINARY_OPERATORS.get(self.__lexer.get_token().token)
+        while op and op[1] >= min_prec:
+            tok = self.__lexer.get_token()
+            self.__lexer.next()
+            rhs = yield self.__gen_operand()
+
+            # operators which bind tighter belong to the right operand
+            next_op = BINARY_OPERATORS.get(self.__lexer.get_token().token)
+            while next_op and next_op[1] > op[1]:
+                rhs = yield self.__gen_climb(rhs, op[1] + 1)
+                next_op = BINARY_OPERATORS.get(self.__lexer.get_token().token)
+
+            lhs = ParseTree(op[0], tok, [lhs, rhs])
+            op = next_op
+        return lhs
+
+
+    def __gen_operand(self):
+        """
+        A chain of Exps joined by POW, folded from the right (see
+        __parse_operand).
+        """
+        operands = [(yield self.__gen_exp())]
+        tokens = []
+        while self.__has(Token.POW):
+            tokens.append(self.__lexer.get_token())
+            self.__lexer.next()
+            operands.append((yield self.__gen_exp()))
+
+        result = operands.pop()
+        while tokens:
+            result = ParseTree(Operator.POW, tokens.pop(),
+                               [operands.pop(), result])
+        return result
+
+
+    def __gen_exp(self):
+        """
+        < Exp >         ::= LPAREN  < Expression > RPAREN
+                            | MINUS < Exp > 
+                            | < Number >
+                            | < Ref >
+
+        < Number >      ::= INTLIT
+                            | FLOATLIT
+        """
+        if self.__has(Token.LPAREN):
+            self.__lexer.next()
+            result = yield self.__gen_expression()
+            self.__must_be(Token.RPAREN)
+            self.__lexer.next()
+        elif self.__has(Token.MINUS):
+            result = ParseTree(Operator.NEG, self.__lexer.get_token())
+            self.__lexer.next()
+            result.add_right((yield self.__gen_exp()))
+        elif self.__has(Token.ID) or self.__has(Token.LAMBDA):
+            result = yield self.__gen_ref()
+        elif self.__has(Token.INTLIT):
+            result = ParseTree(Operator.LIT, self.__lexer.get_token())
+            self.__lexer.next()
+        elif self.__must_be(Token.FLOATLIT, OPERAND_TOKENS):
+            result = ParseTree(Operator.LIT, self.__lexer.get_token())
+            self.__lexer.next()
+        return result
+
+
+    def __gen_ref(self):
+        """
+        < Ref >         ::= ID < Ref' >
+                            | < Lambda-Expression > < Ref' >
+
+        < Ref' >        ::= LBRACKET < Index > RBRACKET < Ref' >
+                            | DOT < Ref > 
+                            | LPAREN < Arg-List > RPAREN
+                            | ""
+        """
+        if self.__has(Token.LAMBDA):
+            tok = None
+            result = yield self.__gen_lambda_expression()
+        else:
+            self.__must_be(Token.ID)
+            tok = self.__lexer.get_token()
+            self.__lexer.next()
+            result = ParseTree(Operator.VAR, tok)
+
+        # override on array access
+        if self.__has(Token.LBRACKET):
+            self.__lexer.next()
+            index = yield self.__gen_arg_list()
+            result = ParseTree(Operator.ARRAY_VAR, tok, index)
+            self.__must_be(Token.RBRACKET)
+            self.__lexer.next()
+
+        if self.__has(Token.DOT):
+            ra = ParseTree(Operator.REC_ACCESS, self.__lexer.get_token())
+            self.__lexer.next()
+            ra.add_left(result)
+            ra.add_right((yield self.__gen_ref()))
+            result = ra
+        elif self.__has(Token.LPAREN):
+            tok = self.__lexer.get_token()
+            self.__lexer.next()
+            args = yield self.__gen_arg_list()
+            args = ParseTree(Operator.ARRAY_VAR, tok, args)
+            self.__must_be(Token.RPAREN)
+            self.__lexer.next()
+            result = ParseTree(Operator.FUNCALL, tok, [result, args])
+        return result
+
+
+    def __gen_arg_list(self):
+        """
+        < Arg-List >       ::= < Arg-List > COMMA < Expression >
+                            | < Expression >
+        Returns a list of expressions.
+        """
+        result = [(yield self.__gen_expression())]
+        while self.__has(Token.COMMA):
+            self.__lexer.next()
+            result.append((yield self.__gen_expression()))
+        return result
+
+
+    def __gen_lambda_expression(self):
+        """
+        < Lambda-Expression > ::= LAMBDA LPAREN < Parameter-List > RPAREN RETURNS < Return-Type > < Expression >
+        """
+        self.__must_be(Token.LAMBDA)
+        tok = self.__lexer.get_token()
+        self.__lexer.next()
+
+        # get the parameters
+        self.__must_be(Token.LPAREN)
+        self.__lexer.next()
+        params = self.__parse_parameter_list()
+        self.__must_be(Token.RPAREN)
+        self.__lexer.next()
+
+        # get the return type
+        self.__must_be(Token.RETURNS)
+        self.__lexer.next()
+        self.__has(Token.FUNCTION_VAR) or self.__has(Token.INTEGER) or self.__must_be(Token.REAL)
+        return_type = ParseTree(Operator.FUNTYPE, self.__lexer.get_token())
+        self.__lexer.next()
+
+        body = yield self.__gen_expression()
+        return ParseTree(Operator.LAMBDA, tok, [params, return_type, body])
+
 
-def main(file):
+def main(file, table=False, climbing=False, check=False, stack=False):
     """
-    A unit test for our parser.
+    A unit test for our parser. With check, the program is parsed by
+    recursive descent, by precedence climbing, with an explicit stack and
+    with lazy function bodies, and the trees compared.
     """
     lexer = CalcLexer.Lexer(file)
-    parser = Parser(lexer)
+    if table or check:
+        lexer = lexer.tokenize_all()
+    if check:
+        tree = Parser(lexer).parse()
+        if same_tree(tree, Parser(lexer, True).parse()) and \
+           same_tree(tree, Parser(lexer, stack=True).parse()) and \
+           same_tree(tree, Parser(lexer, lazy=True).parse()):
+            print("parsers agree")
+        else:
+            print("parsers disagree")
+            sys.exit(-1)
+        return
+    parser = Parser(lexer, climbing, stack)
     parser.parse().print()
 
 
 
 if __name__ == '__main__':
-    if len(sys.argv) == 2:
-        file = open(sys.argv[1], 'r')
+    args = sys.argv[1:]
+    flags = {}
+    for flag in ('--table', '--climb', '--check', '--stack'):
+        flags[flag] = flag in args
+        if flags[flag]:
+            args.remove(flag)
+    if len(args) == 1:
+        file = open(args[0], 'r')
     else:
         file = sys.stdin
-    main(file)
+    main(file, flags['--table'], flags['--climb'], flags['--check'],
+         flags['--stack'])
@@ -0,0 +1,68 @@
+"""
+Helpers for building the Python ast of translated calc code, shared by
+the transpiler (CalcTranspile) and the trace compiler (CalcTrace).
+
+This module must not import calc: CalcTrace is used by calc itself, and
+is given the interpreter module rather than importing it.
+"""
+import ast
+from CalcParser import Operator
+
+
+def load(id):
+    return ast.Name(id, ast.Load())
+
+
+def store(id):
+    return ast.Name(id, ast.Store())
+
+
+def attribute(value, name, ctx=None):
+    return ast.Attribute(value, name, ctx or ast.Load())
+
+
+def invoke(func, *args):
+    return ast.Call(func, list(args), [])
+
+
+def const(value):
+    return ast.Constant(value)
+
+
+def nonzero(test):
+    return ast.Compare(test, [ast.NotEq()], [const(0)])
+
+
+# Python operators for calc's
+BINARY_OPERATORS = {Operator.ADD: ast.Add, Operator.SUB: ast.Sub,
+                    Operator.MUL: ast.Mult, Operator.DIV: ast.Div,
+                    Operator.POW: ast.Pow}
+
+
+def locate(node, tree, lines):
+    """
+    Give a Python node the position of the calc tree it came from, found
+    in the LineIndex lines. Without one, the node is left to be placed by
+    ast.fix_missing_locations.
+    """
+    if tree.token is not None and lines is not None:
+        line, col = lines.line_col(tree.token.offset)
+        node.lineno = node.end_lineno = line
+        node.col_offset = col - 1
+        node.end_col_offset = col - 1 + len(tree.token.lexeme)
+    return node
+
+
+def element(array, index, lows, ctx=None):
+    """
+    Index the data of a CalcArray directly, as get_enclosing_list does,
+    given the lower bound of each dimension.
+    """
+    result = attribute(array, 'data')
+    for i, (expr, low) in enumerate(zip(index, lows)):
+        if low:
+            expr = ast.BinOp(expr, ast.Sub(), const(low))
+        last = i == len(index) - 1
+        result = ast.Subscript(result, expr,
+                               (ctx or ast.Load()) if last else ast.Load())
+    return result
@@ -0,0 +1,772 @@
+"""
+Lexical addressing for calc.
+
+A resolver pass works out, when a program is compiled, where each
+variable reference will find its variable, and compiles the program to
+closures (as CalcCompiler does) which run with Frames rather than
+ReferenceEnvironments. A Frame holds the variables of one activation (the
+program, a call or a record) in fixed size lists indexed by slot; the
+resolver gives each name an activation declares a slot in its frame.
+Values are kept in the slots as they are, without RefEntries, alongside
+the RefType each slot was declared with (None until it is declared), so
+is_local and redeclaration errors work as before.
+
+calc is dynamically scoped, so where a name is found can depend on the
+caller. A reference is resolved to (depth, slot) when the resolver can
+tell which frame will hold it:
+
+  - a name its own activation has certainly declared by then (a
+    parameter, or a declaration earlier in the same or an enclosing
+    block) is at depth 0, and is read straight from its slot, and
+    assigned with the coercion for the type it was declared with;
+  - a name its activation declares only conditionally has its slot
+    checked, and if it is not declared, is looked up by name;
+  - a lambda's frame always has the frame it was made in as its parent,
+    so a name a lambda does not declare is resolved in the activation
+    around it, at depth 1 (2, ...).
+
+Any other name (a free name in a function body, which comes from whichever
+frame made the call, or a record field) is looked up by name through the
+frames, as ReferenceEnvironment.get does.
+
+Usage: python3 CalcResolver.py [--addresses] [file.calc]
+       With --addresses, the address of each variable reference is
+       printed rather than the program run.
+"""
+import copy
+import sys
+import calc
+from calc import CalcArray, CalcClosure, CalcFunction, RefType, \
+                 record_key, runtime_error
+from CalcCompiler import BINARY_OPERATORS, return_type
+from CalcLexer import Lexer, Token
+from CalcParser import Parser, Operator
+
+
+class Frame:
+    """
+    The variables of an activation. values and types are indexed by slot,
+    and layout maps the symbols of the names declared in the activation to
+    their slots, so that names can still be found by name. A slot's type
+    is None until its name has been declared.
+    """
+    __slots__ = ('values', 'types', 'layout', 'parent')
+
+    def __init__(self, layout, parent=None):
+        self.values = [None] * len(layout)
+        self.types = [None] * len(layout)
+        self.layout = layout
+        self.parent = parent
+
+    def is_local(self, sym):
+        """
+        Return true if sym is declared in this frame.
+        """
+        slot = self.layout.get(sym)
+        return slot is not None and self.types[slot] is not None
+
+    def find(self, sym):
+        """
+        Return (frame, slot) of the innermost declaration of sym, walking
+        out through the parents, or (None, None) if there is none.
+        """
+        frame = self
+        while frame is not None:
+            slot = frame.layout.get(sym)
+            if slot is not None and frame.types[slot] is not None:
+                return frame, slot
+            frame = frame.parent
+        return None, None
+
+    def __deepcopy__(self, memo):
+        # only records are copied, and they have no parent
+        result = Frame(self.layout)
+        result.values = copy.deepcopy(self.values, memo)
+        result.types = list(self.types)
+        return result
+
+
+class Scope:
+    """
+    What the resolver knows of the frame code will run with: its layout,
+    the types of the names certainly declared in it at this point, and
+    for a lambda, the scope it is made in. The frame of a record field is
+    only known at run time, so a field's scope knows nothing.
+    """
+    PROGRAM = 'program'
+    FUNCTION = 'function'
+    LAMBDA = 'lambda'
+    RECORD = 'record'
+
+    __slots__ = ('kind', 'layout', 'sure', 'parent', 'log')
+
+    def __init__(self, kind, layout, parent=None, log=None):
+        self.kind = kind
+        self.layout = layout
+        self.sure = {}
+        self.parent = parent
+        self.log = log
+
+    def resolve(self, sym):
+        """
+        Return the address of sym, (depth, slot, ref_type): the frame depth
+        parents up holds sym in slot, and has certainly declared it with
+        ref_type, unless that is None. slot is None if sym is to be looked
+        up by name from that frame.
+        """
+        scope = self
+        depth = 0
+        while True:
+            slot = scope.layout.get(sym)
+            if slot is not None:
+                return depth, slot, scope.sure.get(sym)
+            if scope.kind == Scope.RECORD:
+                return depth, None, None
+            if scope.kind != Scope.LAMBDA:
+                return depth + 1, None, None
+            scope = scope.parent
+            depth += 1
+
+    def declared(self, sym, ref_type):
+        """
+        Note that sym is certainly declared from here on.
+        """
+        self.sure[sym] = ref_type
+
+    def fields(self):
+        """
+        Return the scope of a record field accessed from this one.
+        """
+        return Scope(Scope.RECORD, {}, log=self.log)
+
+
+def declared_names(statements, layout):
+    """
+    Give a slot in layout to each name declared by a list of statements,
+    or by the blocks nested in them, and return layout.
+    """
+    for tree in statements:
+        if tree.op in (Operator.DECL, Operator.FUNDEF):
+            sym = tree.children[0].token.value
+        elif tree.op in (Operator.ARRAY_DECL, Operator.REC_DECL):
+            sym = tree.children[1].token.value
+        elif tree.op == Operator.REC_DEF:
+            sym = record_key(tree.children[0].token)
+        elif tree.op in (Operator.IF, Operator.WHILE):
+            declared_names(tree.children[1].children, layout)
+            continue
+        else:
+            continue
+        layout.setdefault(sym, len(layout))
+    return layout
+
+
+def frame_at(frame, depth):
+    """
+    Return the frame depth parents up from frame, or None.
+    """
+    for i in range(depth):
+        if frame is None:
+            break
+        frame = frame.parent
+    return frame
+
+
+def declare(tree, slot, name, ref_type, value, frame):
+    """
+    Declare a name in its slot, as declare_name does.
+    """
+    if frame.types[slot] is not None:
+        runtime_error(tree, f"Redeclaration of variable {name}")
+    frame.types[slot] = ref_type
+    frame.values[slot] = value
+
+
+def coercion(ref_type, tree):
+    """
+    Return a function which coerces a value assigned to a variable of
+    ref_type, given the frame of the assignment, as eval_assign does, or
+    None if values are assigned as they are.
+    """
+    if ref_type == RefType.INT_VAR:
+        return lambda value, frame: int(value)
+    elif ref_type == RefType.REAL_VAR:
+        return lambda value, frame: float(value)
+    elif ref_type == RefType.FUNCTION_VAR:
+        def function_var(value, frame):
+            # type coercion and checking for assignment
+            if type(value) == CalcClosure:
+                # nothing to do
+                return value
+            elif type(value) == CalcFunction:
+                return CalcClosure(value, frame)
+            runtime_error(tree, f"Invalid assignment of non-function to function variable")
+        return function_var
+    return None
+
+
+def address(tree, scope):
+    """
+    Resolve the variable named by tree in scope, noting its address if
+    they are being logged.
+    """
+    result = scope.resolve(tree.token.value)
+    if scope.log is not None:
+        scope.log.append((tree, result))
+    return result
+
+
+def compile_tree(tree, scope):
+    """
+    Return a closure which runs tree given a frame described by scope.
+    """
+    compiler = COMPILERS.get(tree.op)
+    if compiler is None:
+        return lambda frame: None
+    return compiler(tree, scope)
+
+
+def compile_program(tree, scope):
+    statements = tuple(compile_tree(child, scope) for child in tree.children)
+
+    def program(frame):
+        # print the result of every statement that returns a result
+        result = None
+        for statement in statements:
+            value = statement(frame)
+            if value is not None:
+                result = value
+                print(result)
+
+        # create closures if we are returning functions
+        if type(result) == CalcFunction:
+            result = CalcClosure(result, frame)
+        return result
+    return program
+
+
+def compile_block(tree, scope):
+    """
+    Compile the body of an if or while; the names it declares are not
+    certainly declared once it is over.
+    """
+    sure = dict(scope.sure)
+    block = compile_program(tree, scope)
+    scope.sure = sure
+    return block
+
+
+def compile_binary(tree, scope):
+    apply = BINARY_OPERATORS[tree.op]
+    left, right = tree.children
+
+    # a literal operand is captured as its value
+    if right.op == Operator.LIT:
+        value = right.token.value
+        left = compile_tree(left, scope)
+        return lambda frame: apply(left(frame), value)
+    if left.op == Operator.LIT:
+        value = left.token.value
+        right = compile_tree(right, scope)
+        return lambda frame: apply(value, right(frame))
+    left = compile_tree(left, scope)
+    right = compile_tree(right, scope)
+    return lambda frame: apply(left(frame), right(frame))
+
+
+def compile_neg(tree, scope):
+    left = compile_tree(tree.children[0], scope)
+    return lambda frame: -left(frame)
+
+
+def compile_lit(tree, scope):
+    value = tree.token.value
+    return lambda frame: value
+
+
+def compile_lookup(tree, scope):
+    """
+    Return a closure which finds the variable named by tree, returning
+    (frame, slot), or (None, None) if it is not declared.
+    """
+    return locate(tree.token.value, address(tree, scope))
+
+
+def locate(sym, address):
+    """
+    Return a closure which finds sym at its address, as compile_lookup.
+    """
+    depth, slot, ref_type = address
+    if slot is None:
+        # look the name up
+        if depth == 0:
+            return lambda frame: frame.find(sym)
+
+        def lookup(frame):
+            frame = frame_at(frame, depth)
+            if frame is None:
+                return None, None
+            return frame.find(sym)
+        return lookup
+
+    if ref_type is not None:
+        if depth == 0:
+            return lambda frame: (frame, slot)
+        return lambda frame: (frame_at(frame, depth), slot)
+
+    def checked(frame):
+        frame = frame_at(frame, depth)
+        if frame.types[slot] is not None:
+            return frame, slot
+        if frame.parent is None:
+            return None, None
+        return frame.parent.find(sym)
+    return checked
+
+
+def compile_var(tree, scope):
+    depth, slot, ref_type = scope.resolve(tree.token.value)
+    if ref_type is not None and depth == 0:
+        # straight from its slot
+        address(tree, scope)
+        return lambda frame: frame.values[slot]
+
+    lookup = compile_lookup(tree, scope)
+
+    def var(frame):
+        frame, slot = lookup(frame)
+        if frame is None:
+            runtime_error(tree, f"Undefined Variable '{tree.token.lexeme}'")
+        return frame.values[slot]
+    return var
+
+
+def compile_array_var(tree, scope):
+    var = compile_var(tree, scope)
+    index = compile_index(tree, scope)
+    return lambda frame: var(frame).get(index(frame))
+
+
+def compile_index(tree, scope):
+    """
+    Return a closure which computes the index list of an array reference.
+    """
+    index = tuple(compile_tree(t, scope) for t in tree.children)
+    return lambda frame: [i(frame) for i in index]
+
+
+def compile_input(tree, scope):
+    target = tree.children[0]
+    name = target.token.lexeme
+    lookup = compile_lookup(target, scope)
+    index = compile_index(target, scope) \
+            if target.op == Operator.ARRAY_VAR else None
+    simple = target.op == Operator.VAR
+
+    def read(frame):
+        try:
+            var, slot = lookup(frame)
+            if var is None:
+                runtime_error(tree, f"Undefined Variable in input {name}")
+
+            # prompt for the variable and read it in
+            x = input(f"{name}=")
+
+            if var.types[slot] == RefType.INT_VAR:
+                x = int(x)
+            elif var.types[slot] == RefType.REAL_VAR:
+                x = float(x)
+
+            if simple:
+                var.values[slot] = x
+            elif index:
+                var.values[slot].set(index(frame), x)
+        except:
+            runtime_error(tree, "Invalid Input")
+    return read
+
+
+def compile_assign(tree, scope):
+    target = tree.children[0]
+    if target.op == Operator.REC_ACCESS:
+        # record access; the variable is found in the final record
+        record, target = compile_record_env(target, scope)
+        target_scope = scope.fields()
+    else:
+        # variable assignment
+        record = None
+        target_scope = scope
+    name = target.token.lexeme
+    lookup = compile_lookup(target, target_scope)
+    value_of = compile_tree(tree.children[1], scope)
+    index = compile_index(target, target_scope) \
+            if target.op == Operator.ARRAY_VAR else None
+    simple = target.op == Operator.VAR
+
+    # coerce by the type the variable was certainly declared with, if it was
+    ref_type = target_scope.resolve(target.token.value)[2]
+    if ref_type is not None:
+        coerce = coercion(ref_type, tree)
+
+        def assign(frame):
+            var, slot = lookup(frame)
+            value = value_of(frame)
+            if coerce:
+                value = coerce(value, frame)
+            if simple:
+                var.values[slot] = value
+            elif index:
+                var.values[slot].set(index(frame), value)
+        return assign
+
+    def assign(frame):
+        # lookup the variable
+        var_frame = record(frame) if record else frame
+        var, slot = lookup(var_frame)
+        if var is None:
+            runtime_error(tree, f"Assignment to undeclared variable {name}")
+
+        value = value_of(frame)
+        coerce = coercion(var.types[slot], tree)
+        if coerce:
+            value = coerce(value, frame)
+
+        if simple:
+            var.values[slot] = value
+        elif index:
+            var.values[slot].set(index(var_frame), value)
+    return assign
+
+
+def compile_record_env(tree, scope):
+    """
+    Compile a record access being assigned to. Returns (closure, field),
+    where the closure finds the frame of the final record and field is the
+    tree of the field being accessed, as get_record_env does.
+    """
+    record = compile_tree(tree.children[0], scope)
+    field = tree.children[1]
+    if field.op == Operator.REC_ACCESS:
+        inner, field = compile_record_env(field, scope.fields())
+        return (lambda frame: inner(record(frame))), field
+    return record, field
+
+
+def compile_decl(tree, scope):
+    # get the type
+    if tree.token.token == Token.INTEGER:
+        ref_type = RefType.INT_VAR
+        init = 0
+    elif tree.token.token == Token.REAL:
+        ref_type = RefType.REAL_VAR
+        init = 0.0
+    elif tree.token.token == Token.FUNCTION_VAR:
+        ref_type = RefType.FUNCTION_VAR
+        init = None
+
+    # get the name and its slot
+    name = tree.children[0].token
+    slot = scope.layout[name.value]
+    scope.declared(name.value, ref_type)
+    return lambda frame: declare(tree, slot, name.lexeme, ref_type, init,
+                                 frame)
+
+
+def compile_array_decl(tree, scope):
+    # get the array parameters
+    ref_type = tree.token.token
+    bounds = tree.children[0].children
+    name = tree.children[1].token
+    slot = scope.layout[name.value]
+    scope.declared(name.value, RefType.ARRAY_VAR)
+
+    # convert the bound list
+    bound_list = []
+    for i in range(0, len(bounds), 2):
+        bound_list.append((bounds[i].token.value, bounds[i+1].token.value))
+
+    def array_decl(frame):
+        declare(tree, slot, name.lexeme, RefType.ARRAY_VAR,
+                CalcArray(bound_list, ref_type), frame)
+    return array_decl
+
+
+def compile_rec_def(tree, scope):
+    # get the tag, and the layout of the record
+    tag = tree.children[0].token
+    fields = tree.children[1].children
+    layout = declared_names(fields, {})
+    rec_scope = Scope(Scope.RECORD, layout, log=scope.log)
+
+    # define our fields; records they hold are defined in our frame
+    defines = []
+    for decl in fields:
+        if decl.op == Operator.REC_DECL:
+            defines.append(compile_rec_decl(decl, rec_scope, scope))
+        else:
+            field = compile_tree(decl, rec_scope)
+            defines.append(lambda rec_frame, frame, field=field:
+                           field(rec_frame))
+    key = record_key(tag)
+    slot = scope.layout[key]
+    scope.declared(key, RefType.RECORD_VAR)
+
+    def rec_def(frame):
+        rec_frame = Frame(layout)
+        for define in defines:
+            define(rec_frame, frame)
+
+        # add the definition to the frame
+        declare(tree, slot, f"record {tag.lexeme}", RefType.RECORD_VAR,
+                rec_frame, frame)
+    return rec_def
+
+
+def compile_rec_decl(tree, scope, type_scope=None):
+    """
+    Compile a record declaration. Without a type_scope, the record is
+    defined in the frame it is declared in; otherwise the closure returned
+    is given that frame as well.
+    """
+    tag = tree.children[0].token
+    name = tree.children[1].token
+    slot = scope.layout[name.value]
+    scope.declared(name.value, RefType.RECORD_VAR)
+
+    # retrieve record definition
+    key = record_key(tag)
+    lookup = locate(key, (type_scope or scope).resolve(key))
+
+    def rec_decl(frame, type_frame=None):
+        if type_frame is None:
+            type_frame = frame
+        var, def_slot = lookup(type_frame)
+        if var is None:
+            runtime_error(tree, f"Undefined record {tag.lexeme}")
+        rec_def = copy.deepcopy(var.values[def_slot])
+
+        # insert into our frame
+        declare(tree, slot, name.lexeme, RefType.RECORD_VAR, rec_def, frame)
+    return rec_decl
+
+
+def compile_rec_access(tree, scope):
+    record = compile_tree(tree.children[0], scope)
+    field = compile_tree(tree.children[1], scope.fields())
+    return lambda frame: field(record(frame))
+
+
+def compile_if(tree, scope):
+    condition = compile_tree(tree.children[0], scope)
+    body = compile_block(tree.children[1], scope)
+
+    def branch(frame):
+        if condition(frame) != 0:
+            body(frame)
+    return branch
+
+
+def compile_while(tree, scope):
+    condition = compile_tree(tree.children[0], scope)
+    body = compile_block(tree.children[1], scope)
+
+    def loop(frame):
+        while condition(frame) != 0:
+            body(frame)
+    return loop
+
+
+def compile_function(params, body, scope):
+    """
+    Resolve and compile a function's parameters and body, given the scope
+    of its body, into the (layout, binders, body) kept as its
+    CalcFunction's code.
+    """
+    binders = tuple(compile_parameter(p, scope) for p in params)
+    declared_names(body.children, scope.layout)
+    return scope.layout, binders, compile_tree(body, scope)
+
+
+def compile_parameter(p, scope):
+    """
+    Return a closure which binds parameter p in the frame of a call, given
+    the call, the frame, the argument's closure and tree, and the caller's
+    frame.
+    """
+    if p.op == Operator.DECL:
+        # this is by copy of evaluation (pass by value)
+        sym = p.children[0].token.value
+        scope.layout.setdefault(sym, len(scope.layout))
+        slot = scope.layout[sym]
+        decl = compile_decl(p, scope)
+
+        def bind(call, local, arg, arg_tree, frame):
+            decl(local)
+            local.values[slot] = arg(frame)
+        return bind
+
+    # pass by reference
+    name = p.children[1].token.lexeme
+    sym = p.children[1].token.value
+    slot = scope.layout.setdefault(sym, len(scope.layout))
+
+    def bind(call, local, arg, arg_tree, frame):
+        var, var_slot = frame.find(arg_tree)
+        if var is None:
+            runtime_error(call, f"Error binding {name}")
+        declare(call, slot, name, var.types[var_slot], var.values[var_slot],
+                local)
+    return bind
+
+
+def compile_fundef(tree, scope):
+    name = tree.children[0].token
+    params = tree.children[1].children
+    ref_type = return_type(tree.children[2])
+    body = tree.children[3]
+    slot = scope.layout[name.value]
+    scope.declared(name.value, RefType.FUNCTION)
+
+    # the caller's frame is the parent of the body's
+    code = compile_function(params, body,
+                            Scope(Scope.FUNCTION, {}, log=scope.log))
+
+    def fundef(frame):
+        f = CalcFunction(params, ref_type, body, code)
+        declare(tree, slot, name.lexeme, RefType.FUNCTION, f, frame)
+    return fundef
+
+
+def compile_funcall(tree, scope):
+    callee = compile_tree(tree.children[0], scope)
+    arg_trees = tuple(tree.children[1].children)
+    args = tuple(compile_tree(a, scope) for a in arg_trees)
+    count = len(args)
+
+    def funcall(frame):
+        # retrieve the function
+        fun = callee(frame)
+        if type(fun) == CalcClosure:
+            fun_frame = fun.env
+            fun = fun.function
+        else:
+            if type(fun) != CalcFunction:
+                name = tree.children[0].token.lexeme
+                runtime_error(tree, f"{name} is not a function.")
+            fun_frame = frame
+
+        # verify the number of arguments
+        if count != len(fun.parameters):
+            name = tree.children[0].token.lexeme
+            runtime_error(tree, f"Incorrect number of arguments to {name}")
+
+        # create the frame and bind the arguments
+        layout, binders, body = fun.code
+        local = Frame(layout, fun_frame)
+        for i in range(count):
+            binders[i](tree, local, args[i], arg_trees[i], frame)
+
+        # run the function on its frame
+        result = body(local)
+        if fun.return_type == RefType.INT_VAR:
+            result = int(result)
+        elif fun.return_type == RefType.REAL_VAR:
+            result = float(result)
+        return result
+    return funcall
+
+
+def compile_lambda(tree, scope):
+    params = tree.children[0].children
+    ref_type = return_type(tree.children[1])
+    body = tree.children[2]
+
+    # the frame the lambda is made in is the parent of the body's
+    code = compile_function(params, body,
+                            Scope(Scope.LAMBDA, {}, scope, scope.log))
+    return lambda frame: CalcClosure(CalcFunction(params, ref_type, body,
+                                                  code), frame)
+
+
+COMPILERS = {Operator.PROG: compile_program,
+             Operator.ADD: compile_binary,
+             Operator.SUB: compile_binary,
+             Operator.MUL: compile_binary,
+             Operator.DIV: compile_binary,
+             Operator.POW: compile_binary,
+             Operator.NEG: compile_neg,
+             Operator.LIT: compile_lit,
+             Operator.VAR: compile_var,
+             Operator.ASSIGN: compile_assign,
+             Operator.INPUT: compile_input,
+             Operator.DECL: compile_decl,
+             Operator.ARRAY_DECL: compile_array_decl,
+             Operator.ARRAY_VAR: compile_array_var,
+             Operator.REC_DEF: compile_rec_def,
+             Operator.REC_DECL: compile_rec_decl,
+             Operator.REC_ACCESS: compile_rec_access,
+             Operator.IF: compile_if,
+             Operator.WHILE: compile_while,
+             Operator.FUNDEF: compile_fundef,
+             Operator.FUNCALL: compile_funcall,
+             Operator.LAMBDA: compile_lambda}
+
+
+def compile_main(tree, log=None):
+    """
+    Resolve and compile a program, returning a closure which runs it on
+    its frame, and the frame's layout.
+    """
+    layout = declared_names(tree.children, {})
+    return compile_program(tree, Scope(Scope.PROGRAM, layout, log=log)), \
+           layout
+
+
+def run(tree):
+    """
+    Resolve, compile and run a program.
+    """
+    program, layout = compile_main(tree)
+    program(Frame(layout))
+
+
+def print_addresses(log, out=sys.stdout):
+    """
+    Print the address each variable reference was resolved to.
+    """
+    for tree, (depth, slot, ref_type) in log:
+        line, col = calc.source_lines.line_col(tree.token.offset)
+        if slot is None:
+            where = f"by name from depth {depth}"
+        elif ref_type is None:
+            where = f"depth {depth} slot {slot}, checked"
+        else:
+            where = f"depth {depth} slot {slot}"
+        out.write(f"{line}:{col}  {tree.token.lexeme:<12}{where}\n")
+
+
+def main(file, addresses=False):
+    """
+    Parse, resolve and run a program, or print its addresses.
+    """
+    lexer = Lexer(file)
+    calc.source_lines = lexer.lines
+    tree = Parser(lexer).parse()
+    if addresses:
+        log = []
+        compile_main(tree, log)
+        print_addresses(log)
+        return
+    run(tree)
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    addresses = '--addresses' in args
+    if addresses:
+        args.remove('--addresses')
+    if len(args) == 1:
+        file = open(args[0], 'r')
+    else:
+        file = sys.stdin
+    main(file, addresses)
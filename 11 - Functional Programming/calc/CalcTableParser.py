@@ -0,0 +1,404 @@
+"""
+Table driven LL(1) parser for the calc language.
+
+The TableParser runs a parse table made by CalcParseGen.py (CalcLL1 by
+default). Each decision between alternatives is one lookup of the token
+on lookahead in the row of the nonterminal being expanded, and the
+pending symbols are kept on an explicit stack, so nesting is bounded by
+memory rather than by Python's recursion limit.
+
+Trees are built by actions, one per production, run when the production
+is complete. TREE_ACTIONS builds the same ParseTrees as CalcParser.Parser.
+
+Usage: python3 CalcTableParser.py [--check] [file.calc]
+       Parses the program and prints its tree. With --check, the tree is
+       compared with the one from CalcParser.Parser.
+"""
+import sys
+import CalcLexer
+import CalcLL1
+from CalcLexer import Token, TokenDetail, TokenTable
+from CalcParser import Parser, ParseTree, Operator, same_tree
+
+
+class TableParser:
+    """
+    A predictive parser driven by a generated LL(1) table, tables, which
+    is a module holding START, PRODUCTIONS and TABLE as written by
+    CalcParseGen.
+
+    actions maps the text of each production, as written in the bnf file,
+    to a function which is called with the values of the production's
+    symbols (the TokenDetail of a token, or whatever the action of a
+    nonterminal returned) and the first token each of them began at, and
+    returns the value of the production. A production with no action
+    gives a (nonterminal, values) pair.
+    """
+    def __init__(self, lexer, tables=CalcLL1, actions=None):
+        if isinstance(lexer, TokenTable):
+            lexer = lexer.reader()
+        self.__lexer = lexer
+        if actions is None:
+            actions = TREE_ACTIONS if tables is CalcLL1 else {}
+
+        # look the symbols and actions up once, rather than per use
+        kinds = {token.name: token for token in Token}
+        rows = {name: {kinds[t]: p for t, p in row.items()}
+                for name, row in tables.TABLE.items()}
+        self.__start = rows[tables.START]
+        self.__productions = []
+        for name, symbols in tables.PRODUCTIONS:
+            text = production_text(name, symbols, rows)
+            action = actions.get(text, lambda values, starts, name=name:
+                                 (name, values))
+            self.__productions.append((tuple(rows.get(s, kinds.get(s))
+                                             for s in symbols), action))
+
+    def parse(self):
+        """
+        Parse the program and return the value of its start symbol.
+        """
+        lexer = self.__lexer
+        productions = self.__productions
+        lexer.next()
+        token = lexer.get_token()
+
+        # each frame is a production being matched: its symbols, the next
+        # one to match, the values and starting tokens of those matched so
+        # far, its action, and the token it started at
+        frames = []
+        symbol = self.__start
+        while True:
+            if type(symbol) is dict:
+                # a nonterminal: one lookup picks the production
+                production = symbol.get(token.token)
+                if production is None:
+                    self.__error(token)
+                symbols, action = productions[production]
+                frame = [symbols, 0, [], [], action, token]
+                frames.append(frame)
+            else:
+                # a token
+                if token.token != symbol:
+                    self.__error(token)
+                frame[2].append(token)
+                frame[3].append(token)
+                lexer.next()
+                token = lexer.get_token()
+
+            # finish any complete productions, then on to the next symbol
+            while frame[1] == len(frame[0]):
+                frames.pop()
+                value = frame[4](frame[2], frame[3])
+                if not frames:
+                    return value
+                start = frame[5]
+                frame = frames[-1]
+                frame[2].append(value)
+                frame[3].append(start)
+            symbol = frame[0][frame[1]]
+            frame[1] += 1
+
+    def __error(self, token):
+        line, col = self.__lexer.lines.line_col(token.offset)
+        sys.stderr.write(f"Unexpected token {token} at line {line} column {col}\n")
+        sys.exit(-1)
+
+
+def production_text(name, symbols, nonterminals):
+    """
+    Return a production written out as in the bnf file.
+    """
+    body = ' '.join(f"< {s} >" if s in nonterminals else s for s in symbols)
+    return f"< {name} > ::= " + (body or '""')
+
+
+# Lists (statements, arguments, parameters, ...) are right recursive in
+# the grammar, so their actions build them as chains of (item, rest)
+# pairs, which items() walks. The operator rules Expression' and Term'
+# give chains of (operator, token, operand, rest), which fold() hangs off
+# their left operand so the operators associate to the left.
+def items(chain):
+    """
+    Yield the items of a chain of (item, rest) pairs.
+    """
+    while chain:
+        item, chain = chain
+        yield item
+
+
+def fold(operand, chain):
+    """
+    Apply a chain of (operator, token, operand, rest) to a left operand.
+    """
+    while chain:
+        op, token, right, chain = chain
+        operand = ParseTree(op, token, [operand, right])
+    return operand
+
+
+def declaration(token, id):
+    return ParseTree(Operator.DECL, token, [ParseTree(Operator.VAR, id)])
+
+
+def record_declaration(token, tag, id):
+    return ParseTree(Operator.REC_DECL, token,
+                     [ParseTree(Operator.VAR, tag),
+                      ParseTree(Operator.VAR, id)])
+
+
+def named_array(array, id):
+    array.add_right(ParseTree(Operator.VAR, id))
+    return array
+
+
+def bound(token, upper):
+    """
+    The (lower, upper) LIT trees of an array bound; a bound with only one
+    number counts from 1.
+    """
+    if upper is None:
+        upper = token
+        token = TokenDetail(Token.INTLIT, "1", 1, upper.offset)
+    return ParseTree(Operator.LIT, token), ParseTree(Operator.LIT, upper)
+
+
+def access(index, then):
+    """
+    The value of a Ref': a function of the tree it follows and that tree's
+    ID token (None after a lambda), which applies the index, if there is
+    one, and then the Ref-Access.
+    """
+    if index is None:
+        return lambda tree, token: then(tree)
+    return lambda tree, token: then(ParseTree(Operator.ARRAY_VAR, token,
+                                              list(index)))
+
+
+# Actions building CalcParser's trees. Each is called with the values of
+# the production's symbols, v, and the token each one began at, s.
+TREE_ACTIONS = {
+    '< Program > ::= < Statements >':
+        lambda v, s: ParseTree(Operator.PROG,
+                               children=[t for t in items(v[0]) if t]),
+    '< Statements > ::= < Statement > < Statements >':
+        lambda v, s: (v[0], v[1]),
+    '< Statements > ::= ""':
+        lambda v, s: None,
+
+    '< Statement > ::= < Input > < Statement-End >':
+        lambda v, s: v[0],
+    '< Statement > ::= < Var-Decl > < Statement-End >':
+        lambda v, s: v[0],
+    '< Statement > ::= NEWLINE':
+        lambda v, s: None,
+    "< Statement > ::= < Id-Ref > < Statement' > < Statement-End >":
+        lambda v, s: v[1](v[0]),
+    '< Statement > ::= < Record-Decl > < Statement-End >':
+        lambda v, s: v[0],
+    '< Statement > ::= < Branch > < Statement-End >':
+        lambda v, s: v[0],
+    '< Statement > ::= < Loop > < Statement-End >':
+        lambda v, s: v[0],
+    '< Statement > ::= < Function-Definition > < Statement-End >':
+        lambda v, s: v[0],
+    '< Statement > ::= < Expression > < Statement-End >':
+        lambda v, s: v[0],
+    '< Statement-End > ::= NEWLINE':
+        lambda v, s: None,
+    '< Statement-End > ::= EOF':
+        lambda v, s: None,
+
+    # Statement' gives a function of the ref the statement began with
+    "< Statement' > ::= EQUAL < Expression >":
+        lambda v, s: lambda ref: ParseTree(Operator.ASSIGN, v[0],
+                                           [ref, v[1]]),
+    "< Statement' > ::= < Term' > < Expression' >":
+        lambda v, s: lambda ref: fold(fold(ref, v[0]), v[1]),
+
+    '< Function-Definition > ::= FUNCTION ID LPAREN < Parameter-List > '
+    'RPAREN RETURNS < Return-Type > < Program > END':
+        lambda v, s: ParseTree(Operator.FUNDEF, v[0],
+                               [ParseTree(Operator.VAR, v[1]),
+                                ParseTree(Operator.ARRAY_VAR, s[3],
+                                          list(items(v[3]))),
+                                ParseTree(Operator.FUNTYPE, v[6]),
+                                v[7]]),
+    '< Return-Type > ::= < Simple-Type >':
+        lambda v, s: v[0],
+    '< Return-Type > ::= FUNCTION_VAR':
+        lambda v, s: v[0],
+    "< Parameter-List > ::= < Parameter > < Parameter-List' >":
+        lambda v, s: (v[0], v[1]),
+    "< Parameter-List' > ::= COMMA < Parameter > < Parameter-List' >":
+        lambda v, s: (v[1], v[2]),
+    '< Parameter-List\' > ::= ""':
+        lambda v, s: None,
+    '< Parameter > ::= < Array-Decl >':
+        lambda v, s: v[0],
+    '< Parameter > ::= RECORD ID ID':
+        lambda v, s: record_declaration(*v),
+    '< Parameter > ::= < Simple-Type > ID':
+        lambda v, s: declaration(*v),
+    '< Parameter > ::= FUNCTION_VAR ID':
+        lambda v, s: declaration(*v),
+
+    '< Branch > ::= IF < Expression > THEN NEWLINE < Program > END':
+        lambda v, s: ParseTree(Operator.IF, v[0], [v[1], v[4]]),
+    '< Loop > ::= WHILE < Expression > DO NEWLINE < Program > END':
+        lambda v, s: ParseTree(Operator.WHILE, v[0], [v[1], v[4]]),
+    '< Input > ::= INPUT < Ref >':
+        lambda v, s: ParseTree(Operator.INPUT, s[1], [v[1]]),
+
+    '< Var-Decl > ::= < Simple-Type > ID':
+        lambda v, s: declaration(*v),
+    '< Var-Decl > ::= < Array-Decl > ID':
+        lambda v, s: named_array(*v),
+    '< Var-Decl > ::= FUNCTION_VAR ID':
+        lambda v, s: declaration(*v),
+    '< Array-Decl > ::= ARRAY OF < Array-Type > WITH BOUNDS '
+    '< Array-Bounds >':
+        lambda v, s: ParseTree(Operator.ARRAY_DECL, v[2], [v[5]]),
+    '< Array-Bounds > ::= LBRACKET < Bounds-List > RBRACKET':
+        lambda v, s: ParseTree(Operator.BOUNDS, v[0],
+                               [t for b in items(v[1]) for t in b]),
+    "< Bounds-List > ::= < Bound > < Bounds-List' >":
+        lambda v, s: (v[0], v[1]),
+    "< Bounds-List' > ::= COMMA < Bound > < Bounds-List' >":
+        lambda v, s: (v[1], v[2]),
+    '< Bounds-List\' > ::= ""':
+        lambda v, s: None,
+    "< Bound > ::= INTLIT < Bound' >":
+        lambda v, s: bound(*v),
+    "< Bound' > ::= BSEP INTLIT":
+        lambda v, s: v[1],
+    '< Bound\' > ::= ""':
+        lambda v, s: None,
+    '< Simple-Type > ::= INTEGER':
+        lambda v, s: v[0],
+    '< Simple-Type > ::= REAL':
+        lambda v, s: v[0],
+    '< Array-Type > ::= < Simple-Type >':
+        lambda v, s: v[0],
+    '< Array-Type > ::= RECORD ID':
+        lambda v, s: v[1],
+
+    # Record-Decl' gives a function of the RECORD token and the tag
+    "< Record-Decl > ::= RECORD ID < Record-Decl' >":
+        lambda v, s: v[2](v[0], v[1]),
+    "< Record-Decl' > ::= ID":
+        lambda v, s: lambda token, tag: record_declaration(token, tag, v[0]),
+    "< Record-Decl' > ::= NEWLINE < Field-List > END":
+        lambda v, s: lambda token, tag: ParseTree(
+            Operator.REC_DEF, token,
+            [ParseTree(Operator.VAR, tag),
+             ParseTree(Operator.DECL, s[1], list(items(v[1])))]),
+    '< Field-List > ::= < Field-Decl > NEWLINE < Field-List >':
+        lambda v, s: (v[0], v[2]),
+    '< Field-List > ::= ""':
+        lambda v, s: None,
+    '< Field-Decl > ::= < Var-Decl >':
+        lambda v, s: v[0],
+    '< Field-Decl > ::= RECORD ID ID':
+        lambda v, s: record_declaration(*v),
+
+    "< Expression > ::= < Term > < Expression' >":
+        lambda v, s: fold(*v),
+    "< Expression' > ::= PLUS < Term > < Expression' >":
+        lambda v, s: (Operator.ADD,) + tuple(v),
+    "< Expression' > ::= MINUS < Term > < Expression' >":
+        lambda v, s: (Operator.SUB,) + tuple(v),
+    '< Expression\' > ::= ""':
+        lambda v, s: None,
+    "< Term > ::= < Factor > < Term' >":
+        lambda v, s: fold(*v),
+    "< Term' > ::= TIMES < Factor > < Term' >":
+        lambda v, s: (Operator.MUL,) + tuple(v),
+    "< Term' > ::= DIVIDE < Factor > < Term' >":
+        lambda v, s: (Operator.DIV,) + tuple(v),
+    '< Term\' > ::= ""':
+        lambda v, s: None,
+    "< Factor > ::= < Exp > < Factor' >":
+        lambda v, s: ParseTree(Operator.POW, v[1][0], [v[0], v[1][1]])
+                     if v[1] else v[0],
+    "< Factor' > ::= POW < Factor >":
+        lambda v, s: v,
+    '< Factor\' > ::= ""':
+        lambda v, s: None,
+    '< Exp > ::= LPAREN < Expression > RPAREN':
+        lambda v, s: v[1],
+    '< Exp > ::= MINUS < Exp >':
+        lambda v, s: ParseTree(Operator.NEG, v[0], [v[1]]),
+    '< Exp > ::= < Number >':
+        lambda v, s: v[0],
+    '< Exp > ::= < Ref >':
+        lambda v, s: v[0],
+    '< Number > ::= INTLIT':
+        lambda v, s: ParseTree(Operator.LIT, v[0]),
+    '< Number > ::= FLOATLIT':
+        lambda v, s: ParseTree(Operator.LIT, v[0]),
+
+    # Ref' and Ref-Access give functions of the tree they apply to
+    '< Ref > ::= < Id-Ref >':
+        lambda v, s: v[0],
+    "< Ref > ::= < Lambda-Expression > < Ref' >":
+        lambda v, s: v[1](v[0], None),
+    "< Id-Ref > ::= ID < Ref' >":
+        lambda v, s: v[1](ParseTree(Operator.VAR, v[0]), v[0]),
+    "< Ref' > ::= LBRACKET < Arg-List > RBRACKET < Ref-Access >":
+        lambda v, s: access(items(v[1]), v[3]),
+    "< Ref' > ::= < Ref-Access >":
+        lambda v, s: access(None, v[0]),
+    '< Ref-Access > ::= DOT < Ref >':
+        lambda v, s: lambda tree: ParseTree(Operator.REC_ACCESS, v[0],
+                                            [tree, v[1]]),
+    '< Ref-Access > ::= LPAREN < Arg-List > RPAREN':
+        lambda v, s: lambda tree: ParseTree(
+            Operator.FUNCALL, v[0],
+            [tree, ParseTree(Operator.ARRAY_VAR, v[0], list(items(v[1])))]),
+    '< Ref-Access > ::= ""':
+        lambda v, s: lambda tree: tree,
+    "< Arg-List > ::= < Expression > < Arg-List' >":
+        lambda v, s: (v[0], v[1]),
+    "< Arg-List' > ::= COMMA < Expression > < Arg-List' >":
+        lambda v, s: (v[1], v[2]),
+    '< Arg-List\' > ::= ""':
+        lambda v, s: None,
+
+    '< Lambda-Expression > ::= LAMBDA LPAREN < Parameter-List > RPAREN '
+    'RETURNS < Return-Type > < Expression >':
+        lambda v, s: ParseTree(Operator.LAMBDA, v[0],
+                               [ParseTree(Operator.ARRAY_VAR, s[2],
+                                          list(items(v[2]))),
+                                ParseTree(Operator.FUNTYPE, v[5]),
+                                v[6]]),
+}
+
+
+def main(file, check=False):
+    """
+    A unit test for the table driven parser. With check, the tree is
+    compared with the recursive descent parser's.
+    """
+    table = CalcLexer.Lexer(file).tokenize_all()
+    tree = TableParser(table).parse()
+    if check:
+        if same_tree(tree, Parser(table).parse()):
+            print("parsers agree")
+        else:
+            print("parsers disagree")
+            sys.exit(-1)
+        return
+    tree.print()
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    check = '--check' in args
+    if check:
+        args.remove('--check')
+    if len(args) == 1:
+        file = open(args[0], 'r')
+    else:
+        file = sys.stdin
+    main(file, check)
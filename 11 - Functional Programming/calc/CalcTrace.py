@@ -0,0 +1,349 @@
+"""
+Trace compiler for hot while loops.
+
+With tracing on, eval_while counts the iterations of each loop. Once a
+loop has run HOT_LOOP of them, the rest of it is handed to a LoopTracer,
+which compiles the loop (condition and body) into a Python function
+specialized for the variables it uses, as they are at that moment:
+
+  - each variable's RefEntry is looked up once, when the loop is entered,
+    rather than on every use;
+  - int and real variables whose values are of their declared type are
+    known to stay so, so assignments of values known to be of the right
+    type skip the coercion, and
+  - arrays of the observed bounds are indexed directly.
+
+The function is guarded: each time the loop is entered, every variable it
+was specialized for must still be declared with the same RefType, value
+type and bounds. If a guard fails the loop is finished by the tree walker.
+Anything the trace does not specialize (records, calls, lambdas, input,
+variables which were not declared when it was compiled) is evaluated by
+the tree walker from inside the trace, so the trace only ever changes how
+fast the loop runs. Loops whose bodies declare anything are never
+compiled, as their variables could change from one iteration to the next.
+
+The tracer does not import calc: it is given the interpreter module to
+work with, which is calc's __main__ when calc.py is run as a script, so
+that the trace makes and checks the same RefEntries and CalcArrays.
+"""
+import ast
+from CalcParser import Operator
+from CalcPyAst import load, store, attribute, invoke, const, nonzero, \
+                     BINARY_OPERATORS, locate, element
+
+# the iterations a loop is walked before it is compiled
+HOT_LOOP = 50
+
+
+class LoopTracer:
+    """
+    Counts loop iterations and compiles, guards and runs the traces of
+    hot loops. Loops are known by the source offset of their while token.
+    The statistics are kept as attributes:
+        loops_compiled - loops compiled to traces
+        loops_rejected - hot loops which could not be compiled
+        trace_runs - times a trace was entered
+        guard_failures - times a trace's guards failed, so the loop was
+                         walked instead
+        iterations_walked - loop iterations counted by the tree walker
+    """
+    def __init__(self, interpreter, threshold=HOT_LOOP):
+        self.interpreter = interpreter
+        self.threshold = threshold
+        self.__counts = {}
+        self.__traces = {}
+        self.loops_compiled = 0
+        self.loops_rejected = 0
+        self.trace_runs = 0
+        self.guard_failures = 0
+        self.iterations_walked = 0
+
+    def iteration(self, tree):
+        """
+        Count an iteration of a WHILE tree by the tree walker. Returns
+        true once the loop is hot and the tracer should be asked to run it.
+        """
+        self.iterations_walked += 1
+        key = tree.token.offset
+        count = self.__counts.get(key, 0) + 1
+        self.__counts[key] = count
+        return count >= self.threshold and \
+               self.__traces.get(key, True) is not None
+
+    def run(self, tree, env):
+        """
+        Run the rest of a hot loop, whose condition has just been found
+        true, with its trace. Returns false if the trace's guards failed
+        or the loop cannot be compiled, leaving the loop to the walker.
+        """
+        key = tree.token.offset
+        trace = self.__traces.get(key)
+        if trace is None:
+            trace = Trace.compile(tree, env, self.interpreter)
+            self.__traces[key] = trace
+            if trace is None:
+                self.loops_rejected += 1
+                return False
+            self.loops_compiled += 1
+
+        entries = trace.guard(env)
+        if entries is None:
+            self.guard_failures += 1
+            return False
+        self.trace_runs += 1
+        trace.function(env, *entries)
+        return True
+
+    def report(self, out):
+        """
+        Write the statistics to out.
+        """
+        out.write(f"loops compiled: {self.loops_compiled}\n"
+                  f"loops rejected: {self.loops_rejected}\n"
+                  f"trace runs: {self.trace_runs}\n"
+                  f"guard failures: {self.guard_failures}\n"
+                  f"iterations walked: {self.iterations_walked}\n")
+
+
+################ Building the Python ast ################
+# Statements which declare names
+DECLARATIONS = {Operator.DECL, Operator.ARRAY_DECL, Operator.REC_DEF,
+                Operator.REC_DECL, Operator.FUNDEF}
+
+
+def lows(array):
+    """
+    Return the lower bound of each dimension of a CalcArray.
+    """
+    return [low for low, high in array.bounds]
+
+
+class Trace:
+    """
+    A loop compiled for the variables it uses as they were when it was
+    compiled. guards lists (sym, ref_type, shape) for each of them, in the
+    order the function takes their RefEntries after env.
+    """
+    def __init__(self, tree, env, interpreter):
+        self.guards = []
+        self.__interpreter = interpreter
+        self.__env = env
+        self.__locals = {}
+        self.__nodes = []
+
+        # the loop's condition has just been found true, so the body comes
+        # first
+        body = self.__block(tree.children[1])
+        test = ast.UnaryOp(ast.Not(), nonzero(self.__expr(tree.children[0])))
+        loop = ast.While(const(True), body + [ast.If(test, [ast.Break()], [])],
+                         [])
+        locate(loop, tree, self.__interpreter.source_lines)
+        args = [ast.arg('env')] + [ast.arg(name) for name, _ in
+                                   self.__locals.values()]
+        function = ast.FunctionDef(
+            'trace', ast.arguments(posonlyargs=[], args=args, kwonlyargs=[],
+                                   kw_defaults=[], defaults=[]),
+            [loop], [])
+        locate(function, tree, self.__interpreter.source_lines)
+        module = ast.fix_missing_locations(ast.Module([function], []))
+        namespace = {'N': self.__nodes, 'eval_tree': interpreter.eval_tree}
+        exec(compile(module, '<calc>', 'exec'), namespace)
+        self.function = namespace['trace']
+        self.__env = None
+
+    @staticmethod
+    def compile(tree, env, interpreter):
+        """
+        Compile a WHILE tree for env, returning its Trace, or None if the
+        loop declares anything.
+        """
+        if Trace.__declares(tree.children[1]):
+            return None
+        return Trace(tree, env, interpreter)
+
+    @staticmethod
+    def __declares(body):
+        """
+        Return true if a block, or one nested in it, declares a name.
+        """
+        for statement in body.children:
+            if statement.op in DECLARATIONS:
+                return True
+            if statement.op in (Operator.IF, Operator.WHILE) and \
+               Trace.__declares(statement.children[1]):
+                return True
+        return False
+
+    def guard(self, env):
+        """
+        Return the RefEntries of the trace's variables in env, or None if
+        one of them is not what the trace was compiled for.
+        """
+        entries = []
+        for sym, ref_type, kind in self.guards:
+            entry = env.get(sym)
+            if entry is None or entry.ref_type != ref_type or \
+               self.__shape(entry.value) != kind:
+                return None
+            entries.append(entry)
+        return entries
+
+    def __shape(self, value):
+        """
+        What a guard checks about a variable's value: its type, and for an
+        array its bounds.
+        """
+        if type(value) == self.__interpreter.CalcArray:
+            return tuple(value.bounds)
+        return type(value)
+
+    def __node(self, tree):
+        self.__nodes.append(tree)
+        return ast.Subscript(load('N'), const(len(self.__nodes) - 1),
+                             ast.Load())
+
+    def __walked(self, tree):
+        """
+        An expression which evaluates a tree with the tree walker.
+        """
+        return invoke(load('eval_tree'), self.__node(tree), load('env'))
+
+    def __variable(self, tree):
+        """
+        Return (python name, RefEntry) of a variable the trace specializes
+        for, or None if it is left to the walker.
+        """
+        sym = tree.token.value
+        if sym in self.__locals:
+            return self.__locals[sym]
+        RefType = self.__interpreter.RefType
+        entry = self.__env.get(sym)
+        if entry is None or entry.ref_type not in (RefType.INT_VAR,
+                                                   RefType.REAL_VAR,
+                                                   RefType.ARRAY_VAR):
+            return None
+        self.guards.append((sym, entry.ref_type, self.__shape(entry.value)))
+        local = (f"{tree.token.lexeme}_{sym}", entry)
+        self.__locals[sym] = local
+        return local
+
+    def __kind(self, entry):
+        """
+        The type a variable's value is known to keep: that of its value,
+        if it is the variable's declared type.
+        """
+        RefType = self.__interpreter.RefType
+        if entry.ref_type == RefType.INT_VAR and type(entry.value) == int:
+            return int
+        elif entry.ref_type == RefType.REAL_VAR and \
+             type(entry.value) == float:
+            return float
+        return None
+
+    def __block(self, tree):
+        body = []
+        for statement in tree.children:
+            for node in self.__statement(statement):
+                body.append(locate(node, statement,
+                                   self.__interpreter.source_lines))
+        return body or [ast.Pass()]
+
+    def __statement(self, tree):
+        if tree.op == Operator.ASSIGN:
+            return self.__assign(tree)
+        elif tree.op == Operator.IF:
+            return [ast.If(nonzero(self.__expr(tree.children[0])),
+                           self.__block(tree.children[1]), [])]
+        elif tree.op == Operator.WHILE:
+            return [ast.While(nonzero(self.__expr(tree.children[0])),
+                              self.__block(tree.children[1]), [])]
+
+        # print the value, unless there is none
+        value = self.__expr(tree)
+        return [ast.Assign([store('_v')], value),
+                ast.If(ast.Compare(load('_v'), [ast.IsNot()], [const(None)]),
+                       [ast.Expr(invoke(load('print'), load('_v')))], [])]
+
+    def __assign(self, tree):
+        RefType = self.__interpreter.RefType
+        target = tree.children[0]
+        local = self.__variable(target) \
+                if target.op in (Operator.VAR, Operator.ARRAY_VAR) else None
+        if local is None:
+            return [ast.Expr(self.__walked(tree))]
+        name, entry = local
+
+        # an array is only assigned to element by element
+        array_target = target.op == Operator.ARRAY_VAR
+        if array_target != (entry.ref_type == RefType.ARRAY_VAR):
+            return [ast.Expr(self.__walked(tree))]
+
+        # coerce the value, unless it is known to be of the right type
+        value, kind = self.__typed(tree.children[1])
+        if entry.ref_type == RefType.INT_VAR and kind != int:
+            value = invoke(load('int'), value)
+        elif entry.ref_type == RefType.REAL_VAR and kind != float:
+            value = invoke(load('float'), value)
+
+        if not array_target:
+            return [ast.Assign([attribute(load(name), 'value', ast.Store())],
+                               value)]
+
+        # the value comes before the index
+        index = [self.__expr(t) for t in target.children]
+        array = attribute(load(name), 'value')
+        if len(index) == len(entry.value.bounds):
+            return [ast.Assign([store('_v')], value),
+                    ast.Assign([element(array, index, lows(entry.value),
+                                        ast.Store())], load('_v'))]
+        return [ast.Assign([store('_v')], value),
+                ast.Expr(invoke(attribute(array, 'set'),
+                                ast.List(index, ast.Load()), load('_v')))]
+
+    def __expr(self, tree):
+        return self.__typed(tree)[0]
+
+    def __typed(self, tree):
+        """
+        Translate an expression, returning (the Python expression, the
+        type its value is known to have, or None).
+        """
+        expr, kind = self.__typed2(tree)
+        return locate(expr, tree, self.__interpreter.source_lines), kind
+
+    def __typed2(self, tree):
+        RefType = self.__interpreter.RefType
+        if tree.op == Operator.LIT:
+            return const(tree.token.value), type(tree.token.value)
+        elif tree.op in (Operator.VAR, Operator.ARRAY_VAR):
+            local = self.__variable(tree)
+            if local is None:
+                return self.__walked(tree), None
+            name, entry = local
+            if entry.ref_type != RefType.ARRAY_VAR:
+                if tree.op == Operator.ARRAY_VAR:
+                    return self.__walked(tree), None
+                return attribute(load(name), 'value'), self.__kind(entry)
+            if tree.op == Operator.VAR:
+                return attribute(load(name), 'value'), None
+            array = attribute(load(name), 'value')
+            index = [self.__expr(t) for t in tree.children]
+            if len(index) == len(entry.value.bounds):
+                return element(array, index, lows(entry.value)), None
+            return invoke(attribute(array, 'get'),
+                          ast.List(index, ast.Load())), None
+        elif tree.op in BINARY_OPERATORS:
+            left, left_kind = self.__typed(tree.children[0])
+            right, right_kind = self.__typed(tree.children[1])
+            expr = ast.BinOp(left, BINARY_OPERATORS[tree.op](), right)
+            if left_kind is None or right_kind is None or \
+               tree.op == Operator.POW:
+                # a power can be of any type
+                return expr, None
+            elif tree.op == Operator.DIV or float in (left_kind, right_kind):
+                return expr, float
+            return expr, int
+        elif tree.op == Operator.NEG:
+            operand, kind = self.__typed(tree.children[0])
+            return ast.UnaryOp(ast.USub(), operand), kind
+        return self.__walked(tree), None
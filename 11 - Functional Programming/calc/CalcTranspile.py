@@ -0,0 +1,559 @@
+"""
+Transpiler from calc to Python.
+
+A program's parse tree is translated into a Python ast.Module, which is
+compiled and run by CPython itself. The top level program becomes a
+Python function taking the global environment, and every function body
+and lambda becomes another, taking the local environment of the call.
+
+The translation keeps the tree walker's runtime objects, semantics and
+error messages: environments are ReferenceEnvironments of RefEntries,
+calls bind their parameters one by one before evaluating each argument,
+assignments coerce to the variable's type and calls cast to the return
+type. What it saves is the lookups. Once a declaration in the running
+function (or the top level program) has certainly been run, the
+variable's RefEntry is kept in a Python local, so later uses of it are
+plain attribute accesses, and assignments to it coerce to the type it was
+declared with. Any other name (one declared in an enclosing environment,
+which calc finds dynamically, or one used inside a record) is looked up
+in the environment as the tree walker does.
+
+Every Python statement and expression carries the line and column of the
+calc code it came from, and the module is compiled under the calc file's
+name, so a Python exception's traceback points into the calc program.
+
+Usage: python3 CalcTranspile.py [--source] [file.calc]
+       With --source, the Python translation is printed rather than run.
+"""
+import ast
+import sys
+import calc
+from calc import CalcClosure, CalcFunction, RefEntry, RefType, \
+                 ReferenceEnvironment, declare_name, runtime_error
+from CalcCompiler import return_type
+from CalcLexer import Lexer, Token
+from CalcParser import Parser, Operator
+from CalcPyAst import load, store, attribute, invoke, const, nonzero, \
+                     BINARY_OPERATORS, locate, element
+
+
+################ Runtime support for the translation ################
+def lookup(env, sym, tree):
+    """
+    Return the value of a variable, as eval_var does.
+    """
+    val = env.get(sym)
+    if val is None:
+        runtime_error(tree, f"Undefined Variable '{tree.token.lexeme}'")
+    return val.value
+
+
+def target(env, sym, tree, name):
+    """
+    Return the RefEntry of the variable an assignment is to.
+    """
+    var = env.get(sym)
+    if var is None:
+        runtime_error(tree, f"Assignment to undeclared variable {name}")
+    return var
+
+
+def coerce(var, value, env, tree):
+    """
+    Coerce a value assigned to var, as eval_assign does.
+    """
+    if var.ref_type == RefType.INT_VAR:
+        return int(value)
+    elif var.ref_type == RefType.REAL_VAR:
+        return float(value)
+    elif var.ref_type == RefType.FUNCTION_VAR:
+        return function_value(value, env, tree)
+    return value
+
+
+def function_value(value, env, tree):
+    """
+    Coerce a value assigned to a function variable.
+    """
+    if type(value) == CalcClosure:
+        return value
+    elif type(value) == CalcFunction:
+        return CalcClosure(value, env)
+    runtime_error(tree, f"Invalid assignment of non-function to function variable")
+
+
+def declare(env, sym, name, value, tree):
+    """
+    Declare a name in env, returning its RefEntry.
+    """
+    declare_name(tree, sym, name, value, env)
+    return value
+
+
+def define(env, tree, code):
+    """
+    Declare the function defined by a FUNDEF tree, whose body has been
+    translated to code, returning its RefEntry.
+    """
+    name = tree.children[0].token
+    f = CalcFunction(tree.children[1].children,
+                     return_type(tree.children[2]), tree.children[3], code)
+    return declare(env, name.value, name.lexeme,
+                   RefEntry(f, RefType.FUNCTION), tree)
+
+
+def closure(env, tree, code):
+    """
+    Return the closure made by a LAMBDA tree, whose body has been
+    translated to code.
+    """
+    f = CalcFunction(tree.children[0].children,
+                     return_type(tree.children[1]), tree.children[2], code)
+    return CalcClosure(f, env)
+
+
+def walk(env, tree):
+    """
+    Run a statement with the tree walker.
+    """
+    calc.eval_tree(tree, env)
+
+
+class Call:
+    """
+    A function call in progress: the function is found and the local
+    environment made, then each parameter is declared and its argument
+    bound, then the body is run.
+    """
+    __slots__ = ('fun', 'local', 'env', 'tree')
+
+    def __init__(self, fun, count, env, tree):
+        if type(fun) == CalcClosure:
+            fun_env = fun.env
+            fun = fun.function
+        else:
+            if type(fun) != CalcFunction:
+                name = tree.children[0].token.lexeme
+                runtime_error(tree, f"{name} is not a function.")
+            fun_env = env
+        if count != len(fun.parameters):
+            name = tree.children[0].token.lexeme
+            runtime_error(tree, f"Incorrect number of arguments to {name}")
+        self.fun = fun
+        self.local = ReferenceEnvironment(fun_env)
+        self.env = env
+        self.tree = tree
+
+    def param(self, i):
+        """
+        Declare parameter i. Returns true if its argument is to be
+        evaluated and bound, and false if it was bound by reference.
+        """
+        p = self.fun.parameters[i]
+        if p.op == Operator.DECL:
+            # this is by copy of evaluation (pass by value)
+            calc.eval_decl(p, self.local)
+            return True
+
+        # pass by reference
+        name = p.children[1].token.lexeme
+        value = self.env.get(self.tree.children[1].children[i])
+        if value is None:
+            runtime_error(self.tree, f"Error binding {name}")
+        declare_name(self.tree, p.children[1].token.value, name, value,
+                     self.local)
+        return False
+
+    def bind(self, i, value):
+        p = self.fun.parameters[i]
+        self.local.get(p.children[0].token.value).value = value
+
+    def run(self):
+        result = self.fun.code(self.local)
+        if self.fun.return_type == RefType.INT_VAR:
+            result = int(result)
+        elif self.fun.return_type == RefType.REAL_VAR:
+            result = float(result)
+        return result
+
+
+################ Building the Python ast ################
+# Statements which only declare things, or read input, and are left to
+# the tree walker
+WALKED = {Operator.INPUT, Operator.REC_DEF, Operator.REC_DECL,
+          Operator.ARRAY_DECL}
+
+# Statements which have a value, and so print it
+VALUED = {Operator.ADD, Operator.SUB, Operator.MUL, Operator.DIV,
+          Operator.POW, Operator.NEG, Operator.LIT, Operator.VAR,
+          Operator.ARRAY_VAR, Operator.REC_ACCESS, Operator.FUNCALL,
+          Operator.LAMBDA}
+
+# The types and initial values of simple declarations
+DECLARED = {Token.INTEGER: (RefType.INT_VAR, 0),
+            Token.REAL: (RefType.REAL_VAR, 0.0),
+            Token.FUNCTION_VAR: (RefType.FUNCTION_VAR, None)}
+
+
+class Local:
+    """
+    A variable whose RefEntry is held in a Python local: its name there,
+    its RefType, and for an array its bounds.
+    """
+    __slots__ = ('name', 'ref_type', 'bounds')
+
+    def __init__(self, name, ref_type, bounds=None):
+        self.name = name
+        self.ref_type = ref_type
+        self.bounds = bounds
+
+
+class Translator:
+    """
+    Translates a calc program into a Python ast.Module. nodes is the list
+    of trees the translation refers to, by index, as N.
+    """
+    def __init__(self):
+        self.nodes = []
+        self.__functions = []
+        self.__count = 0
+        self.__temps = 0
+
+    def module(self, tree):
+        """
+        Translate the program, returning the module. It defines program(env)
+        to run it.
+        """
+        body = self.__block(tree.children, {}, False)
+        functions = [self.__function('program', [], body)]
+        functions.extend(self.__functions)
+        return ast.fix_missing_locations(ast.Module(functions, []))
+
+    def __function(self, name, params, body):
+        args = ast.arguments(posonlyargs=[], args=[ast.arg('env')],
+                             kwonlyargs=[], kw_defaults=[], defaults=[])
+        return ast.FunctionDef(name, args, params + (body or [ast.Pass()]),
+                               [])
+
+    def __node(self, tree):
+        """
+        Return an expression for a tree, through the node table.
+        """
+        self.nodes.append(tree)
+        return ast.Subscript(load('N'), const(len(self.nodes) - 1),
+                             ast.Load())
+
+    def __temp(self):
+        self.__temps += 1
+        return f"_t{self.__temps}"
+
+    def __callable(self, tree, params, body, expression):
+        """
+        Translate the body of a function or lambda into a Python function,
+        returning its name.
+        """
+        self.__count += 1
+        name = f"_f{self.__count}"
+        scope = {}
+        bind = []
+        for p in params:
+            if p.op != Operator.DECL:
+                continue
+            id = p.children[0].token
+            local = self.__local(id, DECLARED[p.token.token][0])
+            scope[id.value] = local
+            bind.append(ast.Assign([store(local.name)],
+                                   invoke(attribute(load('env'), 'get'),
+                                          const(id.value))))
+        if expression:
+            code = [ast.Return(self.__expr(body, scope, load('env')))]
+        else:
+            # the result is the last value printed, and functions are
+            # returned as closures
+            code = [ast.Assign([store('_result')], const(None))]
+            code += self.__block(body.children, scope, True)
+            code.append(ast.If(
+                ast.Compare(invoke(load('type'), load('_result')), [ast.Eq()],
+                            [load('CalcFunction')]),
+                [ast.Assign([store('_result')],
+                            invoke(load('CalcClosure'), load('_result'),
+                                   load('env')))], []))
+            code.append(ast.Return(load('_result')))
+        function = self.__function(name, bind, code)
+        self.__functions.append(locate(function, tree,
+                                       calc.source_lines))
+        return name
+
+    def __local(self, id, ref_type, bounds=None):
+        return Local(f"{id.lexeme}_{id.value}", ref_type, bounds)
+
+    def __block(self, statements, scope, result):
+        """
+        Translate a list of statements. scope maps the symbols whose
+        RefEntries are in Python locals to their Locals; it is copied, so
+        declarations in the block do not outlive it. With result, printed
+        values are kept in _result.
+        """
+        scope = dict(scope)
+        body = []
+        for tree in statements:
+            for node in self.__statement(tree, scope, result):
+                body.append(locate(node, tree, calc.source_lines))
+        return body
+
+    def __statement(self, tree, scope, result):
+        """
+        Return the Python statements for a calc statement, adding what it
+        declares to scope.
+        """
+        env = load('env')
+        if tree.op == Operator.DECL:
+            id = tree.children[0].token
+            ref_type, init = DECLARED[tree.token.token]
+            local = self.__local(id, ref_type)
+            entry = invoke(load('RefEntry'), const(init),
+                           attribute(load('RefType'), ref_type.name))
+            value = invoke(load('declare'), env, const(id.value),
+                           const(id.lexeme), entry, self.__node(tree))
+            scope[id.value] = local
+            return [ast.Assign([store(local.name)], value)]
+        elif tree.op in WALKED:
+            walked = ast.Expr(invoke(load('walk'), env, self.__node(tree)))
+            if tree.op == Operator.ARRAY_DECL:
+                id = tree.children[1].token
+                bounds = tree.children[0].children
+                local = self.__local(id, RefType.ARRAY_VAR,
+                                     [bounds[i].token.value
+                                      for i in range(0, len(bounds), 2)])
+            elif tree.op == Operator.REC_DECL:
+                id = tree.children[1].token
+                local = self.__local(id, RefType.RECORD_VAR)
+            else:
+                return [walked]
+            # the entry the walker declared is now the local one
+            scope[id.value] = local
+            return [walked, ast.Assign([store(local.name)],
+                                       invoke(attribute(env, 'get'),
+                                              const(id.value)))]
+        elif tree.op == Operator.ASSIGN:
+            return self.__assign(tree, scope)
+        elif tree.op == Operator.IF:
+            return [ast.If(nonzero(self.__expr(tree.children[0], scope, env)),
+                           self.__block(tree.children[1].children, scope,
+                                        False) or [ast.Pass()], [])]
+        elif tree.op == Operator.WHILE:
+            return [ast.While(nonzero(self.__expr(tree.children[0], scope,
+                                                  env)),
+                              self.__block(tree.children[1].children, scope,
+                                           False) or [ast.Pass()], [])]
+        elif tree.op == Operator.FUNDEF:
+            id = tree.children[0].token
+            code = self.__callable(tree, tree.children[1].children,
+                                   tree.children[3], False)
+            local = self.__local(id, RefType.FUNCTION)
+            scope[id.value] = local
+            return [ast.Assign([store(local.name)],
+                               invoke(load('define'), env, self.__node(tree),
+                                      load(code)))]
+        elif tree.op in VALUED:
+            # print the value, unless there is none
+            kept = [ast.Assign([store('_result')], load('_v'))] \
+                   if result else []
+            return [ast.Assign([store('_v')], self.__expr(tree, scope, env)),
+                    ast.If(ast.Compare(load('_v'), [ast.IsNot()],
+                                       [const(None)]),
+                           kept + [ast.Expr(invoke(load('print'),
+                                                   load('_v')))], [])]
+        return []
+
+    def __assign(self, tree, scope):
+        env = load('env')
+        target_tree = tree.children[0]
+        local = None
+        if target_tree.op == Operator.REC_ACCESS:
+            # the variable is in the final record
+            var_env = self.__expr(target_tree.children[0], scope, env)
+            target_tree = target_tree.children[1]
+            while target_tree.op == Operator.REC_ACCESS:
+                temp = self.__temp()
+                var_env = ast.Tuple([ast.NamedExpr(store(temp), var_env),
+                                     self.__expr(target_tree.children[0],
+                                                 None, load(temp))],
+                                    ast.Load())
+                var_env = ast.Subscript(var_env, const(1), ast.Load())
+                target_tree = target_tree.children[1]
+            var_scope = None
+        else:
+            var_env = env
+            var_scope = scope
+            local = scope.get(target_tree.token.value)
+        value = self.__expr(tree.children[1], scope, env)
+        sym = target_tree.token.value
+
+        if local is not None:
+            # the variable and its type are known
+            var = load(local.name)
+            code = []
+            if local.ref_type == RefType.INT_VAR:
+                value = invoke(load('int'), value)
+            elif local.ref_type == RefType.REAL_VAR:
+                value = invoke(load('float'), value)
+            elif local.ref_type == RefType.FUNCTION_VAR:
+                value = invoke(load('function_value'), value, env,
+                               self.__node(tree))
+        else:
+            # find the variable first, then coerce to its type
+            code = []
+            if var_env is not env:
+                code.append(ast.Assign([store('_var_env')], var_env))
+                var_env = load('_var_env')
+            var = load('_var')
+            code.append(ast.Assign([store('_var')],
+                                   invoke(load('target'), var_env,
+                                          const(sym), self.__node(tree),
+                                          const(target_tree.token.lexeme))))
+            value = invoke(load('coerce'), var, value, env, self.__node(tree))
+
+        if target_tree.op == Operator.VAR:
+            code.append(ast.Assign([attribute(var, 'value', ast.Store())],
+                                   value))
+        elif target_tree.op == Operator.ARRAY_VAR:
+            # the value comes before the index
+            code.append(ast.Assign([store('_v')], value))
+            code.append(self.__set_item(var, target_tree, load('_v'),
+                                        var_scope, var_env, local))
+        else:
+            code.append(ast.Expr(value))
+        return code
+
+    def __set_item(self, var, tree, value, scope, env, local):
+        array = attribute(var, 'value')
+        index = [self.__expr(t, scope, env) for t in tree.children]
+        if local is not None and len(index) == len(local.bounds):
+            target = element(array, index, local.bounds, ast.Store())
+            return ast.Assign([target], value)
+        return ast.Expr(invoke(attribute(array, 'set'),
+                               ast.List(index, ast.Load()), value))
+
+    def __expr(self, tree, scope, env):
+        """
+        Translate an expression evaluated in env, a Python expression for
+        a ReferenceEnvironment. scope is None if the names in it are to be
+        looked up rather than taken from Python locals.
+        """
+        return locate(self.__expr2(tree, scope, env), tree,
+                      calc.source_lines)
+
+    def __expr2(self, tree, scope, env):
+        local = scope.get(tree.token.value) \
+                if scope is not None and tree.token is not None and \
+                   tree.op in (Operator.VAR, Operator.ARRAY_VAR) else None
+        if tree.op == Operator.LIT:
+            return const(tree.token.value)
+        elif tree.op == Operator.VAR:
+            if local is not None:
+                return attribute(load(local.name), 'value')
+            return invoke(load('lookup'), env, const(tree.token.value),
+                          self.__node(tree))
+        elif tree.op in BINARY_OPERATORS:
+            return ast.BinOp(self.__expr(tree.children[0], scope, env),
+                             BINARY_OPERATORS[tree.op](),
+                             self.__expr(tree.children[1], scope, env))
+        elif tree.op == Operator.NEG:
+            return ast.UnaryOp(ast.USub(),
+                               self.__expr(tree.children[0], scope, env))
+        elif tree.op == Operator.ARRAY_VAR:
+            index = [self.__expr(t, scope, env) for t in tree.children]
+            if local is not None:
+                array = attribute(load(local.name), 'value')
+                if len(index) == len(local.bounds):
+                    return element(array, index, local.bounds)
+            else:
+                array = invoke(load('lookup'), env, const(tree.token.value),
+                               self.__node(tree))
+            return invoke(attribute(array, 'get'), ast.List(index, ast.Load()))
+        elif tree.op == Operator.REC_ACCESS:
+            # the field is evaluated in the record's environment
+            temp = self.__temp()
+            record = ast.NamedExpr(store(temp),
+                                   self.__expr(tree.children[0], scope, env))
+            field = self.__expr(tree.children[1], None, load(temp))
+            return ast.Subscript(ast.Tuple([record, field], ast.Load()),
+                                 const(1), ast.Load())
+        elif tree.op == Operator.FUNCALL:
+            return self.__call(tree, scope, env)
+        elif tree.op == Operator.LAMBDA:
+            code = self.__callable(tree, tree.children[0].children,
+                                   tree.children[2], True)
+            return invoke(load('closure'), env, self.__node(tree), load(code))
+        return invoke(load('walk'), env, self.__node(tree))
+
+    def __call(self, tree, scope, env):
+        # each parameter is declared before its argument is evaluated, and
+        # one bound by reference has no argument evaluated
+        temp = self.__temp()
+        args = tree.children[1].children
+        steps = [ast.NamedExpr(store(temp),
+                               invoke(load('Call'),
+                                      self.__expr(tree.children[0], scope,
+                                                  env),
+                                      const(len(args)), env,
+                                      self.__node(tree)))]
+        for i, arg in enumerate(args):
+            param = invoke(attribute(load(temp), 'param'), const(i))
+            bind = invoke(attribute(load(temp), 'bind'), const(i),
+                          self.__expr(arg, scope, env))
+            steps.append(ast.BoolOp(ast.And(), [param, bind]))
+        steps.append(invoke(attribute(load(temp), 'run')))
+        return ast.Subscript(ast.Tuple(steps, ast.Load()), const(-1),
+                             ast.Load())
+
+
+def translate(tree, filename='<calc>'):
+    """
+    Translate and compile a program. Returns (code, namespace): running
+    exec(code, namespace) defines namespace['program'].
+    """
+    translator = Translator()
+    module = translator.module(tree)
+    namespace = {'N': translator.nodes, 'RefEntry': RefEntry,
+                 'RefType': RefType, 'CalcFunction': CalcFunction,
+                 'CalcClosure': CalcClosure}
+    for helper in (lookup, target, coerce, function_value, declare, define,
+                   closure, walk, Call):
+        namespace[helper.__name__] = helper
+    return compile(module, filename, 'exec'), namespace
+
+
+def run(tree, env, filename='<calc>'):
+    """
+    Translate a program and run it in env.
+    """
+    code, namespace = translate(tree, filename)
+    exec(code, namespace)
+    namespace['program'](env)
+
+
+def main(file, source=False):
+    """
+    Parse, translate and run (or print) a program.
+    """
+    lexer = Lexer(file)
+    calc.source_lines = lexer.lines
+    tree = Parser(lexer).parse()
+    if source:
+        print(ast.unparse(Translator().module(tree)))
+        return
+    run(tree, ReferenceEnvironment(), getattr(file, 'name', '<calc>'))
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    source = '--source' in args
+    if source:
+        args.remove('--source')
+    if len(args) == 1:
+        file = open(args[0], 'r')
+    else:
+        file = sys.stdin
+    main(file, source)
@@ -0,0 +1,632 @@
+"""
+Bytecode compiler and virtual machine for calc.
+
+A program is compiled to a Code object: a flat array of instructions,
+each an opcode followed by its operands, a pool of constants, and a list
+of the parse tree nodes the instructions refer to (for the positions of
+runtime errors, and for the few statements which are left to the tree
+walker). IF and WHILE become conditional jumps. Each function is compiled
+to its own Code object the first time it is called.
+
+The VM runs the instructions in a single dispatch loop over a stack of
+values. A call pushes a frame and a return pops it, so neither deep
+expressions nor deep recursion in the calc program recurse in Python. It
+keeps the tree walker's semantics and error messages, and uses its
+runtime objects: environments are ReferenceEnvironments, and functions are
+CalcFunctions whose code is their FunctionCode.
+
+As instructions are emitted, operators applied to constants are folded
+into a single constant.
+
+Usage: python3 CalcVM.py [--dis] [--lazy] [file.calc]
+       With --dis, the bytecode is printed rather than run.
+"""
+from array import array
+from enum import IntEnum, auto
+import operator
+import sys
+import calc
+from calc import CalcClosure, CalcFunction, RefEntry, RefType, \
+                 ReferenceEnvironment, declare_name, runtime_error
+from CalcCompiler import return_type
+from CalcLexer import Lexer
+from CalcParser import Parser, Operator
+
+
+class Op(IntEnum):
+    CONST = auto()          # k: push constant k
+    LOAD = auto()           # sym n: push the value of variable sym
+    ADD = auto()
+    SUB = auto()
+    MUL = auto()
+    DIV = auto()
+    POW = auto()
+    NEG = auto()
+    GET_ITEM = auto()       # count: index the array under count indices
+    ENTER = auto()          # pop a record and run in its environment
+    LEAVE = auto()          # go back to the environment before ENTER
+    JUMP = auto()           # target
+    JUMP_IF_ZERO = auto()   # target: pop, and jump unless it is != 0
+    PRINT = auto()          # pop, and print it unless it is None
+    PRINT_RESULT = auto()   # as PRINT, also keeping it as the result
+    LOOKUP = auto()         # sym n m: push env and the variable assigned
+    LOOKUP_IN = auto()      # sym n m: as LOOKUP, in the popped record
+    COERCE = auto()         # n: coerce the value to the variable's type
+    STORE = auto()          # pop value, variable and env, and assign
+    ENTER_TARGET = auto()   # run in the env of the variable assigned
+    STORE_ITEM = auto()     # count: as STORE, to an array element
+    DROP = auto()           # count: pop count values
+    CALL_BEGIN = auto()     # count n: pop a function and start a call
+    PARAM = auto()          # i n target: declare parameter i
+    BIND = auto()           # i: pop the value of parameter i
+    CALL = auto()           # run the function
+    RETURN = auto()         # return the result of a function body
+    RETURN_VALUE = auto()   # pop and return the value of a lambda body
+    DEFINE = auto()         # k n: declare the function in constant k
+    LAMBDA = auto()         # k: push a closure of the function in k
+    WALK = auto()           # n: run node n with the tree walker
+    WALK_VALUE = auto()     # n: as WALK, pushing its value
+    HALT = auto()
+
+# The number of operands each instruction takes
+OPERANDS = {Op.CONST: 1, Op.LOAD: 2, Op.GET_ITEM: 1, Op.JUMP: 1,
+            Op.JUMP_IF_ZERO: 1, Op.LOOKUP: 3, Op.LOOKUP_IN: 3,
+            Op.COERCE: 1, Op.STORE_ITEM: 1, Op.DROP: 1, Op.CALL_BEGIN: 2,
+            Op.PARAM: 3, Op.BIND: 1, Op.DEFINE: 2, Op.LAMBDA: 1,
+            Op.WALK: 1, Op.WALK_VALUE: 1}
+
+# Instructions for the operators
+BINARY_OPS = {Operator.ADD: Op.ADD, Operator.SUB: Op.SUB,
+              Operator.MUL: Op.MUL, Operator.DIV: Op.DIV,
+              Operator.POW: Op.POW}
+
+# How constants are folded
+FOLDS = {Op.ADD: operator.add, Op.SUB: operator.sub, Op.MUL: operator.mul,
+         Op.DIV: operator.truediv, Op.POW: operator.pow}
+
+# Statements which only declare things, or read input, and are left to
+# the tree walker
+WALKED = {Operator.INPUT, Operator.DECL, Operator.ARRAY_DECL,
+          Operator.REC_DEF, Operator.REC_DECL}
+
+# Statements which have a value, and so print it
+VALUED = {Operator.ADD, Operator.SUB, Operator.MUL, Operator.DIV,
+          Operator.POW, Operator.NEG, Operator.LIT, Operator.VAR,
+          Operator.ARRAY_VAR, Operator.REC_ACCESS, Operator.FUNCALL,
+          Operator.LAMBDA}
+
+
+class Code:
+    """
+    Compiled bytecode: the instructions in ops, the constants they push,
+    and the parse tree nodes they refer to.
+    """
+    __slots__ = ('name', 'ops', 'consts', 'nodes')
+
+    def __init__(self, name):
+        self.name = name
+        self.ops = array('l')
+        self.consts = []
+        self.nodes = []
+
+
+class FunctionCode:
+    """
+    A function as compiled: its parameters, return type and body, with
+    the body's Code built on first use. A body which is an expression
+    (a lambda) returns its value; a Program returns its result.
+    """
+    def __init__(self, name, params, return_type, body, expression=False):
+        self.name = name
+        self.params = params
+        self.return_type = return_type
+        self.body = body
+        self.expression = expression
+        self.__code = None
+
+    @property
+    def code(self):
+        if self.__code is None:
+            self.__code = Compiler(self.name).function(self)
+        return self.__code
+
+
+class Compiler:
+    """
+    Compiles parse trees to a Code object.
+    """
+    def __init__(self, name):
+        self.__code = Code(name)
+        self.__label = 0
+        self.__starts = []
+
+    def program(self, tree):
+        """
+        Compile the top level program.
+        """
+        self.__body(tree, False)
+        self.__emit(Op.HALT)
+        return self.__code
+
+    def function(self, function):
+        """
+        Compile the body of a FunctionCode.
+        """
+        if function.expression:
+            self.__expression(function.body)
+            self.__emit(Op.RETURN_VALUE)
+        else:
+            self.__body(function.body, True)
+            self.__emit(Op.RETURN)
+        return self.__code
+
+    def __emit(self, op, *operands):
+        """
+        Append an instruction, returning its position.
+        """
+        position = len(self.__code.ops)
+        self.__starts.append(position)
+        self.__code.ops.append(op)
+        self.__code.ops.extend(operands)
+        return position
+
+    def __const(self, value):
+        self.__code.consts.append(value)
+        return len(self.__code.consts) - 1
+
+    def __node(self, tree):
+        self.__code.nodes.append(tree)
+        return len(self.__code.nodes) - 1
+
+    def __mark(self):
+        """
+        Return the current position as a jump target. Nothing before it
+        is folded into what comes after it.
+        """
+        self.__label = len(self.__code.ops)
+        return self.__label
+
+    def __patch(self, position):
+        """
+        Point the jump at position to the current position.
+        """
+        self.__code.ops[position + 1] = self.__mark()
+
+    def __fold(self, op):
+        """
+        Fold op into the constants before it, if it applies to constants
+        only and can be worked out now. Returns true if it was folded.
+        """
+        ops = self.__code.ops
+        consts = self.__code.consts
+        count = 1 if op == Op.NEG else 2
+        starts = self.__starts[-count:]
+        if len(starts) < count or starts[0] < self.__label or \
+           any(ops[i] != Op.CONST for i in starts):
+            return False
+        args = [consts[ops[i + 1]] for i in starts]
+        try:
+            value = -args[0] if op == Op.NEG else FOLDS[op](*args)
+        except (ArithmeticError, TypeError):
+            return False
+        del ops[starts[0]:]
+        del self.__starts[-count:]
+        del consts[len(consts) - count:]
+        self.__emit(Op.CONST, self.__const(value))
+        return True
+
+    def __body(self, tree, result):
+        """
+        Compile the statements of a Program; with result, the values they
+        print are kept as the result of the program.
+        """
+        for child in tree.children:
+            self.__statement(child, result)
+
+    def __statement(self, tree, result):
+        if tree.op in WALKED:
+            self.__emit(Op.WALK, self.__node(tree))
+        elif tree.op == Operator.ASSIGN:
+            self.__assign(tree)
+        elif tree.op == Operator.IF:
+            self.__expression(tree.children[0])
+            jump = self.__emit(Op.JUMP_IF_ZERO, 0)
+            self.__body(tree.children[1], False)
+            self.__patch(jump)
+        elif tree.op == Operator.WHILE:
+            top = self.__mark()
+            self.__expression(tree.children[0])
+            jump = self.__emit(Op.JUMP_IF_ZERO, 0)
+            self.__body(tree.children[1], False)
+            self.__emit(Op.JUMP, top)
+            self.__patch(jump)
+        elif tree.op == Operator.FUNDEF:
+            name = tree.children[0].token.lexeme
+            function = FunctionCode(name, tree.children[1].children,
+                                    return_type(tree.children[2]),
+                                    tree.children[3])
+            self.__emit(Op.DEFINE, self.__const(function), self.__node(tree))
+        elif tree.op in VALUED:
+            self.__expression(tree)
+            self.__emit(Op.PRINT_RESULT if result else Op.PRINT)
+        self.__mark()
+
+    def __expression(self, tree):
+        if tree.op == Operator.LIT:
+            self.__emit(Op.CONST, self.__const(tree.token.value))
+        elif tree.op == Operator.VAR:
+            self.__emit(Op.LOAD, tree.token.value, self.__node(tree))
+        elif tree.op in BINARY_OPS:
+            self.__expression(tree.children[0])
+            self.__expression(tree.children[1])
+            op = BINARY_OPS[tree.op]
+            self.__fold(op) or self.__emit(op)
+        elif tree.op == Operator.NEG:
+            self.__expression(tree.children[0])
+            self.__fold(Op.NEG) or self.__emit(Op.NEG)
+        elif tree.op == Operator.ARRAY_VAR:
+            self.__emit(Op.LOAD, tree.token.value, self.__node(tree))
+            self.__index(tree)
+            self.__emit(Op.GET_ITEM, len(tree.children))
+        elif tree.op == Operator.REC_ACCESS:
+            self.__expression(tree.children[0])
+            self.__emit(Op.ENTER)
+            self.__expression(tree.children[1])
+            self.__emit(Op.LEAVE)
+        elif tree.op == Operator.FUNCALL:
+            self.__call(tree)
+        elif tree.op == Operator.LAMBDA:
+            function = FunctionCode('lambda', tree.children[0].children,
+                                    return_type(tree.children[1]),
+                                    tree.children[2], expression=True)
+            self.__emit(Op.LAMBDA, self.__const(function))
+        else:
+            self.__emit(Op.WALK_VALUE, self.__node(tree))
+
+    def __index(self, tree):
+        for index in tree.children:
+            self.__expression(index)
+
+    def __assign(self, tree):
+        # find the variable, in the final record if there is one
+        n = self.__node(tree)
+        target = tree.children[0]
+        if target.op == Operator.REC_ACCESS:
+            self.__expression(target.children[0])
+            target = target.children[1]
+            while target.op == Operator.REC_ACCESS:
+                self.__emit(Op.ENTER)
+                self.__expression(target.children[0])
+                self.__emit(Op.LEAVE)
+                target = target.children[1]
+            lookup = Op.LOOKUP_IN
+        else:
+            lookup = Op.LOOKUP
+        self.__emit(lookup, target.token.value, n, self.__node(target))
+
+        # then the value, and assign it
+        self.__expression(tree.children[1])
+        self.__emit(Op.COERCE, n)
+        if target.op == Operator.VAR:
+            self.__emit(Op.STORE)
+        elif target.op == Operator.ARRAY_VAR:
+            self.__emit(Op.ENTER_TARGET)
+            self.__index(target)
+            self.__emit(Op.LEAVE)
+            self.__emit(Op.STORE_ITEM, len(target.children))
+        else:
+            self.__emit(Op.DROP, 3)
+
+    def __call(self, tree):
+        # each parameter is declared before its argument is evaluated, and
+        # a reference parameter skips the evaluation
+        self.__expression(tree.children[0])
+        n = self.__node(tree)
+        args = tree.children[1].children
+        self.__emit(Op.CALL_BEGIN, len(args), n)
+        for i, arg in enumerate(args):
+            param = self.__emit(Op.PARAM, i, n, 0)
+            self.__expression(arg)
+            self.__emit(Op.BIND, i)
+            self.__code.ops[param + 3] = self.__mark()
+        self.__emit(Op.CALL)
+
+
+def coerce(value, ref_type):
+    """
+    Coerce the value returned by a function to its return type.
+    """
+    if ref_type == RefType.INT_VAR:
+        return int(value)
+    elif ref_type == RefType.REAL_VAR:
+        return float(value)
+    return value
+
+
+def run(code, env):
+    """
+    Run the top level Code of a program in env.
+    """
+    # the opcodes as plain ints in locals, in the order Op defines them,
+    # which compare much faster than enum members
+    (CONST, LOAD, ADD, SUB, MUL, DIV, POW, NEG, GET_ITEM, ENTER, LEAVE,
+     JUMP, JUMP_IF_ZERO, PRINT, PRINT_RESULT, LOOKUP, LOOKUP_IN, COERCE,
+     STORE, ENTER_TARGET, STORE_ITEM, DROP, CALL_BEGIN, PARAM, BIND, CALL,
+     RETURN, RETURN_VALUE, DEFINE, LAMBDA, WALK, WALK_VALUE, HALT) = \
+        (int(op) for op in Op)
+
+    ops, consts, nodes = code.ops, code.consts, code.nodes
+    pc = 0
+    result = None
+    fun = None
+    stack = []
+    push = stack.append
+    pop = stack.pop
+    frames = []
+    envs = []
+
+    while True:
+        op = ops[pc]
+        if op == LOAD:
+            val = env.get(ops[pc + 1])
+            if val is None:
+                tree = nodes[ops[pc + 2]]
+                runtime_error(tree, f"Undefined Variable '{tree.token.lexeme}'")
+            push(val.value)
+            pc += 3
+        elif op == CONST:
+            push(consts[ops[pc + 1]])
+            pc += 2
+        elif op == ADD:
+            right = pop()
+            stack[-1] = stack[-1] + right
+            pc += 1
+        elif op == SUB:
+            right = pop()
+            stack[-1] = stack[-1] - right
+            pc += 1
+        elif op == JUMP_IF_ZERO:
+            if pop() != 0:
+                pc += 2
+            else:
+                pc = ops[pc + 1]
+        elif op == JUMP:
+            pc = ops[pc + 1]
+        elif op == LOOKUP or op == LOOKUP_IN:
+            var_env = pop() if op == LOOKUP_IN else env
+            var = var_env.get(ops[pc + 1])
+            if var is None:
+                name = nodes[ops[pc + 3]].token.lexeme
+                runtime_error(nodes[ops[pc + 2]],
+                              f"Assignment to undeclared variable {name}")
+            push(var_env)
+            push(var)
+            pc += 4
+        elif op == COERCE:
+            value = stack[-1]
+            ref_type = stack[-2].ref_type
+            if ref_type == RefType.INT_VAR:
+                stack[-1] = int(value)
+            elif ref_type == RefType.REAL_VAR:
+                stack[-1] = float(value)
+            elif ref_type == RefType.FUNCTION_VAR:
+                if type(value) == CalcClosure:
+                    pass
+                elif type(value) == CalcFunction:
+                    stack[-1] = CalcClosure(value, env)
+                else:
+                    runtime_error(nodes[ops[pc + 1]], f"Invalid assignment of non-function to function variable")
+            pc += 2
+        elif op == STORE:
+            value = pop()
+            pop().value = value
+            pop()
+            pc += 1
+        elif op == PRINT or op == PRINT_RESULT:
+            value = pop()
+            if value is not None:
+                if op == PRINT_RESULT:
+                    result = value
+                print(value)
+            pc += 1
+        elif op == MUL:
+            right = pop()
+            stack[-1] = stack[-1] * right
+            pc += 1
+        elif op == DIV:
+            right = pop()
+            stack[-1] = stack[-1] / right
+            pc += 1
+        elif op == POW:
+            right = pop()
+            stack[-1] = stack[-1] ** right
+            pc += 1
+        elif op == NEG:
+            stack[-1] = -stack[-1]
+            pc += 1
+        elif op == GET_ITEM:
+            count = ops[pc + 1]
+            index = stack[-count:]
+            del stack[-count:]
+            stack[-1] = stack[-1].get(index)
+            pc += 2
+        elif op == ENTER_TARGET:
+            envs.append(env)
+            env = stack[-3]
+            pc += 1
+        elif op == STORE_ITEM:
+            count = ops[pc + 1]
+            index = stack[-count:]
+            del stack[-count:]
+            value = pop()
+            pop().value.set(index, value)
+            pop()
+            pc += 2
+        elif op == ENTER:
+            envs.append(env)
+            env = pop()
+            pc += 1
+        elif op == LEAVE:
+            env = envs.pop()
+            pc += 1
+        elif op == CALL_BEGIN:
+            callee = pop()
+            if type(callee) == CalcClosure:
+                fun_env = callee.env
+                callee = callee.function
+            else:
+                if type(callee) != CalcFunction:
+                    tree = nodes[ops[pc + 2]]
+                    name = tree.children[0].token.lexeme
+                    runtime_error(tree, f"{name} is not a function.")
+                fun_env = env
+            if ops[pc + 1] != len(callee.parameters):
+                tree = nodes[ops[pc + 2]]
+                name = tree.children[0].token.lexeme
+                runtime_error(tree, f"Incorrect number of arguments to {name}")
+            push((callee, ReferenceEnvironment(fun_env)))
+            pc += 3
+        elif op == PARAM:
+            callee, local = stack[-1]
+            p = callee.parameters[ops[pc + 1]]
+            if p.op == Operator.DECL:
+                # this is by copy of evaluation (pass by value)
+                calc.eval_decl(p, local)
+                pc += 4
+            else:
+                # pass by reference
+                tree = nodes[ops[pc + 2]]
+                name = p.children[1].token.lexeme
+                value = env.get(tree.children[1].children[ops[pc + 1]])
+                if value is None:
+                    runtime_error(tree, f"Error binding {name}")
+                declare_name(tree, p.children[1].token.value, name, value,
+                             local)
+                pc = ops[pc + 3]
+        elif op == BIND:
+            value = pop()
+            callee, local = stack[-1]
+            p = callee.parameters[ops[pc + 1]]
+            local.get(p.children[0].token.value).value = value
+            pc += 2
+        elif op == CALL:
+            callee, local = pop()
+            frames.append((ops, consts, nodes, pc + 1, env, result, fun))
+            fun = callee
+            code = callee.code.code
+            ops, consts, nodes = code.ops, code.consts, code.nodes
+            pc = 0
+            env = local
+            result = None
+        elif op == RETURN or op == RETURN_VALUE:
+            if op == RETURN_VALUE:
+                value = pop()
+            elif type(result) == CalcFunction:
+                value = CalcClosure(result, env)
+            else:
+                value = result
+            value = coerce(value, fun.return_type)
+            ops, consts, nodes, pc, env, result, fun = frames.pop()
+            push(value)
+        elif op == DEFINE:
+            function = consts[ops[pc + 1]]
+            tree = nodes[ops[pc + 2]]
+            name = tree.children[0].token
+            f = CalcFunction(function.params, function.return_type,
+                             function.body, function)
+            declare_name(tree, name.value, name.lexeme,
+                         RefEntry(f, RefType.FUNCTION), env)
+            pc += 3
+        elif op == LAMBDA:
+            function = consts[ops[pc + 1]]
+            push(CalcClosure(CalcFunction(function.params,
+                                          function.return_type,
+                                          function.body, function), env))
+            pc += 2
+        elif op == WALK:
+            calc.eval_tree(nodes[ops[pc + 1]], env)
+            pc += 2
+        elif op == WALK_VALUE:
+            push(calc.eval_tree(nodes[ops[pc + 1]], env))
+            pc += 2
+        elif op == DROP:
+            del stack[len(stack) - ops[pc + 1]:]
+            pc += 2
+        elif op == HALT:
+            return
+
+
+def describe(op, operands, code):
+    """
+    Return a note on what the operands of an instruction refer to.
+    """
+    if op == Op.CONST:
+        value = code.consts[operands[0]]
+        return repr(value)
+    if op in (Op.LOAD, Op.LOOKUP, Op.LOOKUP_IN):
+        return code.nodes[operands[-1]].token.lexeme
+    if op in (Op.DEFINE, Op.LAMBDA):
+        return code.consts[operands[0]].name
+    if op == Op.JUMP or op == Op.JUMP_IF_ZERO:
+        return f"to {operands[0]}"
+    if op == Op.PARAM:
+        return f"skip to {operands[2]}"
+    if op in (Op.WALK, Op.WALK_VALUE, Op.COERCE, Op.CALL_BEGIN):
+        tree = code.nodes[operands[-1]]
+        line, col = calc.source_lines.line_col(tree.token.offset)
+        return f"{tree.op.name} at {line}:{col}"
+    return ""
+
+
+def disassemble(code, out=sys.stdout):
+    """
+    Print the instructions of code, and of the functions it defines.
+    """
+    out.write(f"code {code.name}:\n")
+    ops = code.ops
+    functions = []
+    pc = 0
+    while pc < len(ops):
+        op = Op(ops[pc])
+        count = OPERANDS.get(op, 0)
+        operands = list(ops[pc + 1:pc + 1 + count])
+        note = describe(op, operands, code)
+        text = ' '.join(str(o) for o in operands)
+        out.write(f"{pc:6}  {op.name:<14}{text:<12}"
+                  f"{'  ; ' + note if note else ''}".rstrip() + "\n")
+        if op in (Op.DEFINE, Op.LAMBDA):
+            functions.append(code.consts[operands[0]])
+        pc += 1 + count
+    for function in functions:
+        out.write("\n")
+        disassemble(function.code, out)
+
+
+def main(file, dis=False, lazy=False):
+    """
+    Parse, compile and run (or disassemble) a program.
+    """
+    lexer = Lexer(file)
+    calc.source_lines = lexer.lines
+    if lazy:
+        lexer = lexer.tokenize_all()
+    tree = Parser(lexer, lazy=lazy).parse()
+    code = Compiler('program').program(tree)
+    if dis:
+        disassemble(code)
+        return
+    run(code, ReferenceEnvironment())
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    flags = {}
+    for flag in ('--dis', '--lazy'):
+        flags[flag] = flag in args
+        if flags[flag]:
+            args.remove(flag)
+    if len(args) == 1:
+        file = open(args[0], 'r')
+    else:
+        file = sys.stdin
+    main(file, flags['--dis'], flags['--lazy'])
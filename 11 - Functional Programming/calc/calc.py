@@ -1,10 +1,21 @@
 """
 A simple tree walk interpreter for calc.
+
+Usage: python3 calc.py [--climb] [--arena] [--cache] [--stream] [--lazy]
+                       [--trace] [--trace-stats] [--optimize]
+                       [--optimize-stats] [file.calc]
+       With --cache, a program read from a file is loaded from (or parsed
+       into) CalcCache's __calccache__ directory next to it. Entries are
+       never removed: a changed program gets a new one, so delete the
+       directory to reclaim the space.
 """
 import sys
 from enum import Enum, auto
 from CalcLexer import Lexer,Token
-from CalcParser import Parser,Operator
+from CalcParser import Parser,Operator,ParseArena
+import CalcCache
+import CalcOptimizer
+import CalcTrace
 import copy
 
 class CalcClosure:
@@ -13,11 +24,14 @@ class CalcClosure:
         self.env = env
 
 class CalcFunction:
-    def __init__(self, parameters, return_type, body):
+    def __init__(self, parameters, return_type, body, code=None):
         self.parameters = parameters
         self.return_type = return_type
         self.body = body
 
+        # the function as compiled by CalcCompiler or CalcVM, if it was
+        self.code = code
+
 class CalcArray:
     def __init__(self, bounds, ref_type):
         """
@@ -84,6 +98,7 @@ class RefEntry:
 class ReferenceEnvironment:
     """
     Reference Environment for nested scopes and other types of scopes.
+    Symbols are keyed by the symbol id the lexer gave their name.
     """
     def __init__(self, parent=None):
         # a dictionary for our local symbols
@@ -103,10 +118,13 @@ class ReferenceEnvironment:
         """
         Return the associated symbol, return None if not found.
         """
-        if sym in self.__sym:
-            return self.__sym[sym]
-        elif self.__parent:
-            return self.__parent.get(sym)
+        # walk out through the enclosing environments in a loop, as a call
+        # nests the callee's environment in its caller's
+        env = self
+        while env:
+            if sym in env.__sym:
+                return env.__sym[sym]
+            env = env.__parent
         return None
 
     def set(self, sym, value):
@@ -191,6 +209,19 @@ def eval_program(tree, env):
     return result
 
 
+def eval_statements(statements, env):
+    """
+    Run the top level statements of a program one at a time as they come
+    from an iterable, printing the result of each one which has one. Each
+    statement's tree can be dropped once it has run; function definitions
+    keep their bodies alive through the environment.
+    """
+    for statement in statements:
+        value = eval_tree(statement, env)
+        if value != None:
+            print(value, flush=True)
+
+
 def eval_add(tree, env):
     left = eval_tree(tree.children[0], env)
     right = eval_tree(tree.children[1], env)
@@ -227,7 +258,7 @@ def eval_lit(tree, env):
 
 
 def eval_var(tree, env):
-    val = env.get(tree.token.lexeme)
+    val = env.get(tree.token.value)
     if val == None:
         runtime_error(tree, f"Undefined Variable '{tree.token.lexeme}'")
     return val.value
@@ -241,7 +272,7 @@ def eval_array_var(tree, env):
 def eval_input(tree, env):
     try:
         name = tree.children[0].token.lexeme
-        var = env.get(name)
+        var = env.get(tree.children[0].token.value)
         if var == None:
             runtime_error(tree, f"Undefined Variable in input {name}")
 
@@ -267,13 +298,10 @@ def eval_assign(tree, env):
         var_tree = tree.children[0]
         var_env = env
 
-    # get the name
-    name = var_tree.token.lexeme
-
-
     # lookup the variable
-    var = var_env.get(name)
+    var = var_env.get(var_tree.token.value)
     if var == None:
+        name = var_tree.token.lexeme
         runtime_error(tree, f"Assignment to undeclared variable {name}")
 
     value = eval_tree(tree.children[1], env)
@@ -308,18 +336,18 @@ def eval_decl(tree, env):
         init = None
 
     # get the name and the value
-    name = tree.children[0].token.lexeme
+    name = tree.children[0].token
     value = RefEntry(init, ref_type)
 
     # insert into our env
-    declare_name(tree, name, value, env)
+    declare_name(tree, name.value, name.lexeme, value, env)
 
 
 def eval_array_decl(tree, env):
     # get the array parameters
     ref_type = tree.token.token
     bounds = tree.children[0].children
-    name = tree.children[1].token.lexeme
+    name = tree.children[1].token
 
     # convert the bound list
     bound_list = []
@@ -331,13 +359,12 @@ def eval_array_decl(tree, env):
 
     # attempt to insert the array
     value = RefEntry(ar, RefType.ARRAY_VAR)
-    declare_name(tree, name, value, env)
+    declare_name(tree, name.value, name.lexeme, value, env)
 
 
 def eval_rec_def(tree, env):
-    # get the tag and build the record name
-    tag = tree.children[0].token.lexeme
-    name = f"record {tag}"
+    # get the tag
+    tag = tree.children[0].token
     rec_env = ReferenceEnvironment()
 
     # define our fields
@@ -348,25 +375,23 @@ def eval_rec_def(tree, env):
             eval_tree(decl, rec_env)
 
     # add the definition to the environment
-    declare_name(tree, name, rec_env, env)    
+    declare_name(tree, record_key(tag), f"record {tag.lexeme}", rec_env, env)
 
 
 def eval_rec_decl(tree, env, type_env=None):
     if type_env == None:
         type_env = env
     
-    # form the record name
-    tag = tree.children[0].token.lexeme
-    name = f"record {tag}"
-
     # retrieve record definition
-    rec_def = copy.deepcopy(type_env.get(name))
+    tag = tree.children[0].token
+    rec_def = copy.deepcopy(type_env.get(record_key(tag)))
     if rec_def == None:
-        runtime_error(tree, f"Undefined {name}")
+        runtime_error(tree, f"Undefined record {tag.lexeme}")
     
     # insert into our environment
+    name = tree.children[1].token
     value = RefEntry(rec_def, RefType.RECORD_VAR)
-    declare_name(tree, tree.children[1].token.lexeme, value, env)
+    declare_name(tree, name.value, name.lexeme, value, env)
 
 def eval_rec_access(tree, env):
     # get the record itself
@@ -385,13 +410,20 @@ def eval_while(tree, env):
     condition = tree.children[0]
     body = tree.children[1]
 
+    tracer = loop_tracer
     while eval_tree(condition, env) != 0:
+        # with tracing on, count iterations until the loop is hot, then let
+        # its trace run the rest of it, unless the trace's guards fail
+        if tracer is not None and tracer.iteration(tree):
+            if tracer.run(tree, env):
+                return
+            tracer = None
         eval_tree(body, env)
 
 
 def eval_fundef(tree, env):
     # get the name
-    name = tree.children[0].token.lexeme
+    name = tree.children[0].token
 
     # get the parameters
     params = tree.children[1].children
@@ -411,11 +443,12 @@ def eval_fundef(tree, env):
     # build the function object
     f = CalcFunction(params, return_type, body)
     value = RefEntry(f, RefType.FUNCTION)
-    declare_name(tree, name, value, env)
+    declare_name(tree, name.value, name.lexeme, value, env)
 
 
 def eval_funcall(tree, env):
     # retrieve the function
+    name = tree.children[0].token.lexeme
     fun = eval_tree(tree.children[0], env)
     if type(fun) == CalcClosure:
         fun_env = fun.env
@@ -445,7 +478,7 @@ def eval_funcall(tree, env):
             value = env.get(arg_expressions[i])
             if value == None:
                 runtime_error(tree, f"Error binding {name}")
-            declare_name(tree, name, value)
+            declare_name(tree, p.children[1].token.value, name, value, local)
  
     # run the function on the local environment
     result = eval_tree(fun.body, local)
@@ -498,10 +531,10 @@ def assign(tree, value, env):
         assign_array_var(tree, value, env)
     
 def assign_var(tree, value, env):
-    env.get(tree.token.lexeme).value = value
+    env.get(tree.token.value).value = value
 
 def assign_array_var(tree, value, env):
-    ar = env.get(tree.token.lexeme).value
+    ar = env.get(tree.token.value).value
     index = get_array_index(tree, env)
     ar.set(index, value)
 
@@ -511,31 +544,122 @@ def get_array_index(tree, env):
         index.append(eval_tree(t, env))
     return index
 
-def declare_name(tree, name, value, env):
+def declare_name(tree, sym, name, value, env):
     # make sure the name is unique
-    if env.is_local(name):
+    if env.is_local(sym):
         runtime_error(tree, f"Redeclaration of variable {name}")
-    env.set_local(name, value)
+    env.set_local(sym, value)
+
+def record_key(tag):
+    """
+    Return the environment key for the definition of the record whose tag
+    token is given. Symbol ids are never negative, so records can not
+    collide with variables.
+    """
+    return ~tag.value
+
+
+# Line index of the program being run, used to place runtime errors; a
+# program run without one (eval_tree called directly) has its errors
+# placed by offset
+source_lines = None
+
+# the CalcTrace.LoopTracer compiling hot loops, if tracing is on
+loop_tracer = None
 
+# the CalcOptimizer.Optimizer rewriting the program, if optimizing is on
+tree_optimizer = None
 
 def runtime_error(tree, msg):
-    sys.stderr.write(f"Runtime error at line {tree.token.line} column {tree.token.col}: {msg}\n")
+    sys.stderr.write(f"Runtime error at {position(tree.token.offset)}: "
+                     f"{msg}\n")
     sys.exit(-2)
 
 
-def main(file):
+def position(offset):
     """
-    The main function for the interpreter
+    Return where in the program the source offset is, for messages: its
+    line and column if there is a line index, otherwise the offset.
     """
+    if source_lines is None:
+        return f"offset {offset}"
+    line, col = source_lines.line_col(offset)
+    return f"line {line} column {col}"
+
+
+def main(file, climbing=False, arena=False, cache=False, stream=False,
+         lazy=False, trace=False, optimize=False):
+    """
+    The main function for the interpreter. With arena, the parse tree is
+    packed into a ParseArena and run from there. With cache, the program
+    is loaded from (or parsed into) the on-disk cache. With stream, each
+    top level statement is run as soon as it has been parsed, rather than
+    after the whole program has, so output starts straight away and only
+    one statement's tree is held at a time. With lazy, function bodies
+    are not parsed until the function is first called. With trace, hot
+    while loops are compiled by CalcTrace. With optimize, the program is
+    rewritten by CalcOptimizer before it runs.
+    """
+    global source_lines, loop_tracer, tree_optimizer
+    if trace:
+        loop_tracer = CalcTrace.LoopTracer(sys.modules[__name__])
+    if optimize:
+        tree_optimizer = CalcOptimizer.Optimizer()
+    if stream:
+        lexer = Lexer(file)
+        source_lines = lexer.lines
+        statements = Parser(lexer, climbing).statements()
+        if tree_optimizer:
+            statements = tree_optimizer.statements(statements,
+                                                   lexer.symbols)
+        eval_statements(statements, ReferenceEnvironment())
+        return
+
+    if cache:
+        tree, source_lines = CalcCache.parse_file(file.name, climbing)
+        file.close()
+        if tree_optimizer:
+            tree = tree_optimizer.optimize(tree)
+        eval_tree(tree, ReferenceEnvironment())
+        return
+
     lexer = Lexer(file)
-    parser = Parser(lexer)
+    source_lines = lexer.lines
+    if arena or lazy:
+        lexer = lexer.tokenize_all()
+    parser = Parser(lexer, climbing, lazy=lazy)
     tree = parser.parse()
+    if tree_optimizer:
+        tree = tree_optimizer.optimize(tree, lexer.symbols)
+    if arena:
+        tree = ParseArena(tree, lexer).root()
     eval_tree(tree, ReferenceEnvironment())
 
 
 if __name__ == '__main__':
-    if len(sys.argv) == 2:
-        file = open(sys.argv[1], 'r')
+    args = sys.argv[1:]
+    flags = {}
+    for flag in ('--climb', '--arena', '--cache', '--stream', '--lazy',
+                 '--trace', '--trace-stats', '--optimize', '--optimize-stats'):
+        flags[flag] = flag in args
+        if flags[flag]:
+            args.remove(flag)
+    if len(args) == 1:
+        file = open(args[0], 'r')
     else:
         file = sys.stdin
-    main(file)
+
+    # with --cache, programs read from a file go through the cache, unless
+    # the tree is wanted in an arena or the program is streamed or parsed
+    # lazily
+    cache = flags['--cache'] and file is not sys.stdin and \
+            not flags['--arena'] and not flags['--stream'] and \
+            not flags['--lazy']
+    trace = flags['--trace'] or flags['--trace-stats']
+    optimize = flags['--optimize'] or flags['--optimize-stats']
+    main(file, flags['--climb'], flags['--arena'], cache, flags['--stream'],
+         flags['--lazy'], trace, optimize)
+    if flags['--trace-stats']:
+        loop_tracer.report(sys.stderr)
+    if flags['--optimize-stats']:
+        tree_optimizer.report(sys.stderr)